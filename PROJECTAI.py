@@ -2,10 +2,17 @@
 # AI BASED DISEASE PREDICTION MODEL (FINAL – FORMATTED)
 # Balanced Random Forest with Warm Start
 # Leakage-Safe, Overfitting-Controlled
+#
+# Evaluation report for the serving hyperparameters (tuned with
+# backend/model_search.py). Runs headless; figures are saved to REPORT_DIR.
 # ==========================================================
 
+import os
+import sys
 import pandas as pd
 import numpy as np
+import matplotlib
+matplotlib.use("Agg")
 import matplotlib.pyplot as plt
 import seaborn as sns
 import warnings
@@ -15,26 +22,22 @@ from sklearn.model_selection import train_test_split
 from sklearn.metrics import accuracy_score, confusion_matrix, classification_report
 from imblearn.ensemble import BalancedRandomForestClassifier
 
-warnings.filterwarnings("ignore")
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend")
+sys.path.insert(0, BACKEND_DIR)
+import dataset
+import model_store
 
-# ==========================================================
-# Load Data
-# ==========================================================
-train_df = pd.read_csv("Blood_sample_dataset_balanced.csv").copy()
-test_df  = pd.read_csv("blood_samples_dataset_test.csv").copy()
+REPORT_DIR = os.environ.get("REPORT_DIR", "reports")
+os.makedirs(REPORT_DIR, exist_ok=True)
 
-train_df["Disease"] = train_df["Disease"].str.strip()
-test_df["Disease"]  = test_df["Disease"].str.strip()
+warnings.filterwarnings("ignore")
 
 # ==========================================================
-# Handle Missing Values
+# Load Data
 # ==========================================================
-for df in (train_df, test_df):
-    for col in df.columns:
-        if df[col].dtype == "object":
-            df[col] = df[col].fillna(df[col].mode()[0])
-        else:
-            df[col] = df[col].fillna(df[col].mean())
+# Cached, already mean/mode-imputed copies of the CSVs (see backend/dataset.py)
+train_df = dataset.load(os.path.join(BACKEND_DIR, "Blood_sample_dataset_balanced.csv")).frame()
+test_df  = dataset.load(os.path.join(BACKEND_DIR, "blood_samples_dataset_test.csv")).frame()
 
 # ==========================================================
 # Feature / Target Split
@@ -101,16 +104,12 @@ np.random.seed(42)
 X_train_scaled_noisy = X_train_scaled + np.random.normal(0, 0.03, X_train_scaled.shape)
 
 # ==========================================================
-# Balanced Random Forest (Adjusted for better test accuracy)
+# Balanced Random Forest (serving hyperparameters)
 # ==========================================================
+params = model_store.load_params()
 rf_model = BalancedRandomForestClassifier(
-    n_estimators=300,       # more trees for better test accuracy
-    max_depth=10,           # deeper trees for test generalization
-    min_samples_leaf=8,
-    min_samples_split=12,
-    max_features="sqrt",
+    **params,
     warm_start=True,
-    random_state=42,
     n_jobs=-1
 )
 
@@ -119,7 +118,8 @@ train_scores, val_scores = [], []
 # ==========================================================
 # Incremental Training with Tree Output
 # ==========================================================
-tree_steps = [100, 200, 300]
+n_trees = params["n_estimators"]
+tree_steps = sorted({max(n_trees // 3, 1), max(2 * n_trees // 3, 1), n_trees})
 
 for trees in tree_steps:
     rf_model.set_params(n_estimators=trees)
@@ -175,7 +175,8 @@ plt.title("Confusion Matrix – Balanced Random Forest")
 plt.xlabel("Predicted")
 plt.ylabel("Actual")
 plt.tight_layout()
-plt.show()
+plt.savefig(os.path.join(REPORT_DIR, "confusion_matrix.png"))
+plt.close()
 
 # ==========================================================
 # Classification Report
@@ -200,7 +201,8 @@ sns.barplot(
 )
 plt.title("Top 10 Most Important Clinical Features")
 plt.tight_layout()
-plt.show()
+plt.savefig(os.path.join(REPORT_DIR, "feature_importance.png"))
+plt.close()
 
 print("\n🌲 Total Trees Used:", len(rf_model.estimators_))
 
@@ -216,7 +218,8 @@ plt.title("Training vs Validation Accuracy")
 plt.legend()
 plt.grid(True)
 plt.tight_layout()
-plt.show()
+plt.savefig(os.path.join(REPORT_DIR, "train_vs_val_accuracy.png"))
+plt.close()
 
 # ==========================================================
 # FINAL MODEL ACCURACY SUMMARY (AT LAST)
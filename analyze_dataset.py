@@ -1,28 +1,44 @@
 
-import pandas as pd
 import os
+import sys
 
-# Load the training dataset
+sys.path.insert(0, "backend")
+import dataset
+
+# Load the training dataset statistics (from backend/.dataset_cache, or one streaming
+# pass over the CSV in chunks)
 train_path = os.path.join("backend", "Blood_sample_dataset_balanced.csv")
-df = pd.read_csv(train_path)
+stats = dataset.stats(train_path)
+columns = list(stats["columns"])
+rows = stats["rows"]
 
-print("Dataset Shape:", df.shape)
+print("Dataset Shape:", (rows, len(columns) + (1 if stats["class_counts"] else 0)))
 print("\nColumn Names:")
-print(df.columns.tolist())
+print(columns + ([dataset.LABEL_COLUMN] if stats["class_counts"] else []))
 
 # Check class distribution
-if 'Disease' in df.columns:
+if stats["class_counts"]:
     print("\n=== Disease Distribution ===")
-    disease_counts = df['Disease'].value_counts()
-    print(disease_counts)
-    print(f"\nTotal samples: {len(df)}")
+    disease_counts = sorted(stats["class_counts"].items(), key=lambda item: -item[1])
+    for disease, count in disease_counts:
+        print(f"{disease:<10} {count}")
+    print(f"\nTotal samples: {rows}")
     print(f"Number of classes: {len(disease_counts)}")
     
     # Check for class imbalance
     print("\n=== Class Percentages ===")
-    percentages = (disease_counts / len(df) * 100).round(2)
-    for disease, pct in percentages.items():
-        print(f"{disease}: {pct}%")
+    for disease, count in disease_counts:
+        print(f"{disease}: {round(count / rows * 100, 2)}%")
 else:
-    print("\nWARNING: 'Disease' column not found!")
-    print("Available columns:", df.columns.tolist())
+    print(f"\nWARNING: '{dataset.LABEL_COLUMN}' column not found!")
+    print("Available columns:", columns)
+
+# Per-feature summary
+exact = "" if stats["quantiles_exact"] else " (quantiles approximate)"
+print(f"\n=== Feature Statistics{exact} ===")
+print(f"{'feature':<42} {'missing':>8} {'mean':>10} {'std':>10} {'min':>10} {'median':>10} {'max':>10}")
+def fmt(value):
+    return f"{value:>10.4f}" if value is not None else f"{'-':>10}"
+for name, col in stats["columns"].items():
+    print(f"{name:<42} {rows - col['count']:>8} {fmt(col['mean'])} {fmt(col['std'])} {fmt(col['min'])} "
+          f"{fmt(col['quantiles']['0.5'])} {fmt(col['max'])}")
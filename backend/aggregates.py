@@ -0,0 +1,190 @@
+import argparse
+import os
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+from mongita.errors import DuplicateKeyError as MongitaDuplicateKeyError
+from pymongo.errors import DuplicateKeyError
+
+from log_setup import configure_logging, get_logger
+
+# Materialized prediction counters. The "prediction_aggregates" collection holds one
+# document per (dimension, key): the total, and counts by disease, by UTC day, by model
+# version and by user, so /api/stats reads a few documents by _id (or by the indexed
+# dimension, for the small ones) instead of scanning the predictions.
+#
+# They are kept current by the prediction write-behind queue, which calls record() with
+# every batch it has written; the batch is folded into per-key increments first, so a
+# flush costs one update per distinct key, not per prediction. Mongita's update_one has no
+# upsert: a key seen for the first time is inserted when the $inc matched nothing.
+#
+#   python aggregates.py rebuild [--workers N]
+#
+# recomputes everything from the predictions collection, counting time slices of it in
+# parallel worker processes (MongoDB, whose created_at index serves the slices; the
+# embedded stores are counted in one pass). Increments recorded while a rebuild runs are
+# overwritten by it, so run it with writes paused.
+
+COLLECTION = "prediction_aggregates"
+DUPLICATE_KEY_ERRORS = (DuplicateKeyError, MongitaDuplicateKeyError)
+# /api/stats reports this many days of daily volume
+DEFAULT_DAYS = 30
+
+log = get_logger("aggregates")
+
+
+def aggregate_id(dimension, key):
+    return f"{dimension}:{key}"
+
+
+def keys_for(doc):
+    # The (dimension, key) counters one prediction document contributes to
+    yield "total", "all"
+    yield "disease", str(doc.get("prediction_result"))
+    created_at = doc.get("created_at")
+    if created_at is not None:
+        yield "day", created_at.strftime("%Y-%m-%d")
+    yield "model", doc.get("model_version") or "unknown"
+    yield "user", str(doc["user_id"]) if doc.get("user_id") else "anonymous"
+
+
+def count(docs):
+    counts = Counter()
+    for doc in docs:
+        counts.update(keys_for(doc))
+    return counts
+
+
+def apply_counts(collection, counts, now=None):
+    now = now or datetime.utcnow()
+    for (dimension, key), n in counts.items():
+        _id = aggregate_id(dimension, key)
+        update = {"$inc": {"count": n}, "$set": {"updated_at": now}}
+        if collection.update_one({"_id": _id}, update).matched_count:
+            continue
+        try:
+            collection.insert_one({"_id": _id, "dimension": dimension, "key": key, "count": n, "updated_at": now})
+        except DUPLICATE_KEY_ERRORS:
+            # Another writer created it between our update and insert
+            collection.update_one({"_id": _id}, update)
+
+
+def record(db, docs):
+    # Write-behind flush listener: fold a written batch into the counters
+    apply_counts(db[COLLECTION], count(docs))
+
+
+def read(db, days=DEFAULT_DAYS, user_id=None, today=None):
+    collection = db[COLLECTION]
+    today = today or datetime.utcnow().date()
+    day_keys = [(today - timedelta(days=i)).isoformat() for i in range(days - 1, -1, -1)]
+    ids = [aggregate_id("total", "all")] + [aggregate_id("day", d) for d in day_keys]
+    if user_id is not None:
+        ids.append(aggregate_id("user", user_id))
+    found = {doc["_id"]: doc["count"] for doc in collection.find({"_id": {"$in": ids}})}
+
+    def dimension(name):
+        docs = collection.find({"dimension": name})
+        return dict(sorted(((doc["key"], doc["count"]) for doc in docs), key=lambda item: (-item[1], item[0])))
+
+    stats = {
+        "total_predictions": found.get(aggregate_id("total", "all"), 0),
+        "predictions_by_disease": dimension("disease"),
+        "predictions_by_model": dimension("model"),
+        "predictions_by_day": {d: found.get(aggregate_id("day", d), 0) for d in day_keys},
+    }
+    if user_id is not None:
+        stats["user_predictions"] = found.get(aggregate_id("user", user_id), 0)
+    return stats
+
+
+def time_slices(predictions, slices):
+    # [lo, hi) created_at bounds splitting the collection's time span into `slices` parts;
+    # the last one is open-ended
+    oldest = list(predictions.find({}).sort("created_at", 1).limit(1))
+    newest = list(predictions.find({}).sort("created_at", -1).limit(1))
+    if not oldest:
+        return []
+    lo, hi = oldest[0]["created_at"], newest[0]["created_at"]
+    step = (hi - lo) / max(slices, 1)
+    bounds = [lo + step * i for i in range(max(slices, 1))] + [None]
+    if step == timedelta(0):
+        bounds = [lo, None]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def _slice_filter(lo, hi):
+    return {"created_at": {"$gte": lo, "$lt": hi} if hi is not None else {"$gte": lo}}
+
+
+def _count_slice(args):
+    # Worker: its own connection, one time slice
+    from database import connect
+    config, lo, hi = args
+    client, db = connect(config)
+    try:
+        return count(db.predictions.find(_slice_filter(lo, hi)))
+    finally:
+        client.close()
+
+
+def rebuild(db, config=None, workers=1, slices=None):
+    # Recompute all counters from the predictions collection and replace the stored ones
+    start = time.perf_counter()
+    totals = Counter()
+    if workers > 1 and config is not None:
+        bounds = time_slices(db.predictions, slices or workers * 4)
+        with ProcessPoolExecutor(workers) as pool:
+            for counts in pool.map(_count_slice, [(config, lo, hi) for lo, hi in bounds]):
+                totals.update(counts)
+    elif slices:
+        for lo, hi in time_slices(db.predictions, slices):
+            totals.update(count(db.predictions.find(_slice_filter(lo, hi))))
+    else:
+        totals = count(db.predictions.find({}))
+
+    now = datetime.utcnow()
+    collection = db[COLLECTION]
+    collection.delete_many({})
+    docs = [{"_id": aggregate_id(dimension, key), "dimension": dimension, "key": key, "count": n, "updated_at": now}
+            for (dimension, key), n in totals.items()]
+    if docs:
+        collection.insert_many(docs)
+    elapsed = time.perf_counter() - start
+    log.info("Rebuilt %d aggregates from %d predictions in %.2f s", len(docs),
+             totals.get(("total", "all"), 0), elapsed)
+    return totals
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Maintain the prediction aggregates collection")
+    sub = parser.add_subparsers(dest="command", required=True)
+    rebuild_parser = sub.add_parser("rebuild", help="recompute the aggregates from the predictions collection")
+    rebuild_parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    rebuild_parser.add_argument("--slices", type=int, default=None, help="time slices (default 4 per worker)")
+    sub.add_parser("show", help="print the aggregates /api/stats reports")
+    args = parser.parse_args(argv)
+    configure_logging()
+
+    from database import STORAGE_DEFAULTS, connect, storage_setting
+    config = {key: storage_setting(None, key) for key in STORAGE_DEFAULTS}
+    client, db = connect(config)
+    if args.command == "rebuild":
+        workers = args.workers
+        if config["STORAGE_BACKEND"] != "mongodb" and workers > 1:
+            # Without a created_at index every slice would rescan the embedded store
+            log.info("STORAGE_BACKEND=%s: counting in one pass", config["STORAGE_BACKEND"])
+            workers = 1
+        totals = rebuild(db, config, workers, args.slices)
+        print(f"Rebuilt aggregates for {totals.get(('total', 'all'), 0)} predictions")
+    else:
+        for key, value in read(db).items():
+            print(f"{key}: {value}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
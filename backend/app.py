@@ -1,23 +1,47 @@
-from flask import Flask, jsonify, request
+from flask import Flask, g, jsonify, request
 from flask_cors import CORS
+from log_setup import configure_logging, get_logger, sampled
+configure_logging()
 from database import mongo
+from metrics import REQUEST_SECONDS
+import logging
 import os
+import time
+
+log = get_logger("requests")
 
 app = Flask(__name__)
-CORS(app)
+CORS(app, expose_headers=["X-Next-Cursor"])
 
 # Configuration
-app.config["MONGO_URI"] = "mongodb://localhost:27017/disease_prediction_db"
+# STORAGE_BACKEND picks mongita (default), memory or mongodb; see database.STORAGE_DEFAULTS
+app.config["MONGO_URI"] = os.environ.get("MONGO_URI", "mongodb://localhost:27017/disease_prediction_db")
+app.config["STORAGE_BACKEND"] = os.environ.get("STORAGE_BACKEND", "mongita")
 mongo.init_app(app)
 
 from routes import api
 app.register_blueprint(api, url_prefix='/api')
 
 @app.before_request
-def log_request_info():
-    print(f"\n[REQUEST] {request.method} {request.url}")
-    print(f"Headers: {request.headers}")
-    print(f"Body: {request.get_data(as_text=True)}")
+def start_request_timer():
+    g.request_start = time.perf_counter()
+    if log.isEnabledFor(logging.DEBUG):
+        log.debug("%s %s headers=%s body=%s", request.method, request.url,
+                  dict(request.headers), request.get_data(as_text=True))
+
+@app.after_request
+def record_request(response):
+    start = g.pop('request_start', None)
+    if start is None:
+        return response
+    elapsed = time.perf_counter() - start
+    route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+    REQUEST_SECONDS.observe(elapsed, request.method, route, str(response.status_code))
+    if response.status_code >= 500:
+        log.error("%s %s -> %d in %.1f ms", request.method, request.path, response.status_code, elapsed * 1000)
+    elif sampled():
+        log.info("%s %s -> %d in %.1f ms", request.method, request.path, response.status_code, elapsed * 1000)
+    return response
 
 
 @app.route('/')
@@ -30,5 +54,6 @@ if __name__ == '__main__':
     print("="*50)
     print(" * Backend URL: http://127.0.0.1:5000")
     print(" * Frontend Proxy Target: http://127.0.0.1:5000")
+    print(" * Development server only; in production run: python serve.py --workers N")
     print("="*50 + "\n")
     app.run(debug=True, port=5000)
@@ -0,0 +1,415 @@
+import asyncio
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qsl
+from app import app as flask_app
+import auth
+import feature_vectors
+import serialization
+from auth import PasswordPoolBusy
+from database import mongo
+from log_setup import get_logger, sampled
+from metrics import registry, REQUEST_SECONDS, STAGE_SECONDS
+from routes import (DASHBOARD_FIELDS, DISEASES, HISTORY_FIELDS, PREDICT_BATCH_WINDOW_MS, RECOMMENDATION, ApiError,
+                    batch_request, check_admin, check_history_reader, dashboard_names, export_chunks, fetch_page,
+                    history_filter, insert_user, listing_args, login_lookup, login_reply, model_holder, new_user,
+                    password_pool, predict_batcher, predict_records, predict_request, prediction_owner,
+                    prediction_reply, prediction_writer, readiness, reload_reply, score_one, sessions, stats_reply,
+                    store_rehash)
+from write_behind import WriteQueueFull
+
+log = get_logger("asgi")
+
+# asyncio-native variant of the api blueprint: the same URLs, status codes and JSON bodies
+# (encoded as the Flask routes encode them, byte for byte), served by an ASGI server
+# instead of one thread per request. Run it with
+#
+#   python serve_asgi.py --port 5000        (uvicorn)
+#
+# The handlers are thin wrappers around the handler bodies in routes.py, the same ones the
+# Flask routes call, and share everything behind them (model holder, micro-batcher,
+# write-behind queue, caches, session tokens, metrics), so both modes behave the same and
+# can be compared. Nothing that blocks runs on the event loop:
+#
+#   - model calls go to the micro-batcher's thread (awaited through its Future) or to the
+#     inference executor (batches, explanations, PREDICT_BATCH_WINDOW_MS=0)
+#   - Mongita/pymongo calls go to the storage executor; cached session tokens skip it and
+#     prediction records go to the write-behind queue without waiting for room
+#   - registration and login run on the storage executor, their password hashing on the
+#     auth.PasswordPool threads
+#
+# Both executors are bounded: ASGI_*_WORKERS threads and at most ASGI_MAX_PENDING jobs
+# waiting for one, past which requests get the same 503 as a full write queue. Each open
+# connection is a coroutine, not a thread, so thousands of slow clients cost memory only.
+
+INFERENCE_WORKERS = int(os.environ.get("ASGI_INFERENCE_WORKERS", str(os.cpu_count() or 1)))
+STORAGE_WORKERS = int(os.environ.get("ASGI_STORAGE_WORKERS", "8"))
+MAX_PENDING = int(os.environ.get("ASGI_MAX_PENDING", "1024"))
+# Request bodies above this are refused with 413 before being read in full
+MAX_BODY_BYTES = int(os.environ.get("ASGI_MAX_BODY_BYTES", str(8 * 1024 * 1024)))
+
+BUSY = {"error": "Server busy, please retry"}
+CORS_HEADERS = [(b"access-control-allow-origin", b"*"), (b"access-control-expose-headers", b"X-Next-Cursor")]
+
+
+class ExecutorBusy(Exception):
+    pass
+
+
+class BoundedExecutor:
+    # A thread pool that refuses work instead of queueing without limit
+    def __init__(self, name, workers, max_pending=MAX_PENDING):
+        self.name = name
+        self.workers = workers
+        self.max_pending = max_pending
+        self._slots = threading.BoundedSemaphore(workers + max_pending)
+        self._executor = ThreadPoolExecutor(workers, thread_name_prefix=name)
+        self._lock = threading.Lock()
+        self._jobs = 0
+        self._rejected = 0
+        self._in_flight = 0
+
+    async def run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._rejected += 1
+            raise ExecutorBusy(f"{self.name} executor is full")
+        with self._lock:
+            self._in_flight += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+                self._jobs += 1
+            self._slots.release()
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+
+    def stats(self):
+        with self._lock:
+            return {"workers": self.workers, "max_pending": self.max_pending, "in_flight": self._in_flight,
+                    "jobs": self._jobs, "rejected": self._rejected}
+
+
+inference = BoundedExecutor("inference", INFERENCE_WORKERS)
+storage = BoundedExecutor("storage", STORAGE_WORKERS)
+registry.stats_gauges("asgi_inference", inference.stats)
+registry.stats_gauges("asgi_storage", storage.stats)
+
+
+class Headers(dict):
+    # Lower-cased names; get() takes any case, like Flask's request.headers
+    def get(self, key, default=None):
+        return super().get(key.lower(), default)
+
+
+class Request:
+    def __init__(self, scope, body):
+        self.method = scope["method"]
+        self.path = scope["path"]
+        # A repeated key keeps its first value, as request.args.get does in Flask
+        self.args = {}
+        for key, value in parse_qsl(scope.get("query_string", b"").decode("latin-1")):
+            self.args.setdefault(key, value)
+        self.headers = Headers((k.decode("latin-1").lower(), v.decode("latin-1")) for k, v in scope["headers"])
+        self.body = body
+
+    def json(self):
+        # The decoded body, or None when it is missing or not JSON (Flask answers 400 too)
+        try:
+            return json.loads(self.body) if self.body else None
+        except ValueError:
+            return None
+
+
+class Response:
+    def __init__(self, body=b"", status=200, content_type="application/json", headers=None, chunks=None):
+        self.body = body
+        self.status = status
+        self.headers = [(b"content-type", content_type.encode())] + CORS_HEADERS + [
+            (k.lower().encode(), v.encode()) for k, v in (headers or {}).items()]
+        self.chunks = chunks # async iterator of bytes for streamed bodies
+
+
+def jsonify(obj, status=200, headers=None):
+    # Same bytes as flask.jsonify with the app's provider (compact, sorted keys, trailing newline)
+    body = f"{flask_app.json.dumps(obj, separators=(',', ':'))}\n".encode()
+    return Response(body, status, headers=headers)
+
+
+def json_response(obj, status=200, headers=None):
+    # Mongo documents, encoded like routes.json_response
+    return Response(serialization.dumps(obj), status, headers=headers)
+
+
+def error(message, status):
+    return jsonify({"error": message}, status)
+
+
+async def persist(docs):
+    # The queue put does not block the loop: a full queue answers 503 at once instead of
+    # waiting put_timeout for room. Sync durability awaits the flush Futures
+    futures = prediction_writer.enqueue(docs)
+    if futures:
+        await asyncio.gather(*(asyncio.wrap_future(future) for future in futures))
+
+
+async def authenticate(request, required=True):
+    token = auth.bearer_token(request.headers.get("Authorization"))
+    if token is None:
+        if required:
+            raise auth.AuthError("Authentication required")
+        return None
+    with STAGE_SECONDS.time("auth"):
+        identity = sessions.cached(token)
+        if identity is None:
+            identity = await storage.run(sessions.verify, token, mongo.db)
+    return identity
+
+
+async def register(request):
+    # Only the lookup and the insert hold a storage thread; hashing waits on the password pool
+    name, email, password = await storage.run(new_user, request.json())
+    password_hash = await asyncio.wrap_future(password_pool.submit_hash(password))
+    return jsonify(await storage.run(insert_user, name, email, password_hash), 201)
+
+
+async def login(request):
+    email, password, user = await storage.run(login_lookup, request.json())
+    stored = user['password'] if user else None
+    matches, rehash = await asyncio.wrap_future(password_pool.submit_check(password, stored))
+    if matches and rehash:
+        password_hash = await asyncio.wrap_future(password_pool.submit_hash(password))
+        await storage.run(store_rehash, user, password_hash)
+    return json_response(login_reply(email, user, matches))
+
+
+async def predict(request):
+    with STAGE_SECONDS.time("parse"):
+        data = request.json()
+    input_data, top_k = predict_request(data)
+    owner = prediction_owner(await authenticate(request, required=False), data.get('user_id'))
+
+    if top_k is None and PREDICT_BATCH_WINDOW_MS > 0:
+        # The batcher already runs the model on its own thread
+        scored, explanation = await asyncio.wrap_future(predict_batcher.submit(input_data)), None
+    else:
+        scored, explanation = await inference.run(score_one, input_data, top_k)
+
+    body, pred_doc = prediction_reply(owner, input_data, scored, explanation)
+    with STAGE_SECONDS.time("persist"):
+        await persist([pred_doc])
+    with STAGE_SECONDS.time("serialize"):
+        return jsonify(body)
+
+
+async def predict_batch(request):
+    with STAGE_SECONDS.time("parse"):
+        data = request.json()
+    user_ids, inputs = batch_request(data)
+    identity = await authenticate(request, required=False)
+    owners = [prediction_owner(identity, user_id) for user_id in user_ids]
+
+    results, pred_docs = await inference.run(predict_records, owners, inputs)
+    with STAGE_SECONDS.time("persist"):
+        await persist(pred_docs)
+    with STAGE_SECONDS.time("serialize"):
+        return jsonify({"predictions": results, "recommendation": RECOMMENDATION})
+
+
+async def list_predictions(request, filter, fields, enrich=None):
+    after, limit, ndjson = listing_args(request.args)
+    if ndjson:
+        chunks = export_chunks(filter, after, limit, enrich, fields)
+
+        async def stream():
+            while True:
+                chunk = await storage.run(next, chunks, None)
+                if chunk is None:
+                    return
+                yield chunk
+
+        return Response(content_type="application/x-ndjson", chunks=stream())
+
+    page, next_cursor = await storage.run(fetch_page, filter, after, limit, enrich, fields)
+    return json_response(page, headers={"X-Next-Cursor": next_cursor} if next_cursor else None)
+
+
+async def history(request, user_id):
+    filter = history_filter(user_id)
+    check_history_reader(filter, await authenticate(request))
+    return await list_predictions(request, filter, HISTORY_FIELDS, feature_vectors.expand_inputs)
+
+
+async def doctor_predictions(request):
+    auth.require_role(await authenticate(request), auth.STAFF_ROLES)
+    return await list_predictions(request, {}, DASHBOARD_FIELDS, dashboard_names)
+
+
+async def diseases(request):
+    return jsonify(DISEASES)
+
+
+async def stats(request):
+    identity = await authenticate(request, required=False)
+    return jsonify(await storage.run(stats_reply, request.args, identity))
+
+
+async def health(request):
+    return jsonify({"status": "ok", "pid": os.getpid()})
+
+
+async def ready(request):
+    body, status = await storage.run(readiness)
+    return jsonify(body, status)
+
+
+async def admin_model(request):
+    check_admin(request.headers)
+    return jsonify(model_holder.stats())
+
+
+async def admin_reload(request):
+    check_admin(request.headers)
+    return jsonify(await storage.run(reload_reply, request.json()), 202)
+
+
+async def metrics(request):
+    return Response(registry.render().encode(), content_type="text/plain; version=0.0.4")
+
+
+# (method, rule, handler); rules use Flask's syntax so request metrics carry the same labels
+ROUTES = [
+    ("POST", "/api/auth/register", register),
+    ("POST", "/api/auth/login", login),
+    ("POST", "/api/predict", predict),
+    ("POST", "/api/predict/batch", predict_batch),
+    ("GET", "/api/history/<user_id>", history),
+    ("GET", "/api/doctor/predictions", doctor_predictions),
+    ("GET", "/api/diseases", diseases),
+    ("GET", "/api/stats", stats),
+    ("GET", "/api/health", health),
+    ("GET", "/api/ready", ready),
+    ("GET", "/api/admin/model", admin_model),
+    ("POST", "/api/admin/model/reload", admin_reload),
+    ("GET", "/api/metrics", metrics),
+]
+_COMPILED = [(method, rule, re.compile("^" + re.sub(r"<(\w+)>", r"(?P<\1>[^/]+)", rule) + "$"), handler)
+             for method, rule, handler in ROUTES]
+
+
+def match(method, path):
+    # -> (rule, handler, params); handler None with a rule means the method is not allowed
+    allowed = None
+    for route_method, rule, pattern, handler in _COMPILED:
+        found = pattern.match(path)
+        if found:
+            if route_method == method:
+                return rule, handler, found.groupdict()
+            allowed = rule
+    return allowed, None, {}
+
+
+def preflight(request):
+    headers = {"Access-Control-Allow-Methods": "GET, POST, OPTIONS", "Access-Control-Max-Age": "600"}
+    requested = request.headers.get("Access-Control-Request-Headers")
+    if requested:
+        headers["Access-Control-Allow-Headers"] = requested
+    return Response(b"", 200, content_type="text/html; charset=utf-8", headers=headers)
+
+
+async def dispatch(request):
+    if request.method == "OPTIONS":
+        return "preflight", preflight(request)
+    rule, handler, params = match(request.method, request.path)
+    if rule is None:
+        return "unmatched", error("Not found", 404)
+    if handler is None:
+        return rule, error("Method not allowed", 405)
+    try:
+        return rule, await handler(request, **params)
+    except ApiError as e:
+        return rule, jsonify(e.body(), e.status)
+    except auth.AuthError as e:
+        return rule, error(str(e), e.status)
+    except (ExecutorBusy, PasswordPoolBusy, WriteQueueFull) as e:
+        log.warning("%s %s rejected: %s", request.method, request.path, e)
+        return rule, jsonify(BUSY, 503)
+    except Exception:
+        log.exception("%s %s failed", request.method, request.path)
+        return rule, error("Internal server error", 500)
+
+
+async def read_body(scope, receive):
+    # -> the body, None when the client went away, False past MAX_BODY_BYTES. A declared
+    # Content-Length over the limit is refused before any of the body is read
+    for name, value in scope["headers"]:
+        if name == b"content-length" and value.isdigit() and int(value) > MAX_BODY_BYTES:
+            return False
+    chunks, size = [], 0
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            return None
+        chunk = message.get("body", b"")
+        size += len(chunk)
+        if size > MAX_BODY_BYTES:
+            return False
+        chunks.append(chunk)
+        if not message.get("more_body"):
+            return b"".join(chunks)
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            # Drain pending prediction writes before the process exits
+            await asyncio.get_running_loop().run_in_executor(None, prediction_writer.close)
+            inference.shutdown()
+            storage.shutdown()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        return await lifespan(receive, send)
+    if scope["type"] != "http":
+        return
+
+    start = time.perf_counter()
+    body = await read_body(scope, receive)
+    if body is None:
+        return
+    request = Request(scope, body)
+    if body is False:
+        rule, response = "unmatched", error("Request body too large", 413)
+    else:
+        rule, response = await dispatch(request)
+
+    headers = list(response.headers)
+    if response.chunks is None:
+        headers.append((b"content-length", str(len(response.body)).encode()))
+    await send({"type": "http.response.start", "status": response.status, "headers": headers})
+    if response.chunks is None:
+        await send({"type": "http.response.body", "body": response.body})
+    else:
+        async for chunk in response.chunks:
+            await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        await send({"type": "http.response.body", "body": b""})
+
+    elapsed = time.perf_counter() - start
+    REQUEST_SECONDS.observe(elapsed, request.method, rule, str(response.status))
+    if response.status >= 500:
+        log.error("%s %s -> %d in %.1f ms", request.method, request.path, response.status, elapsed * 1000)
+    elif sampled():
+        log.info("%s %s -> %d in %.1f ms", request.method, request.path, response.status, elapsed * 1000)
@@ -0,0 +1,296 @@
+import argparse
+import base64
+import hashlib
+import hmac
+import os
+import secrets
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from bson import ObjectId
+from itsdangerous import BadSignature, SignatureExpired, URLSafeTimedSerializer
+from caching import TTLCache, MISSING
+from log_setup import configure_logging, get_logger
+
+log = get_logger("auth")
+
+# Password hashing and session tokens.
+#
+# Passwords are stored as "pbkdf2_sha256$<iterations>$<salt>$<hash>". Hashing is
+# deliberately slow (~0.15 s at the default cost), so it runs on a small bounded thread
+# pool: hashlib releases the GIL while it works, request threads only wait on the result,
+# and when more logins arrive than the pool can absorb they are refused (PasswordPoolBusy,
+# a 503) instead of piling up. Users stored before hashing existed still have their
+# plaintext password; login accepts it once and replaces it with a hash, and
+#
+#   python auth.py migrate-passwords
+#
+# hashes all of them in one go.
+#
+# A successful login returns a signed, timestamped token (itsdangerous) carrying the user
+# id and a stamp derived from the stored password hash, so changing the password revokes
+# older tokens. Verifying one needs the users collection to check the stamp; the result is
+# kept in a TTL cache, so an authenticated request normally costs a dict lookup instead of
+# a signature check and a users query. A revoked token keeps working until its cache entry
+# expires (AUTH_CACHE_TTL seconds).
+#
+# Registration creates patients. Doctors and admins, who may read every patient's
+# predictions, are appointed offline:
+#
+#   python auth.py set-role doctor@example.com doctor
+
+PASSWORD_SCHEME = "pbkdf2_sha256"
+HASH_ITERATIONS = int(os.environ.get("PASSWORD_HASH_ITERATIONS", "600000"))
+HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 1)))
+# Hash jobs allowed to wait for a worker before new ones are refused
+HASH_QUEUE = int(os.environ.get("PASSWORD_HASH_QUEUE", "32"))
+HASH_TIMEOUT = float(os.environ.get("PASSWORD_HASH_TIMEOUT", "10"))
+TOKEN_MAX_AGE = int(os.environ.get("AUTH_TOKEN_MAX_AGE", str(24 * 3600)))
+TOKEN_CACHE_TTL = float(os.environ.get("AUTH_CACHE_TTL", "60"))
+TOKEN_CACHE_SIZE = int(os.environ.get("AUTH_CACHE_SIZE", "50000"))
+ROLES = ("patient", "doctor", "admin")
+DEFAULT_ROLE = "patient"
+# Roles allowed to see other patients' predictions
+STAFF_ROLES = ("doctor", "admin")
+
+
+class AuthError(Exception):
+    def __init__(self, message, status=401):
+        super().__init__(message)
+        self.status = status
+
+
+class PasswordPoolBusy(Exception):
+    pass
+
+
+def hash_password(password, iterations=HASH_ITERATIONS, salt=None):
+    salt = salt or secrets.token_bytes(16)
+    digest = hashlib.pbkdf2_hmac("sha256", password.encode(), salt, iterations)
+    encode = lambda raw: base64.b64encode(raw).decode().rstrip("=")
+    return f"{PASSWORD_SCHEME}${iterations}${encode(salt)}${encode(digest)}"
+
+
+def is_hashed(stored):
+    return isinstance(stored, str) and stored.startswith(PASSWORD_SCHEME + "$")
+
+
+def check_password(password, stored, iterations=HASH_ITERATIONS):
+    # Returns (matches, needs_rehash); plaintext and weaker hashes need a rehash
+    if not is_hashed(stored):
+        return hmac.compare_digest(str(password).encode(), str(stored).encode()), True
+    _, rounds, salt, digest = stored.split("$")
+    decode = lambda text: base64.b64decode(text + "=" * (-len(text) % 4))
+    actual = hashlib.pbkdf2_hmac("sha256", password.encode(), decode(salt), int(rounds))
+    return hmac.compare_digest(actual, decode(digest)), int(rounds) < iterations
+
+
+def _check_unknown(password, dummy, iterations):
+    check_password(password, dummy, iterations)
+    return False, False
+
+
+class PasswordPool:
+    def __init__(self, workers=HASH_WORKERS, max_pending=HASH_QUEUE, timeout=HASH_TIMEOUT,
+                 iterations=HASH_ITERATIONS):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.iterations = iterations
+        self._slots = threading.BoundedSemaphore(workers + max_pending)
+        self._lock = threading.Lock()
+        self._executor = None
+        self._executor_pid = None
+        self._jobs = 0
+        self._rejected = 0
+        self._busy_total = 0.0
+        self._dummy = None
+
+    def _pool(self):
+        # Threads do not survive fork: a pre-forked worker starts its own pool
+        with self._lock:
+            if self._executor is None or self._executor_pid != os.getpid():
+                self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix="password-hash")
+                self._executor_pid = os.getpid()
+            return self._executor
+
+    def submit(self, fn, *args):
+        # concurrent.futures.Future of fn(*args) on the pool; the async server awaits it
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._rejected += 1
+            raise PasswordPoolBusy("Too many password checks in progress")
+
+        def job():
+            start = time.perf_counter()
+            try:
+                return fn(*args)
+            finally:
+                with self._lock:
+                    self._jobs += 1
+                    self._busy_total += time.perf_counter() - start
+
+        try:
+            future = self._pool().submit(job)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def submit_hash(self, password):
+        return self.submit(hash_password, password, self.iterations)
+
+    def submit_check(self, password, stored):
+        # -> (matches, needs_rehash); stored=None runs a dummy check and never matches
+        if stored is None:
+            # Unknown emails take as long as a wrong password
+            if self._dummy is None:
+                self._dummy = hash_password(secrets.token_hex(8), self.iterations)
+            return self.submit(_check_unknown, password, self._dummy, self.iterations)
+        return self.submit(check_password, password, stored, self.iterations)
+
+    def hash(self, password):
+        return self.submit_hash(password).result(self.timeout)
+
+    def check(self, password, stored):
+        return self.submit_check(password, stored).result(self.timeout)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "max_pending": self.max_pending,
+                "iterations": self.iterations,
+                "jobs": self._jobs,
+                "rejected": self._rejected,
+                "avg_ms": self._busy_total / self._jobs * 1000 if self._jobs else 0.0,
+            }
+
+
+def password_stamp(stored):
+    return hashlib.sha256(str(stored).encode()).hexdigest()[:12]
+
+
+def require_role(identity, roles):
+    if identity.get("role", DEFAULT_ROLE) not in roles:
+        raise AuthError("Forbidden", 403)
+    return identity
+
+
+def public_user(user):
+    return {key: value for key, value in user.items() if key != "password"}
+
+
+def secret_key():
+    key = os.environ.get("SECRET_KEY")
+    if not key:
+        # Forked workers inherit it, but tokens die with the process; set SECRET_KEY
+        log.warning("SECRET_KEY is not set, session tokens will not survive a restart")
+        key = secrets.token_hex(32)
+    return key
+
+
+def bearer_token(header):
+    if header and header[:7].lower() == "bearer ":
+        return header[7:].strip() or None
+    return None
+
+
+class TokenAuth:
+    def __init__(self, secret, max_age=TOKEN_MAX_AGE, cache_ttl=TOKEN_CACHE_TTL, cache_size=TOKEN_CACHE_SIZE):
+        self.max_age = max_age
+        self._serializer = URLSafeTimedSerializer(secret, salt="session")
+        self.cache = TTLCache(maxsize=cache_size, ttl=cache_ttl)
+
+    def issue(self, user):
+        return self._serializer.dumps({"uid": str(user["_id"]), "stamp": password_stamp(user.get("password"))})
+
+    def cached(self, token):
+        # The identity of a recently verified token, or None when verify() has to run
+        entry = self.cache.get(token, MISSING)
+        if entry is MISSING:
+            return None
+        expires_at, identity = entry
+        if time.time() < expires_at:
+            return identity
+        self.cache.pop(token)
+        return None
+
+    def verify(self, token, db):
+        # -> {"user_id": ObjectId, "name", "email", "role"}; raises AuthError
+        identity = self.cached(token)
+        if identity is not None:
+            return identity
+        try:
+            payload, issued = self._serializer.loads(token, max_age=self.max_age, return_timestamp=True)
+            user_id = ObjectId(payload["uid"])
+        except SignatureExpired:
+            raise AuthError("Session expired")
+        except (BadSignature, KeyError, TypeError, ValueError):
+            raise AuthError("Invalid token")
+        user = db.users.find_one({"_id": user_id})
+        if user is None or not hmac.compare_digest(payload.get("stamp", ""), password_stamp(user.get("password"))):
+            raise AuthError("Invalid token")
+        identity = {"user_id": user_id, "name": user.get("name"), "email": user.get("email"),
+                    "role": user.get("role", DEFAULT_ROLE)}
+        self.cache.put(token, (issued.timestamp() + self.max_age, identity))
+        return identity
+
+    def revoke(self, token):
+        self.cache.pop(token)
+
+    def stats(self):
+        return self.cache.stats()
+
+
+def migrate_passwords(db, pool):
+    # Hash every plaintext password still stored; returns how many were migrated
+    pending = [user for user in db.users.find({}) if not is_hashed(user.get("password"))]
+    migrated = 0
+    step = pool.workers + pool.max_pending
+    for start in range(0, len(pending), step):
+        # Offline job: straight to the executor, one chunk at a time instead of the slots
+        chunk = pending[start:start + step]
+        futures = [pool._pool().submit(hash_password, str(user.get("password")), pool.iterations) for user in chunk]
+        for user, future in zip(chunk, futures):
+            db.users.update_one({"_id": user["_id"]}, {"$set": {"password": future.result()}})
+            migrated += 1
+    return migrated
+
+
+def set_role(db, email, role):
+    # Returns whether a user with that email was found. Cached sessions pick the new role
+    # up within AUTH_CACHE_TTL seconds
+    if role not in ROLES:
+        raise ValueError(f"role must be one of {ROLES}")
+    return db.users.update_one({"email": email}, {"$set": {"role": role}}).matched_count > 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Password storage and user role maintenance")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("migrate-passwords", help="hash every plaintext password in the users collection")
+    role_parser = sub.add_parser("set-role", help="make a user a patient, doctor or admin")
+    role_parser.add_argument("email")
+    role_parser.add_argument("role", choices=ROLES)
+    args = parser.parse_args(argv)
+    configure_logging()
+
+    from database import STORAGE_DEFAULTS, connect, storage_setting
+    client, db = connect({key: storage_setting(None, key) for key in STORAGE_DEFAULTS})
+    if args.command == "set-role":
+        if not set_role(db, args.email, args.role):
+            print(f"No user with email {args.email}")
+            return 1
+        print(f"{args.email} is now a {args.role}")
+        return 0
+    start = time.perf_counter()
+    migrated = migrate_passwords(db, PasswordPool())
+    print(f"Hashed {migrated} plaintext passwords in {time.perf_counter() - start:.1f} s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
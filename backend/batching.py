@@ -0,0 +1,113 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+# Coalesces concurrent single-row predictions into one batched model call.
+
+
+class MicroBatcher:
+    def __init__(self, predict_fn, max_batch_size=64, max_wait_ms=2.0):
+        self.predict_fn = predict_fn # takes a list of inputs, returns a list of results
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker = None
+        self._worker_pid = None
+        self._reset_metrics()
+
+    def _reset_metrics(self):
+        self._batches = 0
+        self._requests = 0
+        self._max_batch = 0
+        self._size_buckets = {} # batch size rounded up to a power of two -> count
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def submit(self, item):
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((item, future, time.perf_counter()))
+        return future
+
+    def predict(self, item, timeout=None):
+        return self.submit(item).result(timeout)
+
+    def _ensure_worker(self):
+        # Threads do not survive fork, so a worker started in a parent process is restarted
+        if self._worker is not None and self._worker_pid == os.getpid() and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._worker is None or self._worker_pid != os.getpid() or not self._worker.is_alive():
+                self._worker_pid = os.getpid()
+                self._worker = threading.Thread(target=self._run, name="predict-batcher", daemon=True)
+                self._worker.start()
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            # Anything already queued joins immediately. A lone request goes out at once, since
+            # whatever arrives while the model runs is batched on the next pass; the window is
+            # only waited out while requests are queueing up behind each other
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except queue.Empty:
+                pass
+            if len(batch) == 1:
+                break
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            started = time.perf_counter()
+            self._record(len(batch), [started - enqueued for _, _, enqueued in batch])
+
+            items = [item for item, _, _ in batch]
+            try:
+                results = self.predict_fn(items)
+            except Exception:
+                # Retry one by one so a single bad payload only fails its own request
+                for item, future, _ in batch:
+                    try:
+                        future.set_result(self.predict_fn([item])[0])
+                    except Exception as e:
+                        future.set_exception(e)
+                continue
+
+            for (_, future, _), result in zip(batch, results):
+                future.set_result(result)
+
+    def _record(self, size, waits):
+        bucket = 1 << (size - 1).bit_length()
+        with self._lock:
+            self._batches += 1
+            self._requests += size
+            self._max_batch = max(self._max_batch, size)
+            self._size_buckets[bucket] = self._size_buckets.get(bucket, 0) + 1
+            self._wait_total += sum(waits)
+            self._wait_max = max(self._wait_max, max(waits))
+
+    def stats(self):
+        with self._lock:
+            return {
+                "batches": self._batches,
+                "requests": self._requests,
+                "queue_depth": self._queue.qsize(),
+                "avg_batch_size": self._requests / self._batches if self._batches else 0.0,
+                "max_batch_size": self._max_batch,
+                "batch_size_buckets": {str(k): v for k, v in sorted(self._size_buckets.items())},
+                "avg_queue_wait_ms": self._wait_total / self._requests * 1000 if self._requests else 0.0,
+                "max_queue_wait_ms": self._wait_max * 1000,
+            }
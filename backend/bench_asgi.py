@@ -0,0 +1,132 @@
+import argparse
+import asyncio
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+import numpy as np
+from bench_prefork import BACKEND_DIR, children, free_port, memory_kb, wait_ready
+
+# Many concurrent connections against the threaded Flask server (serve.py, one worker) and
+# the ASGI variant (serve_asgi.py). Every client holds a connection open (reconnecting when
+# the server closes it, as werkzeug does after each HTTP/1.0 response) and sends
+# /api/predict requests with a think time in between, so most of the connections are idle
+# at any moment, like browsers on a busy day. Reports throughput, latency percentiles,
+# failures, and the serving process's peak thread count and memory.
+# Usage: python bench_asgi.py [--connections 100 1000 2000] [--seconds 15] [--think-ms 500]
+
+MODES = {
+    "threaded": lambda port: [sys.executable, "serve.py", "--workers", "1", "--port", str(port), "--backlog", "4096"],
+    "asgi": lambda port: [sys.executable, "serve_asgi.py", "--port", str(port), "--backlog", "4096"],
+}
+
+
+def threads_of(pid):
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("Threads:"):
+                return int(line.split()[1])
+    return 0
+
+
+async def read_response(reader):
+    head = await reader.readuntil(b"\r\n\r\n")
+    lines = head.decode("latin-1").split("\r\n")
+    version, status = lines[0].split(" ", 2)[:2]
+    headers = {}
+    for line in lines[1:]:
+        if line:
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip().lower()
+    await reader.readexactly(int(headers.get("content-length", "0")))
+    keep_alive = headers.get("connection") != "close" and version == "HTTP/1.1"
+    return int(status), keep_alive
+
+
+async def client(n, port, deadline, think, stats):
+    reader = writer = None
+    i = n
+    while time.monotonic() < deadline:
+        body = json.dumps({"symptoms": {"glucose": 60 + i % 190, "hba1c": 4 + i % 9}}).encode()
+        request = (f"POST /api/predict HTTP/1.1\r\nHost: bench\r\nContent-Type: application/json\r\n"
+                   f"Content-Length: {len(body)}\r\n\r\n").encode() + body
+        start = time.perf_counter()
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection("127.0.0.1", port, limit=1 << 16)
+            writer.write(request)
+            status, keep_alive = await asyncio.wait_for(read_response(reader), 30)
+            stats["latencies"].append(time.perf_counter() - start)
+            if status != 200:
+                stats["errors"] += 1
+            if not keep_alive:
+                writer.close()
+                writer = None
+        except (OSError, asyncio.IncompleteReadError, asyncio.TimeoutError):
+            stats["errors"] += 1
+            if writer is not None:
+                writer.close()
+            writer = None
+        i += 1
+        # Spread the clients out instead of firing in lockstep
+        await asyncio.sleep(think * (0.5 + (i * 7919 % 1000) / 1000))
+    if writer is not None:
+        writer.close()
+
+
+async def sample(pid, deadline, stats):
+    # Peak thread count and RSS of the serving process while the clients run
+    while time.monotonic() < deadline:
+        stats["threads"] = max(stats["threads"], threads_of(pid))
+        stats["rss_kb"] = max(stats["rss_kb"], memory_kb(pid)["rss"])
+        await asyncio.sleep(0.5)
+
+
+async def load(port, pid, connections, seconds, think):
+    stats = {"latencies": [], "errors": 0, "threads": 0, "rss_kb": 0}
+    deadline = time.monotonic() + seconds
+    start = time.monotonic()
+    await asyncio.gather(sample(pid, deadline, stats),
+                         *(client(n, port, deadline, think, stats) for n in range(connections)))
+    return stats, time.monotonic() - start
+
+
+def measure(mode, connections, args):
+    port = free_port()
+    env = dict(os.environ, STORAGE_BACKEND="memory", LOG_LEVEL="WARNING")
+    server = subprocess.Popen(MODES[mode](port), cwd=BACKEND_DIR, env=env)
+    try:
+        wait_ready(f"http://127.0.0.1:{port}", args.startup_timeout)
+        # serve.py answers from a forked worker; the ASGI server is a single process
+        pid = children(server.pid)[0] if mode == "threaded" else server.pid
+        stats, elapsed = asyncio.run(load(port, pid, connections, args.seconds, args.think_ms / 1000))
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=60)
+    latencies = np.array(stats["latencies"]) * 1000 if stats["latencies"] else np.zeros(1)
+    p50, p99 = np.percentile(latencies, [50, 99])
+    return {"req_s": len(stats["latencies"]) / elapsed, "p50_ms": p50, "p99_ms": p99,
+            "errors": stats["errors"], "threads": stats["threads"], "rss_mb": stats["rss_kb"] / 1024}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--modes", nargs="+", choices=list(MODES), default=list(MODES))
+    parser.add_argument("--connections", type=int, nargs="+", default=[100, 1000, 2000])
+    parser.add_argument("--seconds", type=float, default=15)
+    parser.add_argument("--think-ms", type=float, default=500)
+    parser.add_argument("--startup-timeout", type=float, default=120)
+    args = parser.parse_args()
+
+    print(f"{'mode':>9} {'conns':>6} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>9} {'errors':>7} {'threads':>8} {'RSS MB':>7}")
+    for connections in args.connections:
+        for mode in args.modes:
+            row = measure(mode, connections, args)
+            print(f"{mode:>9} {connections:>6} {row['req_s']:>8.1f} {row['p50_ms']:>8.1f} {row['p99_ms']:>9.1f} "
+                  f"{row['errors']:>7} {row['threads']:>8} {row['rss_mb']:>7.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+import argparse
+import contextlib
+import io
+import json
+import tempfile
+import threading
+import time
+import numpy as np
+from bson import ObjectId
+from app import app
+from auth import hash_password
+from database import mongo
+from routes import password_pool, sessions
+
+# Login throughput with concurrent clients, and what the other endpoints pay for auth:
+# a /api/health probe timed while the logins run (hashing must not stall other request
+# threads), token verification from the cache and without it, and /api/predict with a
+# bearer token versus anonymously.
+# Usage: python bench_auth.py [--clients 1 2 4 8] [--seconds 3] [--requests 500]
+
+
+def configure():
+    app.config["STORAGE_BACKEND"] = "memory"
+    app.config["MONGITA_PATH"] = tempfile.mkdtemp()
+    app.config["MONGO_DBNAME"] = "bench_auth"
+    mongo.init_app(app)
+
+
+def post(client, url, payload, headers=None):
+    return client.post(url, data=json.dumps(payload), content_type="application/json", headers=headers)
+
+
+def percentiles(latencies):
+    if not latencies:
+        return 0.0, 0.0
+    p50, p95 = np.percentile(np.array(latencies) * 1000, [50, 95])
+    return p50, p95
+
+
+def login_load(n_clients, seconds, n_users):
+    latencies, statuses, probes = [], [], []
+    lock = threading.Lock()
+    deadline = time.monotonic() + seconds
+
+    def login(n):
+        client = app.test_client()
+        i = n
+        while time.monotonic() < deadline:
+            start = time.perf_counter()
+            response = post(client, "/api/auth/login", {"email": f"p{i % n_users}@example.com", "password": "pw"})
+            with lock:
+                latencies.append(time.perf_counter() - start)
+                statuses.append(response.status_code)
+            i += n_clients
+
+    def probe():
+        client = app.test_client()
+        while time.monotonic() < deadline:
+            start = time.perf_counter()
+            client.get("/api/health")
+            probes.append(time.perf_counter() - start)
+            time.sleep(0.01)
+
+    threads = [threading.Thread(target=login, args=(n,)) for n in range(n_clients)] + [threading.Thread(target=probe)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    ok = sum(1 for status in statuses if status == 200)
+    return {
+        "logins_per_s": ok / elapsed,
+        "login_p50_ms": percentiles(latencies)[0],
+        "login_p95_ms": percentiles(latencies)[1],
+        "busy_503": sum(1 for status in statuses if status == 503),
+        "probe_p95_ms": percentiles(probes)[1],
+    }
+
+
+def per_request_us(fn, n):
+    start = time.perf_counter()
+    for i in range(n):
+        fn(i)
+    return (time.perf_counter() - start) / n * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--seconds", type=float, default=3)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--requests", type=int, default=500)
+    args = parser.parse_args()
+
+    configure()
+    password = hash_password("pw")
+    users = [{"_id": ObjectId(), "name": f"Patient {i}", "email": f"p{i}@example.com", "password": password}
+             for i in range(args.users)]
+    mongo.db.users.insert_many(users)
+
+    print(f"Password hashing: {password_pool.iterations} iterations, {password_pool.workers} workers, "
+          f"{password_pool.max_pending} pending")
+    print(f"{'clients':>8} {'logins/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'503s':>5} {'health p95 ms':>14}")
+    for n_clients in args.clients:
+        with contextlib.redirect_stdout(io.StringIO()):
+            row = login_load(n_clients, args.seconds, args.users)
+        print(f"{n_clients:>8} {row['logins_per_s']:>9.1f} {row['login_p50_ms']:>8.1f} {row['login_p95_ms']:>8.1f} "
+              f"{row['busy_503']:>5} {row['probe_p95_ms']:>14.2f}")
+
+    tokens = [sessions.issue(user) for user in users]
+    sessions.cache.clear()
+    db = mongo.db
+    uncached = per_request_us(lambda i: (sessions.cache.clear(), sessions.verify(tokens[i % len(tokens)], db)),
+                              args.requests)
+    cached = per_request_us(lambda i: sessions.verify(tokens[i % len(tokens)], db), args.requests)
+
+    client = app.test_client()
+    headers = [{"Authorization": f"Bearer {token}"} for token in tokens]
+    samples = [{"glucose": 60 + i % 190, "hba1c": 4 + i % 9} for i in range(args.requests)]
+    anonymous = per_request_us(lambda i: post(client, "/api/predict", {"symptoms": samples[i]}), args.requests)
+    authenticated = per_request_us(lambda i: post(client, "/api/predict", {"symptoms": samples[i]},
+                                                  headers[i % len(headers)]), args.requests)
+
+    print(f"token verify, uncached : {uncached:8.1f} us")
+    print(f"token verify, cached   : {cached:8.1f} us")
+    print(f"/api/predict anonymous : {anonymous:8.1f} us")
+    print(f"/api/predict with token: {authenticated:8.1f} us ({authenticated - anonymous:+.1f} us)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+import argparse
+import threading
+import time
+from batching import MicroBatcher
+from ml_model import predictor
+
+# Throughput of concurrent single-row predictions, with and without micro-batching.
+# Usage: python bench_batching.py [--threads 32] [--requests 2000]
+
+
+def run(predict, threads, total):
+    payloads = [{"glucose": 50 + i % 200, "hba1c": 4 + i % 7} for i in range(total)]
+    per_thread = total // threads
+
+    def worker(offset):
+        for payload in payloads[offset:offset + per_thread]:
+            predict(payload)
+
+    workers = [threading.Thread(target=worker, args=(i * per_thread,)) for i in range(threads)]
+    start = time.perf_counter()
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    return per_thread * threads / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--window-ms", type=float, default=2.0)
+    parser.add_argument("--max-batch", type=int, default=64)
+    args = parser.parse_args()
+
+    direct = run(predictor.predict, args.threads, args.requests)
+    batcher = MicroBatcher(predictor.predict_batch, args.max_batch, args.window_ms)
+    batched = run(batcher.predict, args.threads, args.requests)
+
+    print(f"direct : {direct:10.1f} req/s")
+    print(f"batched: {batched:10.1f} req/s ({batched / direct:.1f}x)")
+    for key, value in batcher.stats().items():
+        print(f"  {key}: {value}")
+
+
+if __name__ == "__main__":
+    main()
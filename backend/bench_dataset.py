@@ -0,0 +1,105 @@
+import argparse
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+import dataset
+from ml_model import FEATURE_NAMES, TRAIN_PATH
+
+# Load time of a training CSV through pandas (parse + per-column fillna, what every
+# consumer used to do) vs. the columnar cache in dataset.py: the first build, a load in a
+# fresh process (hash + memory-map) and a repeated load in the same process.
+# Also the streaming statistics pass (dataset.scan) and the peak Python heap of it vs. the
+# pandas load. --scale N also measures a synthetic CSV with N times the rows of the
+# training set.
+# Usage: python bench_dataset.py [--runs 20] [--scale 50]
+
+
+def legacy_load(path):
+    df = pd.read_csv(path)
+    for col in df.columns:
+        if not pd.api.types.is_numeric_dtype(df[col]):
+            df[col] = df[col].fillna(df[col].mode()[0])
+        else:
+            df[col] = df[col].fillna(df[col].mean())
+    df.columns = [c.strip() for c in df.columns]
+    return df[FEATURE_NAMES].to_numpy(dtype=np.float64), df["Disease"].to_numpy()
+
+
+def best_ms(fn, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1000
+
+
+def peak_mb(fn):
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1] / 1e6
+    finally:
+        tracemalloc.stop()
+
+
+def measure(path, runs):
+    cache_dir = tempfile.mkdtemp()
+    try:
+        def cold():
+            dataset._loaded.clear()
+            ds = dataset.load(path, cache_dir)
+            return ds.matrix(FEATURE_NAMES, np.float64), ds.labels()
+
+        def build():
+            shutil.rmtree(cache_dir, ignore_errors=True)
+            cold()
+
+        return {
+            "rows": len(dataset.load(path, cache_dir)),
+            "pandas": best_ms(lambda: legacy_load(path), runs),
+            "build": best_ms(build, max(1, runs // 5)),
+            "cold": best_ms(cold, runs),
+            "warm": best_ms(lambda: dataset.load(path, cache_dir).matrix(FEATURE_NAMES, np.float64), runs),
+            "scan": best_ms(lambda: dataset.scan(path), max(1, runs // 5)),
+            "pandas_peak": peak_mb(lambda: legacy_load(path)),
+            "scan_peak": peak_mb(lambda: dataset.scan(path)),
+        }
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--scale", type=int, default=0)
+    args = parser.parse_args()
+
+    paths = [("training CSV", TRAIN_PATH, args.runs)]
+    tmp = None
+    if args.scale > 1:
+        tmp = tempfile.mkdtemp()
+        big = os.path.join(tmp, "scaled.csv")
+        df = pd.read_csv(TRAIN_PATH)
+        pd.concat([df] * args.scale, ignore_index=True).to_csv(big, index=False)
+        paths.append((f"x{args.scale}", big, max(1, args.runs // 5)))
+
+    print(f"{'dataset':<14} {'rows':>9} {'MB':>7} {'pandas ms':>10} {'build ms':>9} {'cold ms':>8} {'warm ms':>8} "
+          f"{'scan ms':>8} {'pandas peak MB':>15} {'scan peak MB':>13}")
+    try:
+        for label, path, runs in paths:
+            r = measure(path, runs)
+            print(f"{label:<14} {r['rows']:>9} {os.path.getsize(path) / 1e6:>7.1f} {r['pandas']:>10.2f} "
+                  f"{r['build']:>9.2f} {r['cold']:>8.2f} {r['warm']:>8.3f} {r['scan']:>8.1f} "
+                  f"{r['pandas_peak']:>15.1f} {r['scan_peak']:>13.1f}")
+    finally:
+        if tmp:
+            shutil.rmtree(tmp)
+
+
+if __name__ == "__main__":
+    main()
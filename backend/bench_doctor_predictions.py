@@ -0,0 +1,74 @@
+import argparse
+import random
+import tempfile
+import time
+from bson import ObjectId
+from mongita import MongitaClientDisk, MongitaClientMemory
+from caching import TTLCache
+from routes import attach_patient_names
+
+# Patient-name join for /api/doctor/predictions: one find_one per prediction vs. a bulk $in join.
+# Usage: python bench_doctor_predictions.py [--users 10000] [--predictions 200000] [--disk]
+
+
+def seed(db, n_users, n_predictions):
+    users = [{"_id": ObjectId(), "name": f"Patient {i}", "email": f"p{i}@example.com"} for i in range(n_users)]
+    db.users.insert_many(users)
+    rng = random.Random(42)
+    batch = []
+    for i in range(n_predictions):
+        # A few anonymous predictions, like the live data
+        user_id = users[rng.randrange(n_users)]["_id"] if i % 50 else None
+        batch.append({"user_id": user_id, "input_data": {}, "prediction_result": "Healthy"})
+        if len(batch) == 10000:
+            db.predictions.insert_many(batch)
+            batch = []
+    if batch:
+        db.predictions.insert_many(batch)
+
+
+def naive_join(db, predictions):
+    for p in predictions:
+        user_name = "Anonymous"
+        if p.get('user_id'):
+            user = db.users.find_one({"_id": p['user_id']})
+            if user:
+                user_name = user.get('name', 'Unknown')
+        p['patient_name'] = user_name
+    return predictions
+
+
+def timed(label, fn):
+    start = time.perf_counter()
+    result = fn()
+    print(f"{label:<28} {time.perf_counter() - start:8.3f} s")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--predictions", type=int, default=200000)
+    parser.add_argument("--skip-naive", action="store_true", help="skip the slow per-row baseline")
+    parser.add_argument("--disk", action="store_true", help="use a temporary Mongita disk store")
+    args = parser.parse_args()
+
+    client = MongitaClientDisk(host=tempfile.mkdtemp()) if args.disk else MongitaClientMemory()
+    db = client["bench_doctor_predictions"]
+    timed(f"seed {args.users}/{args.predictions}", lambda: seed(db, args.users, args.predictions))
+    predictions = timed("load predictions", lambda: list(db.predictions.find()))
+
+    if not args.skip_naive:
+        expected = timed("naive find_one per row", lambda: [p['patient_name'] for p in naive_join(db, predictions)])
+    bulk = timed("bulk $in join", lambda: [p['patient_name'] for p in attach_patient_names(db, predictions)])
+
+    cache = TTLCache(maxsize=50000, ttl=60)
+    timed("bulk join, cold cache", lambda: attach_patient_names(db, predictions, cache))
+    timed("bulk join, warm cache", lambda: attach_patient_names(db, predictions, cache))
+
+    if not args.skip_naive:
+        print(f"results identical: {expected == bulk}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+import argparse
+import itertools
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+from bson import ObjectId
+from mongita import MongitaClientDisk
+from database import ensure_indexes
+from routes import iter_newest_first
+
+# Query latency of the login, history and dashboard lookups as the collections grow,
+# with and without the registry indexes, on a temporary Mongita disk store.
+# Usage: python bench_indexes.py [--sizes 1000 5000 20000] [--queries 50]
+
+
+def seed(db, n_users, predictions_per_user):
+    users = [{"_id": ObjectId(), "name": f"Patient {i}", "email": f"p{i}@example.com"} for i in range(n_users)]
+    db.users.insert_many(users)
+    rng = random.Random(0)
+    start = datetime(2024, 1, 1)
+    predictions = [{"_id": ObjectId(), "user_id": users[rng.randrange(n_users)]["_id"], "prediction_result": "Healthy",
+                    "created_at": start + timedelta(seconds=i)}
+                   for i in range(n_users * predictions_per_user)]
+    db.predictions.insert_many(predictions)
+    return users, predictions
+
+
+def avg_ms(fn, args):
+    start = time.perf_counter()
+    for arg in args:
+        fn(arg)
+    return (time.perf_counter() - start) / len(args) * 1000
+
+
+def measure(db, users, predictions, queries):
+    rng = random.Random(1)
+    emails = [rng.choice(users)["email"] for _ in range(queries)]
+    user_ids = [rng.choice(users)["_id"] for _ in range(queries)]
+    cursors = [(p["created_at"], p["_id"]) for p in rng.sample(predictions, queries)]
+    return {
+        "login": avg_ms(lambda email: db.users.find_one({"email": email}), emails),
+        "history": avg_ms(lambda uid: list(iter_newest_first(db.predictions, {"user_id": uid})), user_ids),
+        "dashboard page": avg_ms(lambda after: list(itertools.islice(
+            iter_newest_first(db.predictions, {}, after), 50)), cursors),
+        "insert": avg_ms(lambda i: db.predictions.insert_one(
+            {"user_id": user_ids[i], "created_at": datetime.utcnow()}), range(min(queries, 20))),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 5000, 20000], help="number of users")
+    parser.add_argument("--predictions-per-user", type=int, default=5)
+    parser.add_argument("--queries", type=int, default=50)
+    args = parser.parse_args()
+
+    print(f"{'users':>7} {'preds':>8} {'query':<15} {'no index (ms)':>14} {'indexed (ms)':>13}")
+    for n_users in args.sizes:
+        db = MongitaClientDisk(host=tempfile.mkdtemp())["bench_indexes"]
+        users, predictions = seed(db, n_users, args.predictions_per_user)
+        before = measure(db, users, predictions, args.queries)
+        ensure_indexes(db)
+        after = measure(db, users, predictions, args.queries)
+        for query in before:
+            print(f"{n_users:>7} {len(predictions):>8} {query:<15} {before[query]:>14.2f} {after[query]:>13.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+import argparse
+import os
+import sys
+import numpy as np
+import sklearn.ensemble # noqa: F401 - counted in the baseline, not as model memory
+from bench_prefork import memory_kb
+
+# Memory footprint of the serving model: bytes per tree of sklearn's trees, of the
+# float64/int64 flat layout the engine used before and of the compact engine, the size of
+# the artifact and the process RSS/USS before and after loading it. Also checks that the
+# compact engine predicts exactly what the sklearn forest does on the test CSV (exit 1
+# otherwise).
+# Usage: python bench_model_memory.py
+
+
+def sklearn_tree_bytes(model):
+    total = 0
+    for estimator in model.estimators_:
+        state = estimator.tree_.__getstate__()
+        total += state["nodes"].nbytes + state["values"].nbytes
+    return total
+
+
+def wide_layout_bytes(engine):
+    # int64 feature, float64 threshold, 2 x int64 children and a float64 class
+    # distribution per node, int64 roots
+    per_node = 8 + 8 + 16 + 8 * len(engine.classes)
+    return engine.n_nodes * per_node + 8 * engine.n_trees
+
+
+def main():
+    argparse.ArgumentParser().parse_args()
+    before = memory_kb(os.getpid())
+    import model_store
+    from ml_model import TEST_PATH, load_dataset, predictor
+    after = memory_kb(os.getpid())
+
+    engine = predictor.engine
+    n_trees = engine.n_trees
+    print(f"Model {predictor.version}: {n_trees} trees, {engine.n_nodes} nodes, "
+          f"{len(engine.table)} distinct leaf distributions")
+    print(f"\n{'representation':<28} {'bytes/tree':>11} {'total KB':>10}")
+    for label, size in (("sklearn trees", sklearn_tree_bytes(predictor.model)),
+                        ("flat engine, float64/int64", wide_layout_bytes(engine)),
+                        ("flat engine, compact", engine.nbytes)):
+        print(f"{label:<28} {size / n_trees:>11.0f} {size / 1024:>10.1f}")
+    for name in ("feature", "threshold", "children", "leaf", "table", "roots"):
+        array = getattr(engine, name)
+        print(f"  {name:<26} {array.dtype.name:>11} {array.nbytes / 1024:>10.1f}")
+
+    path = model_store.artifact_path(predictor.version, predictor.artifact_dir)
+    if os.path.exists(path):
+        print(f"\nArtifact: {os.path.getsize(path) / 1e6:.1f} MB ({path})")
+    print(f"RSS {before['rss'] / 1024:.1f} -> {after['rss'] / 1024:.1f} MB, "
+          f"USS {before['uss'] / 1024:.1f} -> {after['uss'] / 1024:.1f} MB after loading the model")
+
+    X, y = load_dataset(TEST_PATH, predictor.feature_names)
+    X = predictor.to_matrix(X)
+    X_scaled = (X - predictor.scaler.mean_) / predictor.scaler.scale_
+    same_labels = np.array_equal(engine.predict(X_scaled), predictor.model.predict(X_scaled))
+    same_proba = np.array_equal(engine.predict_proba(X_scaled), predictor.model.predict_proba(X_scaled))
+    print(f"\nTest rows: {len(X)} | identical predictions: {same_labels} | identical probabilities: {same_proba}")
+    return 0 if same_labels and same_proba else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
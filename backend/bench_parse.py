@@ -0,0 +1,57 @@
+import timeit
+import numpy as np
+from ml_model import predictor
+
+# Micro-benchmark of the per-request payload parsing in DiseasePredictor.
+# Usage: python bench_parse.py
+
+FULL_PAYLOAD = {
+    "glucose": 100, "cholesterol": 200, "hemoglobin": 13, "platelets": 250000,
+    "white_blood_cells": 6000, "red_blood_cells": 4.5, "hematocrit": 40,
+    "mean_corpuscular_volume": 85, "mean_corpuscular_hemoglobin": 28,
+    "mean_corpuscular_hemoglobin_concentration": 33, "insulin": 10, "bmi": 24,
+    "systolic_blood_pressure": 120, "diastolic_blood_pressure": 80, "triglycerides": 150,
+    "hba1c": 5.5, "ldl_cholesterol": 100, "hdl_cholesterol": 50, "alt": 20, "ast": 25,
+    "heart_rate": 70, "creatinine": 0.9, "troponin": 0.01, "c_reactive_protein": 0.5
+}
+SPARSE_PAYLOAD = {"glucose": "250", "hba1c": "9.0"}
+
+
+def legacy_parse(p, input_data):
+    # The original per-request implementation, kept here for comparison
+    features = []
+    for name in p.feature_names:
+        normalized_name = name.lower().replace(" ", "_").replace("-", "_")
+        alt_name = name.replace("_", " ")
+        val = input_data.get(name) or input_data.get(normalized_name) or input_data.get(alt_name)
+        default_val = p.feature_means.get(name, 0.0)
+        if val is None or val == "":
+            features.append(default_val)
+        else:
+            try:
+                features.append(float(val))
+            except (ValueError, TypeError):
+                features.append(default_val)
+    return features
+
+
+def current_parse(p, input_data):
+    # Includes building the (1, 24) numpy matrix, which the legacy numbers leave out
+    return p.to_matrix([input_data])
+
+
+def bench(fn, payload, number=20000):
+    seconds = min(timeit.repeat(lambda: fn(predictor, payload), number=number, repeat=5))
+    return seconds / number * 1e6
+
+
+if __name__ == "__main__":
+    # Sanity check: both implementations agree on inputs without falsy values
+    for payload in (FULL_PAYLOAD, SPARSE_PAYLOAD):
+        assert np.allclose(legacy_parse(predictor, payload), current_parse(predictor, payload)[0])
+
+    print(f"{'payload':<10} {'legacy (us)':>12} {'current (us)':>13} {'speedup':>8}")
+    for label, payload in (("full", FULL_PAYLOAD), ("sparse", SPARSE_PAYLOAD)):
+        before = bench(legacy_parse, payload)
+        after = bench(current_parse, payload)
+        print(f"{label:<10} {before:>12.2f} {after:>13.2f} {before / after:>7.1f}x")
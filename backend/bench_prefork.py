@@ -0,0 +1,121 @@
+import argparse
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+
+# Requests per second and per-worker memory of serve.py at several worker counts. Memory
+# is read from /proc: RSS counts shared pages in every process, PSS splits them between
+# the processes sharing them and USS is what each worker holds privately.
+# Usage: python bench_prefork.py [--workers 1 4 8] [--clients 16] [--seconds 10]
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_ready(url, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(url + "/api/ready", timeout=1) as response:
+                if response.status == 200:
+                    return
+        except Exception:
+            time.sleep(0.2)
+    raise RuntimeError("server did not become ready")
+
+
+def children(pid):
+    with open(f"/proc/{pid}/task/{pid}/children") as f:
+        return [int(p) for p in f.read().split()]
+
+
+def memory_kb(pid):
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1])
+    return {"rss": fields["Rss"], "pss": fields["Pss"],
+            "uss": fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0)}
+
+
+def load(url, clients, seconds):
+    count = [0] * clients
+    errors = [0] * clients
+    deadline = time.monotonic() + seconds
+
+    def client(n):
+        i = n
+        while time.monotonic() < deadline:
+            body = json.dumps({"symptoms": {"glucose": 60 + i % 190, "hba1c": 4 + i % 9}}).encode()
+            request = urllib.request.Request(url + "/api/predict", data=body,
+                                             headers={"Content-Type": "application/json"})
+            try:
+                with urllib.request.urlopen(request, timeout=10) as response:
+                    response.read()
+                count[n] += 1
+            except Exception:
+                errors[n] += 1
+            i += clients
+
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(clients)]
+    start = time.monotonic()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return sum(count) / (time.monotonic() - start), sum(errors)
+
+
+def measure(workers, args):
+    port = free_port()
+    url = f"http://127.0.0.1:{port}"
+    command = [sys.executable, "serve.py", "--workers", str(workers), "--port", str(port)]
+    if args.no_gc_freeze:
+        command.append("--no-gc-freeze")
+    env = dict(os.environ, STORAGE_BACKEND="memory", LOG_LEVEL="WARNING")
+    server = subprocess.Popen(command, cwd=BACKEND_DIR, env=env)
+    try:
+        wait_ready(url, args.startup_timeout)
+        rps, errors = load(url, args.clients, args.seconds)
+        worker_mem = [memory_kb(pid) for pid in children(server.pid)]
+        master_mem = memory_kb(server.pid)
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=30)
+    avg = {key: sum(m[key] for m in worker_mem) / len(worker_mem) / 1024 for key in ("rss", "pss", "uss")}
+    total_pss = (sum(m["pss"] for m in worker_mem) + master_mem["pss"]) / 1024
+    return rps, errors, avg, total_pss
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--startup-timeout", type=float, default=120)
+    parser.add_argument("--no-gc-freeze", action="store_true")
+    args = parser.parse_args()
+
+    print(f"{'workers':>7} {'req/s':>9} {'errors':>7} {'RSS/worker MB':>14} {'PSS/worker MB':>14} "
+          f"{'USS/worker MB':>14} {'total PSS MB':>13}")
+    for workers in args.workers:
+        rps, errors, avg, total_pss = measure(workers, args)
+        print(f"{workers:>7} {rps:>9.1f} {errors:>7} {avg['rss']:>14.1f} {avg['pss']:>14.1f} "
+              f"{avg['uss']:>14.1f} {total_pss:>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+import argparse
+import json
+import random
+import time
+from datetime import datetime, timedelta
+from bson import ObjectId, json_util
+from mongita import MongitaClientMemory
+from app import app
+from bench_parse import FULL_PAYLOAD
+from database import mongo
+from routes import HISTORY_FIELDS, fetch_page, model_holder
+import serialization
+
+HAS_ORJSON = serialization.HAS_ORJSON
+
+# Encoding of large history pages: the former parse_json + jsonify round trip (json_util to a
+# string, json.loads back to dicts, the Flask provider again) against serialization.dumps with
+# the stdlib encoder and with orjson, on whole documents and on the HISTORY_FIELDS projection.
+# The last table times fetch_page + encoding end to end on an in-memory store.
+# Usage: python bench_serialization.py [--sizes 50 500 5000] [--explained 0.5]
+
+
+def make_docs(n, explained):
+    # Like a busy patient's history: every input stored, some rows with a stored explanation
+    rng = random.Random(42)
+    user_id = ObjectId()
+    explanation = model_holder.current.explain_batch([FULL_PAYLOAD], 3)[0]
+    explanation.pop("prediction")
+    base = datetime(2024, 1, 1)
+    docs = []
+    for i in range(n):
+        inputs = {name: round(value * rng.uniform(0.8, 1.2), 3) for name, value in FULL_PAYLOAD.items()}
+        doc = {"_id": ObjectId(), "user_id": user_id, "input_data": inputs, "prediction_result": "Diabetes",
+               "model_version": "a1b2c3d4", "created_at": base + timedelta(seconds=i, microseconds=i * 1000)}
+        if rng.random() < explained:
+            doc["explanation"] = explanation
+        docs.append(doc)
+    return docs
+
+
+def legacy(docs):
+    with app.app_context():
+        return app.json.dumps(json.loads(json_util.dumps(docs)), separators=(",", ":")).encode()
+
+
+def stdlib(docs):
+    serialization.HAS_ORJSON = False
+    try:
+        return serialization.dumps(docs)
+    finally:
+        serialization.HAS_ORJSON = HAS_ORJSON
+
+
+def best_ms(fn, docs, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        body = fn(docs)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000, len(body)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[50, 500, 5000])
+    parser.add_argument("--explained", type=float, default=0.5, help="share of rows with a stored explanation")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    encoders = [("legacy", legacy), ("stdlib", stdlib)]
+    if HAS_ORJSON:
+        encoders.append(("orjson", serialization.dumps))
+    print(f"{'docs':>6} {'encoder':>8} {'whole ms':>9} {'whole KB':>9} {'projected ms':>13} {'projected KB':>13}")
+    for n in args.sizes:
+        docs = make_docs(n, args.explained)
+        projected = [serialization.project(doc, HISTORY_FIELDS) for doc in docs]
+        assert json.loads(legacy(docs)) == json.loads(serialization.dumps(docs))
+        for name, fn in encoders:
+            whole_ms, whole_bytes = best_ms(fn, docs, args.repeat)
+            projected_ms, projected_bytes = best_ms(fn, projected, args.repeat)
+            print(f"{n:>6} {name:>8} {whole_ms:>9.2f} {whole_bytes / 1024:>9.1f} "
+                  f"{projected_ms:>13.2f} {projected_bytes / 1024:>13.1f}")
+
+    print(f"\n{'limit':>6} {'path':>18} {'ms':>8}")
+    saved = mongo.db
+    mongo.db = MongitaClientMemory()["bench_serialization"]
+    try:
+        docs = make_docs(max(args.sizes), args.explained)
+        mongo.db.predictions.insert_many(docs)
+        query = {"user_id": docs[0]["user_id"]}
+        paths = [("legacy, whole", lambda limit: legacy(fetch_page(query, None, limit)[0])),
+                 ("single pass, whole", lambda limit: serialization.dumps(fetch_page(query, None, limit)[0])),
+                 ("single pass, fields", lambda limit: serialization.dumps(
+                     fetch_page(query, None, limit, fields=HISTORY_FIELDS)[0]))]
+        for limit in (50, 500):
+            for name, fn in paths:
+                print(f"{limit:>6} {name:>18} {best_ms(fn, limit, args.repeat)[0]:>8.2f}")
+    finally:
+        mongo.db = saved
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+import argparse
+import contextlib
+import io
+import json
+import tempfile
+import time
+from app import app
+from database import mongo
+from auth import hash_password
+from routes import prediction_writer, sessions
+
+# Request latency of the register, login, predict and history endpoints on each storage
+# backend, through the Flask test client. mongodb is only measured when --mongo-uri is
+# given and the server answers.
+# Usage: python bench_storage.py [--users 2000] [--requests 200] [--mongo-uri mongodb://...]
+
+
+def configure(backend, mongo_uri):
+    app.config["STORAGE_BACKEND"] = backend
+    app.config["MONGITA_PATH"] = tempfile.mkdtemp()
+    app.config["MONGO_URI"] = mongo_uri or app.config["MONGO_URI"]
+    app.config["MONGO_DBNAME"] = "bench_storage"
+    mongo.init_app(app)
+    if backend == "mongodb":
+        mongo.cx.admin.command("ping")
+        mongo.cx.drop_database(mongo.db.name)
+
+
+def post(client, url, payload, headers=None):
+    return client.post(url, data=json.dumps(payload), content_type="application/json", headers=headers)
+
+
+def avg_ms(fn, n):
+    start = time.perf_counter()
+    for i in range(n):
+        fn(i)
+    return (time.perf_counter() - start) / n * 1000
+
+
+def measure(n_users, n_requests):
+    client = app.test_client()
+    password = hash_password("pw")
+    mongo.db.users.insert_many([{"name": f"Patient {i}", "email": f"p{i}@example.com", "password": password,
+                                 "role": "patient", "medical_history": []} for i in range(n_users)])
+    user = mongo.db.users.find_one({"email": "p0@example.com"})
+    user_id = str(user["_id"])
+    headers = {"Authorization": f"Bearer {sessions.issue(user)}"}
+    results = {
+        "register": avg_ms(lambda i: post(client, "/api/auth/register",
+                                          {"name": "New", "email": f"new{i}@example.com", "password": "pw"}), n_requests),
+        "login": avg_ms(lambda i: post(client, "/api/auth/login",
+                                       {"email": f"p{i % n_users}@example.com", "password": "pw"}), n_requests),
+        "predict": avg_ms(lambda i: post(client, "/api/predict",
+                                         {"user_id": user_id, "symptoms": {"glucose": 60 + i % 150}}, headers), n_requests),
+    }
+    start = time.perf_counter()
+    prediction_writer.flush()
+    results["predict (flush)"] = (time.perf_counter() - start) * 1000
+    results["history"] = avg_ms(lambda i: client.get(f"/api/history/{user_id}", headers=headers), n_requests)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--backends", nargs="+", default=["memory", "mongita", "mongodb"])
+    parser.add_argument("--mongo-uri", default=None)
+    args = parser.parse_args()
+
+    rows = {}
+    for backend in args.backends:
+        if backend == "mongodb" and not args.mongo_uri:
+            print("mongodb: skipped (pass --mongo-uri)")
+            continue
+        try:
+            configure(backend, args.mongo_uri)
+        except Exception as e:
+            print(f"{backend}: skipped ({type(e).__name__})")
+            continue
+        # The routes log every request; keep that out of the timings
+        with contextlib.redirect_stdout(io.StringIO()):
+            rows[backend] = measure(args.users, args.requests)
+
+    backends = list(rows)
+    print(f"{'endpoint':<16}" + "".join(f"{b + ' (ms)':>16}" for b in backends))
+    for endpoint in next(iter(rows.values()), {}):
+        print(f"{endpoint:<16}" + "".join(f"{rows[b][endpoint]:>16.3f}" for b in backends))
+
+
+if __name__ == "__main__":
+    main()
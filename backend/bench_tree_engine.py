@@ -0,0 +1,49 @@
+import argparse
+import time
+import numpy as np
+from ml_model import predictor, TEST_PATH, load_dataset
+
+# Latency of sklearn's forest predict vs. the flattened engine used for serving.
+# Usage: python bench_tree_engine.py [--runs 200]
+
+
+def latencies(fn, rows, runs):
+    samples = []
+    for i in range(runs):
+        x = rows[i % len(rows)][None, :]
+        start = time.perf_counter()
+        fn(x)
+        samples.append(time.perf_counter() - start)
+    return np.array(samples) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=200)
+    args = parser.parse_args()
+
+    X = predictor.to_matrix(load_dataset(TEST_PATH, predictor.feature_names)[0])
+    X_scaled = (X - predictor.scaler.mean_) / predictor.scaler.scale_
+
+    expected = predictor.model.predict(X_scaled)
+    actual = predictor.engine.predict(X_scaled)
+    print(f"Test rows: {len(X)} | identical predictions: {bool((expected == actual).all())}")
+
+    print(f"\n{'single row':<16} {'p50 (ms)':>10} {'p99 (ms)':>10}")
+    for label, fn in (("model.predict", predictor.model.predict), ("engine.predict", predictor.engine.predict)):
+        ms = latencies(fn, X_scaled, args.runs)
+        print(f"{label:<16} {np.percentile(ms, 50):>10.3f} {np.percentile(ms, 99):>10.3f}")
+
+    print(f"\n{'batch size':<16} {'model (ms)':>10} {'engine (ms)':>12}")
+    for size in (16, 256, len(X_scaled)):
+        batch = X_scaled[:size]
+        timings = []
+        for fn in (predictor.model.predict, predictor.engine.predict):
+            start = time.perf_counter()
+            fn(batch)
+            timings.append((time.perf_counter() - start) * 1000)
+        print(f"{size:<16} {timings[0]:>10.2f} {timings[1]:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+import argparse
+import tempfile
+import time
+from datetime import datetime
+from bson import ObjectId
+from mongita import MongitaClientDisk
+from database import ensure_indexes
+from write_behind import WriteBehindQueue
+
+# Per-request cost of storing a prediction record on an indexed Mongita disk store:
+# a direct insert_one per request versus handing the record to the write-behind queue.
+# Usage: python bench_write_behind.py [--requests 500] [--flush-size 256]
+
+
+def make_docs(n):
+    return [{"user_id": ObjectId(), "prediction_result": "Healthy", "created_at": datetime.utcnow()} for _ in range(n)]
+
+
+def fresh_collection():
+    db = MongitaClientDisk(host=tempfile.mkdtemp())["bench_write_behind"]
+    ensure_indexes(db)
+    return db.predictions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--flush-size", type=int, default=256)
+    parser.add_argument("--flush-ms", type=float, default=50)
+    args = parser.parse_args()
+
+    collection = fresh_collection()
+    docs = make_docs(args.requests)
+    start = time.perf_counter()
+    for doc in docs:
+        collection.insert_one(doc)
+    direct = time.perf_counter() - start
+
+    collection = fresh_collection()
+    writer = WriteBehindQueue(lambda: collection, flush_size=args.flush_size, flush_interval_ms=args.flush_ms)
+    docs = make_docs(args.requests)
+    start = time.perf_counter()
+    for doc in docs:
+        writer.submit(doc)
+    queued = time.perf_counter() - start
+    writer.flush()
+    drained = time.perf_counter() - start
+    writer.close()
+
+    print(f"insert_one   : {direct / args.requests * 1000:8.3f} ms/request, {direct:6.2f} s total")
+    print(f"write-behind : {queued / args.requests * 1000:8.3f} ms/request, {drained:6.2f} s until written")
+    for key, value in writer.stats().items():
+        print(f"  {key}: {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+import numpy as np
+from bson import ObjectId
+
+# Offline benchmark harness: seeds an in-memory (or temporary Mongita disk) store with
+# synthetic users and predictions, then times the predictor and the API through the Flask
+# test client. Reports throughput and p50/p95/p99 latency, optionally saves a JSON
+# baseline, and exits 1 when a case regresses past the threshold against that baseline.
+# Usage: python benchmark.py [--backend memory|mongita] [--save-baseline] [--threshold 0.2]
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_baseline.json")
+CASES = ("predict_single", "predict_batch", "explain_single", "api_predict", "api_predict_anonymous", "api_predict_explain", "api_history", "api_doctor_predictions", "api_login", "api_stats")
+BATCH_ROWS = 64
+
+
+def summarize(latencies, elapsed):
+    ms = np.asarray(latencies) * 1000
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    return {
+        "iterations": len(latencies),
+        "throughput": len(latencies) / elapsed if elapsed > 0 else 0.0,
+        "p50_ms": float(p50),
+        "p95_ms": float(p95),
+        "p99_ms": float(p99),
+    }
+
+
+def compare(results, baseline, threshold):
+    # A case regresses when p95 grows or throughput drops by more than `threshold`
+    regressions = []
+    for case, current in results.items():
+        base = baseline.get(case)
+        if not base:
+            continue
+        if base["p95_ms"] > 0 and current["p95_ms"] > base["p95_ms"] * (1 + threshold):
+            regressions.append(f"{case}: p95 {base['p95_ms']:.3f} -> {current['p95_ms']:.3f} ms")
+        if current["throughput"] < base["throughput"] * (1 - threshold):
+            regressions.append(f"{case}: throughput {base['throughput']:.1f} -> {current['throughput']:.1f}/s")
+    return regressions
+
+
+def time_case(fn, iterations, warmup):
+    for i in range(warmup):
+        fn(i)
+    latencies = []
+    start = time.perf_counter()
+    for i in range(iterations):
+        t = time.perf_counter()
+        fn(i)
+        latencies.append(time.perf_counter() - t)
+    return summarize(latencies, time.perf_counter() - start)
+
+
+def seed(db, n_users, predictions_per_user, rng):
+    import aggregates
+    import auth
+    # One hash shared by every user: hashing each at full cost would dominate the setup
+    password = auth.hash_password("pw")
+    users = [{"_id": ObjectId(), "name": f"Patient {i}", "email": f"p{i}@example.com", "password": password,
+              "role": "patient", "medical_history": []} for i in range(n_users)]
+    db.users.insert_many(users)
+    start = datetime(2024, 1, 1)
+    diseases = ["Healthy", "Diabetes", "Anemia", "Thalasse", "Thromboc", "Heart Di"]
+    predictions = [{"_id": ObjectId(), "user_id": users[rng.randrange(n_users)]["_id"],
+                    "input_data": {"glucose": rng.uniform(60, 250)}, "prediction_result": rng.choice(diseases),
+                    "created_at": start + timedelta(seconds=i)}
+                   for i in range(n_users * predictions_per_user)]
+    db.predictions.insert_many(predictions)
+    # Seeded records bypass the write-behind queue that keeps the counters current
+    aggregates.rebuild(db)
+    return users
+
+
+def run(args):
+    from app import app
+    from database import mongo
+    from ml_model import predictor
+    from routes import prediction_writer, sessions
+
+    app.config["STORAGE_BACKEND"] = args.backend
+    app.config["MONGITA_PATH"] = tempfile.mkdtemp()
+    app.config["MONGO_DBNAME"] = "benchmark"
+    mongo.init_app(app)
+
+    rng = random.Random(args.seed)
+    users = seed(mongo.db, args.users, args.predictions_per_user, rng)
+    client = app.test_client()
+    # Unique inputs so the prediction cache does not turn the model cases into lookups
+    samples = [{"glucose": rng.uniform(60, 250), "hba1c": rng.uniform(4, 12), "hemoglobin": rng.uniform(8, 18)}
+               for _ in range((args.iterations + args.warmup) * BATCH_ROWS)]
+
+    headers = [{"Authorization": f"Bearer {sessions.issue(user)}"} for user in users]
+    # The dashboard is for staff; the benchmark's doctor is one of the seeded users
+    mongo.db.users.update_one({"_id": users[0]["_id"]}, {"$set": {"role": "doctor"}})
+
+    def post(url, payload, i=None):
+        response = client.post(url, data=json.dumps(payload), content_type="application/json",
+                               headers=headers[i % len(users)] if i is not None else None)
+        assert response.status_code < 400, (url, response.status_code)
+
+    def get(url, i=None):
+        response = client.get(url, headers=headers[i % len(users)] if i is not None else None)
+        assert response.status_code < 400, (url, response.status_code)
+
+    cases = {
+        "predict_single": lambda i: predictor.predict(samples[i]),
+        "predict_batch": lambda i: predictor.predict_batch(samples[i * BATCH_ROWS:(i + 1) * BATCH_ROWS]),
+        "explain_single": lambda i: predictor.explain_batch([samples[i]]),
+        "api_predict": lambda i: post("/api/predict", {"symptoms": samples[-1 - i]}, i),
+        "api_predict_anonymous": lambda i: post("/api/predict", {"symptoms": samples[-1 - i]}),
+        "api_predict_explain": lambda i: post("/api/predict", {"symptoms": samples[-1 - i], "explain": True}, i),
+        "api_history": lambda i: get(f"/api/history/{users[i % len(users)]['_id']}", i),
+        "api_doctor_predictions": lambda i: get("/api/doctor/predictions", 0),
+        "api_login": lambda i: post("/api/auth/login", {"email": users[i % len(users)]["email"], "password": "pw"}),
+        "api_stats": lambda i: get(f"/api/stats?user_id={users[i % len(users)]['_id']}", i),
+    }
+
+    results = {}
+    for name in args.cases:
+        results[name] = time_case(cases[name], args.iterations, args.warmup)
+        if name.startswith("api_predict"):
+            prediction_writer.flush()
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline latency/throughput benchmark for the backend")
+    parser.add_argument("--backend", choices=["memory", "mongita"], default="memory")
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--predictions-per-user", type=int, default=10)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--cases", nargs="+", choices=CASES, default=list(CASES))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="JSON baseline to compare against / write")
+    parser.add_argument("--save-baseline", action="store_true", help="write the results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed relative regression (0.2 = 20%%)")
+    args = parser.parse_args(argv)
+
+    from log_setup import configure_logging
+    configure_logging(logging.WARNING)
+    results = run(args)
+
+    print(f"{'case':<24} {'req/s':>10} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name, r in results.items():
+        print(f"{name:<24} {r['throughput']:>10.1f} {r['p50_ms']:>9.3f} {r['p95_ms']:>9.3f} {r['p99_ms']:>9.3f}")
+
+    if args.save_baseline:
+        report = {
+            "created_at": datetime.utcnow().isoformat(),
+            "machine": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+            "config": {k: v for k, v in vars(args).items() if k not in ("baseline", "save_baseline")},
+            "results": results,
+        }
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline written to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("No baseline to compare against (run with --save-baseline)")
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)["results"]
+    regressions = compare(results, baseline, args.threshold)
+    for line in regressions:
+        print(f"REGRESSION {line}")
+    if not regressions:
+        print(f"No regressions beyond {args.threshold:.0%} against {args.baseline}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,141 @@
+import threading
+import time
+from collections import OrderedDict
+
+# Small thread-safe in-process caches with hit/miss counters.
+
+MISSING = object()
+
+
+class LRUCache:
+    def __init__(self, maxsize=4096):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def get_many(self, keys):
+        # One lock round-trip for a whole batch; absent keys come back as MISSING
+        results = []
+        with self._lock:
+            for key in keys:
+                value = self._data.get(key, MISSING)
+                if value is MISSING:
+                    self.misses += 1
+                else:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                results.append(value)
+        return results
+
+    def get(self, key, default=None):
+        value = self.get_many([key])[0]
+        return default if value is MISSING else value
+
+    def put_many(self, items):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            for key, value in items:
+                self._data[key] = value
+                self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def put(self, key, value):
+        self.put_many([(key, value)])
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+class TTLCache:
+    # Entries expire ttl seconds after being written; oldest entries go first when full
+    def __init__(self, maxsize=10000, ttl=60.0, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._data = OrderedDict() # key -> (expires_at, value), in write order
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def get_many(self, keys):
+        results = []
+        now = self._clock()
+        with self._lock:
+            for key in keys:
+                entry = self._data.get(key)
+                if entry is None or entry[0] <= now:
+                    if entry is not None:
+                        del self._data[key]
+                    self.misses += 1
+                    results.append(MISSING)
+                else:
+                    self.hits += 1
+                    results.append(entry[1])
+        return results
+
+    def get(self, key, default=None):
+        value = self.get_many([key])[0]
+        return default if value is MISSING else value
+
+    def put_many(self, items):
+        if self.maxsize <= 0:
+            return
+        expires_at = self._clock() + self.ttl
+        with self._lock:
+            for key, value in items:
+                self._data.pop(key, None)
+                self._data[key] = (expires_at, value)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def put(self, key, value):
+        self.put_many([(key, value)])
+
+    def pop(self, key):
+        with self._lock:
+            entry = self._data.pop(key, None)
+        return MISSING if entry is None else entry[1]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
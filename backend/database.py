@@ -1,28 +1,197 @@
 from flask_pymongo import PyMongo
+from mongita.database import Database as MongitaDatabase
+from pymongo import ASCENDING, DESCENDING
+from log_setup import get_logger
+from serialization import project
 import os
+import threading
 
-class MockPyMongo(PyMongo):
+log = get_logger("database")
+
+# Declarative index registry applied at startup: collection -> index specs. Every key
+# besides "keys" and "embedded" is passed to create_index as an option
+INDEXES = {
+    "users": [
+        {"keys": [("email", ASCENDING)], "unique": True},
+    ],
+    "predictions": [
+        {"keys": [("user_id", ASCENDING), ("created_at", DESCENDING)]},
+        # Mongita cannot sort through an index and rewrites every index on each insert,
+        # so this one only pays off on a real MongoDB
+        {"keys": [("created_at", DESCENDING)], "embedded": False},
+    ],
+    # /api/stats lists the disease and model counters by dimension
+    "prediction_aggregates": [
+        {"keys": [("dimension", ASCENDING)]},
+    ],
+}
+
+def ensure_indexes(db, indexes=INDEXES):
+    # Returns the names of the indexes that exist for the registry after the call
+    names = []
+    for collection_name, specs in indexes.items():
+        collection = db[collection_name]
+        if not isinstance(db, MongitaDatabase):
+            # MongoDB builds every index as declared; create_index is a no-op if it exists
+            for spec in specs:
+                options = {k: v for k, v in spec.items() if k not in ("keys", "embedded")}
+                names.append(collection.create_index(spec["keys"], **options))
+            continue
+
+        # Mongita only supports single-field, non-unique indexes: index the leading field of
+        # each spec (enough for its equality/range filters) and leave uniqueness to the routes.
+        # Rebuilding an index rescans the collection, so existing ones are kept
+        existing = {name for info in collection.index_information() for name in info}
+        for spec in specs:
+            if not spec.get("embedded", True):
+                continue
+            field, direction = spec["keys"][0]
+            found = [name for name in (f"{field}_1", f"{field}_-1") if name in existing]
+            if found:
+                names.append(found[0])
+                continue
+            name = collection.create_index([(field, direction)])
+            existing.add(name)
+            names.append(name)
+    return names
+
+# Storage backends selectable with app.config["STORAGE_BACKEND"] (or the env var of the same
+# name): the embedded Mongita disk store, an in-memory Mongita store for tests and
+# benchmarks, and a real MongoDB server through pymongo
+STORAGE_BACKENDS = ("mongita", "memory", "mongodb")
+
+# Defaults for every setting connect() reads; app.config overrides env, env overrides these
+STORAGE_DEFAULTS = {
+    "STORAGE_BACKEND": "mongita",
+    "MONGITA_PATH": os.path.join(os.path.dirname(os.path.abspath(__file__)), ".mongita_db"),
+    "MONGO_URI": "mongodb://localhost:27017/disease_prediction_db",
+    "MONGO_DBNAME": "disease_prediction_db",
+    "MONGO_MAX_POOL_SIZE": 50,
+    "MONGO_MIN_POOL_SIZE": 0,
+    "MONGO_CONNECT_TIMEOUT_MS": 2000,
+    "MONGO_SERVER_SELECTION_TIMEOUT_MS": 3000,
+    "MONGO_SOCKET_TIMEOUT_MS": 5000,
+    "MONGO_WRITE_CONCERN": 1, # "majority" or a number of members
+    "MONGO_JOURNAL": False,
+}
+
+def storage_setting(config, key):
+    if config is not None and key in config:
+        return config[key]
+    value = os.environ.get(key)
+    if value is None:
+        return STORAGE_DEFAULTS[key]
+    default = STORAGE_DEFAULTS[key]
+    if isinstance(default, bool):
+        return value.lower() in ("1", "true", "yes")
+    if isinstance(default, int):
+        return int(value) if value.isdigit() else value
+    return value
+
+def connect(config=None):
+    # Returns (client, database) for the configured backend
+    backend = storage_setting(config, "STORAGE_BACKEND")
+    if backend == "mongita":
+        from mongita import MongitaClientDisk
+        path = storage_setting(config, "MONGITA_PATH")
+        log.info("Database persistence path: %s", path)
+        client = MongitaClientDisk(host=path)
+        return client, client[storage_setting(config, "MONGO_DBNAME")]
+    if backend == "memory":
+        from mongita import MongitaClientMemory
+        client = MongitaClientMemory()
+        return client, client[storage_setting(config, "MONGO_DBNAME")]
+    if backend == "mongodb":
+        from pymongo import MongoClient
+        # Construction does not block on the server; the first query waits at most
+        # serverSelectionTimeoutMS for one to answer
+        client = MongoClient(
+            storage_setting(config, "MONGO_URI"),
+            maxPoolSize=storage_setting(config, "MONGO_MAX_POOL_SIZE"),
+            minPoolSize=storage_setting(config, "MONGO_MIN_POOL_SIZE"),
+            connectTimeoutMS=storage_setting(config, "MONGO_CONNECT_TIMEOUT_MS"),
+            serverSelectionTimeoutMS=storage_setting(config, "MONGO_SERVER_SELECTION_TIMEOUT_MS"),
+            socketTimeoutMS=storage_setting(config, "MONGO_SOCKET_TIMEOUT_MS"),
+            w=storage_setting(config, "MONGO_WRITE_CONCERN"),
+            journal=storage_setting(config, "MONGO_JOURNAL"),
+            retryWrites=True,
+            appname="disease-prediction-api",
+        )
+        return client, client.get_default_database(default=storage_setting(config, "MONGO_DBNAME"))
+    raise ValueError(f"Unknown STORAGE_BACKEND {backend!r}, expected one of {STORAGE_BACKENDS}")
+
+class Storage(PyMongo):
+    # Flask extension the routes talk to through mongo.db, whichever backend is configured
     def __init__(self, *args, **kwargs):
+        self._db = None
+        self._indexes_ready = False
+        self._index_lock = threading.Lock()
+        self.backend = None
+        self._config = None
         super().__init__(*args, **kwargs)
 
+    @property
+    def db(self):
+        # Indexes are applied on first use rather than at init_app, so importing the app
+        # does not touch the collections on disk
+        if self._db is not None and not self._indexes_ready:
+            with self._index_lock:
+                if not self._indexes_ready:
+                    ensure_indexes(self._db)
+                    self._indexes_ready = True
+        return self._db
+
+    @db.setter
+    def db(self, value):
+        self._db = value
+        self._indexes_ready = False
+
     def init_app(self, app, **kwargs):
-        from mongita import MongitaClientDisk
-        
-        # Ensure the DB is stored in the same directory as this file (backend/)
-        base_dir = os.path.dirname(os.path.abspath(__file__))
-        db_path = os.path.join(base_dir, ".mongita_db")
-        print(f" * Database Persistence Path: {db_path}")
-        
-        self.cx = MongitaClientDisk(host=db_path)
-        self.db = self.cx['disease_prediction_db']
-        
+        config = app.config if app is not None else None
+        self._config = {key: storage_setting(config, key) for key in STORAGE_DEFAULTS}
+        self.backend = self._config["STORAGE_BACKEND"]
+        self.cx, self.db = connect(self._config)
+
         # Basic Flask extension registration
         if app is not None:
              if not hasattr(app, 'extensions'):
                  app.extensions = {}
              app.extensions['pymongo'] = self
 
-# mongo = PyMongo()
-# FALLBACK: Using MockPyMongo (wrapped Mongita) because local MongoDB server is not running.
-mongo = MockPyMongo()
+    def in_filter(self, values):
+        # Mongita checks $in membership against the container we pass for every scanned
+        # document, so hand it a set; a real MongoDB needs a list it can encode
+        if self.backend == "mongodb":
+            return {"$in": list(values)}
+        return {"$in": set(values)}
+
+    def find(self, collection, filter, fields=None, sort=None):
+        # Matching documents with only `fields` (include "_id" to keep it). MongoDB reads just
+        # those from storage; Mongita has no projection, so its documents are trimmed as they
+        # come off the cursor, before anything else handles them
+        if fields is None or self.backend == "mongodb":
+            projection = {"_id": "_id" in fields, **dict.fromkeys(fields, 1)} if fields else None
+            cursor = collection.find(filter, projection)
+            return cursor.sort(sort) if sort else cursor
+        cursor = collection.find(filter)
+        if sort:
+            cursor = cursor.sort(sort)
+        return (project(doc, fields) for doc in cursor)
+
+    def find_one(self, collection, filter, fields):
+        if self.backend == "mongodb":
+            return collection.find_one(filter, {"_id": "_id" in fields, **dict.fromkeys(fields, 1)})
+        doc = collection.find_one(filter)
+        return project(doc, fields) if doc is not None else None
+
+    def reopen(self):
+        # Runs in every forked child. pymongo clients are not fork-safe and a Mongita disk
+        # client's in-memory caches belong to the parent, so the child connects afresh. An
+        # in-memory store has nothing to reconnect to and is kept as the child's copy
+        self._index_lock = threading.Lock()
+        if self._config is None or self.backend == "memory":
+            return
+        self.cx, self.db = connect(self._config)
 
+mongo = Storage()
+os.register_at_fork(after_in_child=mongo.reopen)
@@ -0,0 +1,357 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from log_setup import get_logger
+
+# Columnar cache for the CSV datasets. A CSV is parsed once, in chunks, into
+# DATASET_CACHE_DIR/<name>-<sha256 prefix>/: the feature columns as one float32 .npy of
+# shape (columns, rows), so every column is contiguous, the labels as integer codes, and a
+# meta.json with the class names, the per-column means, modes and missing counts and the
+# streaming statistics of StreamingStats (class counts, mean/variance, min/max,
+# quantiles). Missing feature values are stored already filled with the column mean and
+# missing labels with the most frequent one, the fill policy the training code always
+# used. Building streams the CSV twice and never holds more than a chunk of it in memory.
+#
+# The cache directory is named after the content hash, so an edited CSV is re-parsed on
+# the next load and the stale cache removed. Arrays are memory-mapped, which makes a load
+# cost one hash of the file plus a few page faults, and lets several processes share the
+# pages. Within one process a load is memoized on (size, mtime).
+
+CACHE_FORMAT = 2
+LABEL_COLUMN = "Disease"
+CHUNK_ROWS = int(os.environ.get("DATASET_CHUNK_ROWS", "100000"))
+
+# Quantile levels kept in the statistics, estimated from a sample of this many rows
+QUANTILES = (0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99)
+QUANTILE_SAMPLE = int(os.environ.get("DATASET_QUANTILE_SAMPLE", "10000"))
+
+CACHE_DIR = os.environ.get(
+    "DATASET_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".dataset_cache")
+)
+
+log = get_logger("dataset")
+
+_loaded = {} # (abspath, cache dir) -> ((size, mtime_ns), Dataset)
+_lock = threading.Lock()
+
+
+class Dataset:
+    def __init__(self, path, meta, features, codes):
+        self.path = path
+        self.meta = meta
+        self.sha256 = meta["sha256"]
+        self.columns = list(meta["columns"])
+        self.classes = list(meta["classes"])
+        self.means = dict(meta["means"])
+        self.modes = dict(meta["modes"])
+        self.missing = dict(meta["missing"])
+        self.stats = meta["stats"] # see StreamingStats.to_dict
+        self.features = features # float32 (columns, rows), memory-mapped
+        self.codes = codes # label codes indexing self.classes
+        self._index = {name: i for i, name in enumerate(self.columns)}
+
+    def __len__(self):
+        return int(self.meta["rows"])
+
+    def column(self, name):
+        return self.features[self._index[name]]
+
+    def matrix(self, columns=None, dtype=np.float32):
+        # (rows, len(columns)) feature matrix in the requested column order
+        if columns is None:
+            return np.asarray(self.features.T, dtype=dtype)
+        idx = [self._index[name] for name in columns]
+        return np.asarray(self.features[idx].T, dtype=dtype)
+
+    def labels(self):
+        return np.asarray(self.classes, dtype=object)[self.codes]
+
+    def class_counts(self):
+        counts = np.bincount(self.codes, minlength=len(self.classes))
+        return dict(zip(self.classes, counts.tolist()))
+
+    def frame(self, columns=None, labels=True):
+        columns = list(self.columns if columns is None else columns)
+        df = pd.DataFrame(self.matrix(columns, np.float64), columns=columns)
+        if labels:
+            df[self.meta["label"]] = self.labels()
+        return df
+
+
+def file_sha256(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _cache_name(path, sha):
+    return f"{os.path.basename(path)}-{sha[:16]}"
+
+
+def _mode(values):
+    # Most frequent value, the smallest one on ties (like pandas' mode()[0])
+    if len(values) == 0:
+        return None
+    uniques, counts = np.unique(values, return_counts=True)
+    return uniques[np.argmax(counts)].item()
+
+
+class StreamingStats:
+    # Per-column statistics updated one chunk at a time in constant memory: count, mean
+    # and variance (Welford's update, merged per chunk with Chan's formula), min/max, and
+    # quantiles estimated from a uniform sample of at most `sample_size` rows (exact while
+    # the data fits in it), plus per-class row counts.
+
+    def __init__(self, columns, sample_size=QUANTILE_SAMPLE, seed=0):
+        n = len(columns)
+        self.columns = list(columns)
+        self.rows = 0
+        self.count = np.zeros(n, dtype=np.int64)
+        self.mean = np.zeros(n)
+        self.m2 = np.zeros(n)
+        self.min = np.full(n, np.inf)
+        self.max = np.full(n, -np.inf)
+        self.class_counts = {}
+        self.missing_labels = 0
+        self.sample_size = sample_size
+        self._rng = np.random.default_rng(seed)
+        self._sample = np.empty((0, n))
+        self._keys = np.empty(0)
+
+    def update(self, values, labels=None):
+        # values: (rows, columns) float64 with NaN for missing; labels: stripped strings or None
+        present = ~np.isnan(values)
+        n_b = present.sum(axis=0)
+        filled = np.where(present, values, 0.0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean_b = filled.sum(axis=0) / n_b
+        m2_b = (np.where(present, values - mean_b, 0.0) ** 2).sum(axis=0)
+        total = self.count + n_b
+        seen = n_b > 0
+        delta = np.where(seen, mean_b - self.mean, 0.0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            self.mean = np.where(seen, self.mean + delta * n_b / total, self.mean)
+            self.m2 = np.where(seen, self.m2 + m2_b + delta ** 2 * self.count * n_b / total, self.m2)
+        self.count = total
+        self.min = np.minimum(self.min, np.where(present, values, np.inf).min(axis=0, initial=np.inf))
+        self.max = np.maximum(self.max, np.where(present, values, -np.inf).max(axis=0, initial=-np.inf))
+        self.rows += len(values)
+
+        # Keep the rows with the smallest random keys: a uniform sample of everything seen
+        keys = np.concatenate([self._keys, self._rng.random(len(values))])
+        sample = np.concatenate([self._sample, values])
+        if len(keys) > self.sample_size:
+            keep = np.argpartition(keys, self.sample_size)[:self.sample_size]
+            keys, sample = keys[keep], sample[keep]
+        self._keys, self._sample = keys, sample
+
+        if labels is not None:
+            labels = pd.Series(labels, dtype=object)
+            self.missing_labels += int(labels.isna().sum())
+            for name, n in labels.value_counts().items():
+                self.class_counts[str(name)] = self.class_counts.get(str(name), 0) + int(n)
+
+    @property
+    def variance(self):
+        # Population variance (ddof=0), as StandardScaler uses
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(self.count > 0, self.m2 / np.maximum(self.count, 1), np.nan)
+
+    def quantiles(self, levels=QUANTILES):
+        # (len(levels), columns) array
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning) # all-NaN columns
+            if len(self._sample) == 0:
+                return np.full((len(levels), len(self.columns)), np.nan)
+            return np.nanquantile(self._sample, levels, axis=0)
+
+    def to_dict(self):
+        def number(x):
+            x = float(x)
+            return None if not np.isfinite(x) else x
+
+        quantiles = self.quantiles()
+        variance = self.variance
+        return {
+            "rows": self.rows,
+            "class_counts": dict(sorted(self.class_counts.items())),
+            "missing_labels": self.missing_labels,
+            "quantiles_exact": self.rows <= self.sample_size,
+            "columns": {
+                name: {
+                    "count": int(self.count[j]),
+                    "mean": number(self.mean[j]) if self.count[j] else None,
+                    "var": number(variance[j]),
+                    "std": number(np.sqrt(variance[j])),
+                    "min": number(self.min[j]),
+                    "max": number(self.max[j]),
+                    "quantiles": {str(q): number(quantiles[i, j]) for i, q in enumerate(QUANTILES)},
+                }
+                for j, name in enumerate(self.columns)
+            },
+        }
+
+
+def _chunks(path, label, chunk_rows):
+    # (feature columns, float64 values with NaN for missing, stripped labels or None) per chunk
+    columns = None
+    for df in pd.read_csv(path, chunksize=chunk_rows):
+        df.columns = [c.strip() for c in df.columns]
+        if columns is None:
+            columns = [c for c in df.columns if c != label]
+        values = df[columns].apply(pd.to_numeric, errors="coerce").to_numpy(dtype=np.float64, copy=True)
+        labels = df[label].astype("string").str.strip().to_numpy(dtype=object) if label in df.columns else None
+        yield columns, values, labels
+
+
+def scan(path, label=LABEL_COLUMN, chunk_rows=CHUNK_ROWS, sample_size=QUANTILE_SAMPLE):
+    # One streaming pass over the CSV; memory does not grow with its length
+    stats = None
+    for columns, values, labels in _chunks(path, label, chunk_rows):
+        if stats is None:
+            stats = StreamingStats(columns, sample_size)
+        stats.update(values, labels)
+    if stats is None:
+        raise ValueError(f"{path} has no rows")
+    return stats
+
+
+def build(path, cache_dir=None, label=LABEL_COLUMN, chunk_rows=CHUNK_ROWS, sha=None):
+    # Two streaming passes: statistics first, then the columns are written straight into
+    # the memory-mapped .npy files with missing values filled from those statistics
+    cache_dir = cache_dir or CACHE_DIR
+    sha = sha or file_sha256(path)
+    stats = scan(path, label, chunk_rows)
+    columns, rows = stats.columns, stats.rows
+    means = np.where(stats.count > 0, stats.mean, np.nan)
+
+    classes = sorted(stats.class_counts)
+    # Most frequent label, the first in sorted order on ties; it fills missing labels
+    label_mode = max(classes, key=stats.class_counts.get) if classes else None
+
+    os.makedirs(cache_dir, exist_ok=True)
+    target = os.path.join(cache_dir, _cache_name(path, sha))
+    tmp = tempfile.mkdtemp(prefix=".build-", dir=cache_dir)
+    try:
+        features = np.lib.format.open_memmap(os.path.join(tmp, "features.npy"), mode="w+",
+                                             dtype=np.float32, shape=(len(columns), rows))
+        codes = np.lib.format.open_memmap(os.path.join(tmp, "codes.npy"), mode="w+",
+                                          dtype=np.min_scalar_type(max(len(classes) - 1, 0)), shape=(rows,))
+        pos = 0
+        for _, values, labels in _chunks(path, label, chunk_rows):
+            missing = np.isnan(values)
+            if missing.any():
+                values[missing] = np.take(means, np.nonzero(missing)[1])
+            n = len(values)
+            features[:, pos:pos + n] = values.T
+            if labels is not None and classes:
+                chunk_codes = pd.Categorical(labels, categories=classes).codes
+                codes[pos:pos + n] = np.where(chunk_codes < 0, classes.index(label_mode), chunk_codes)
+            pos += n
+        # Modes need every value of a column, so they are taken one column at a time
+        modes = {name: _mode(features[j][np.isfinite(features[j])]) for j, name in enumerate(columns)}
+        features.flush()
+        codes.flush()
+        del features, codes
+
+        missing = {name: int(rows - stats.count[j]) for j, name in enumerate(columns)}
+        if classes:
+            modes[label] = label_mode
+            missing[label] = stats.missing_labels
+        meta = {
+            "format": CACHE_FORMAT,
+            "source": os.path.basename(path),
+            "sha256": sha,
+            "rows": rows,
+            "columns": columns,
+            "label": label,
+            "classes": classes,
+            "means": {name: (None if np.isnan(m) else float(m)) for name, m in zip(columns, means)},
+            "modes": modes,
+            "missing": missing,
+            "stats": stats.to_dict(),
+        }
+        with open(os.path.join(tmp, "meta.json"), "w") as f:
+            json.dump(meta, f)
+        # Renamed into place, so a concurrent loader sees either no cache or a complete one
+        try:
+            os.replace(tmp, target)
+        except OSError:
+            pass # another process finished the same cache first
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    prefix = f"{os.path.basename(path)}-"
+    for name in os.listdir(cache_dir):
+        if name.startswith(prefix) and name != os.path.basename(target):
+            shutil.rmtree(os.path.join(cache_dir, name), ignore_errors=True)
+    return target
+
+
+def _open(path, target):
+    try:
+        with open(os.path.join(target, "meta.json")) as f:
+            meta = json.load(f)
+        if meta.get("format") != CACHE_FORMAT:
+            return None
+        features = np.load(os.path.join(target, "features.npy"), mmap_mode="r")
+        codes = np.load(os.path.join(target, "codes.npy"), mmap_mode="r")
+    except (OSError, ValueError) as e:
+        log.debug("Unusable dataset cache %s: %s", target, e)
+        return None
+    return Dataset(path, meta, features, codes)
+
+
+def stats(path, cache_dir=None, label=LABEL_COLUMN):
+    # StreamingStats.to_dict() for `path`: from its cache when one exists, otherwise from a
+    # single streaming pass that builds no cache
+    path = os.path.abspath(path)
+    target = os.path.join(cache_dir or CACHE_DIR, _cache_name(path, file_sha256(path)))
+    ds = _open(path, target) if os.path.isdir(target) else None
+    if ds is not None and ds.meta.get("label") == label:
+        return ds.stats
+    return scan(path, label).to_dict()
+
+
+def release(*paths):
+    # Forget the in-process memo for `paths` (all when none are given), dropping the
+    # memory maps once no caller holds the Dataset
+    paths = {os.path.abspath(p) for p in paths}
+    with _lock:
+        for key in list(_loaded):
+            if not paths or key[0] in paths:
+                del _loaded[key]
+
+
+def load(path, cache_dir=None, label=LABEL_COLUMN):
+    # Dataset for `path`, parsing the CSV only when no cache matches its current content
+    path = os.path.abspath(path)
+    cache_dir = cache_dir or CACHE_DIR
+    st = os.stat(path)
+    stamp = (st.st_size, st.st_mtime_ns)
+    key = (path, cache_dir)
+    with _lock:
+        hit = _loaded.get(key)
+        if hit is not None and hit[0] == stamp:
+            return hit[1]
+
+        sha = file_sha256(path)
+        target = os.path.join(cache_dir, _cache_name(path, sha))
+        ds = _open(path, target) if os.path.isdir(target) else None
+        if ds is None or ds.sha256 != sha or ds.meta.get("label") != label:
+            log.info("Building dataset cache for %s", os.path.basename(path))
+            shutil.rmtree(target, ignore_errors=True)
+            ds = _open(path, build(path, cache_dir, label, sha=sha))
+        _loaded[key] = (stamp, ds)
+        return ds
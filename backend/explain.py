@@ -0,0 +1,104 @@
+import numpy as np
+
+from tree_engine import index_dtype
+
+# Per-prediction feature contributions for the serving forest (Saabas' method). Every node
+# of every tree holds the class distribution of the training rows that reach it; walking
+# from the root to a leaf, each split changes that distribution, and the change is
+# credited to the split's feature. Averaged over the trees:
+#
+#   predict_proba(x) == bias + contributions(x).sum(over features)
+#
+# where bias is the mean root distribution. The tables are built once per model:
+# `path[n]` lists the nodes below the root on the way to node n (padded with a sentinel
+# whose delta is zero), `delta[n]` is n's distribution minus its parent's and
+# `split_feature[n]` the feature of the parent's split. Node ids are the FlatForest's, so
+# an explanation reuses the leaves of the prediction's own walk and costs a few gathers
+# and one bincount per class on top of it.
+
+STATE_FORMAT = 1
+ARRAY_FIELDS = ("path", "delta", "split_feature", "bias")
+
+
+class PathExplainer:
+    def __init__(self, path, delta, split_feature, bias, n_features):
+        self.path = path                   # (n_nodes, max_depth) nodes on the path to each node
+        self.delta = delta                 # (n_nodes + 1, n_classes) change in distribution; last row is the padding
+        self.split_feature = split_feature # (n_nodes + 1,) feature whose split led into the node
+        self.bias = bias                   # (n_classes,) mean root distribution over the trees
+        self.n_features = int(n_features)
+
+    @classmethod
+    def from_sklearn(cls, model):
+        n_classes = model.n_classes_
+        n_trees = len(model.estimators_)
+        total = sum(e.tree_.node_count for e in model.estimators_)
+        max_depth = max(e.tree_.max_depth for e in model.estimators_)
+        pad = total # sentinel node id
+
+        path = np.full((total, max(max_depth, 1)), pad, dtype=np.int64)
+        delta = np.zeros((total + 1, n_classes), dtype=np.float64)
+        split_feature = np.zeros(total + 1, dtype=np.int64)
+        bias = np.zeros(n_classes, dtype=np.float64)
+        offset = 0
+        for estimator in model.estimators_:
+            tree = estimator.tree_
+            value = tree.value[:, 0, :n_classes].astype(np.float64)
+            normalizer = value.sum(axis=1, keepdims=True)
+            normalizer[normalizer == 0.0] = 1.0
+            value /= normalizer
+            bias += value[0]
+
+            # Children always have larger ids than their parent, so one pass in id order
+            # sees every parent's path before its children's
+            depth = np.zeros(tree.node_count, dtype=np.int64)
+            for node in range(tree.node_count):
+                for child in (tree.children_left[node], tree.children_right[node]):
+                    if child == -1:
+                        continue
+                    g = offset + child
+                    depth[child] = depth[node] + 1
+                    path[g] = path[offset + node]
+                    path[g, depth[node]] = g
+                    delta[g] = value[child] - value[node]
+                    split_feature[g] = tree.feature[node]
+            offset += tree.node_count
+
+        return cls(
+            path=path.astype(index_dtype(total)),
+            delta=delta.astype(np.float32),
+            split_feature=split_feature.astype(index_dtype(split_feature.max())),
+            bias=bias / n_trees,
+            n_features=model.n_features_in_,
+        )
+
+    @classmethod
+    def from_state(cls, state):
+        if state.get("format") != STATE_FORMAT:
+            return None
+        return cls(n_features=state["n_features"], **{name: np.asarray(state[name]) for name in ARRAY_FIELDS})
+
+    def to_state(self):
+        state = {name: getattr(self, name) for name in ARRAY_FIELDS}
+        state["n_features"] = self.n_features
+        state["format"] = STATE_FORMAT
+        return state
+
+    @property
+    def nbytes(self):
+        return sum(getattr(self, name).nbytes for name in ARRAY_FIELDS)
+
+    def contributions(self, leaves):
+        # (n_rows, n_features, n_classes) contributions from the (n_trees, n_rows) leaf ids
+        # returned by FlatForest.apply
+        n_trees, n_rows = leaves.shape
+        steps = self.path.take(leaves, axis=0) # (trees, rows, depth)
+        slots = (np.arange(n_rows, dtype=np.intp)[None, :, None] * self.n_features
+                 + self.split_feature.take(steps)).ravel()
+        deltas = self.delta.take(steps.ravel(), axis=0)
+        n_classes = deltas.shape[1]
+        out = np.empty((n_rows * self.n_features, n_classes))
+        for c in range(n_classes):
+            out[:, c] = np.bincount(slots, weights=deltas[:, c], minlength=n_rows * self.n_features)
+        out /= n_trees
+        return out.reshape(n_rows, self.n_features, n_classes)
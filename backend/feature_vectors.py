@@ -0,0 +1,148 @@
+import argparse
+import itertools
+import os
+import sys
+import time
+import numpy as np
+from mongita.database import Database as MongitaDatabase
+from pymongo import ReplaceOne
+from log_setup import configure_logging, get_logger
+from ml_model import FEATURE_NAMES
+
+# Stored form of a prediction's inputs. Instead of the payload exactly as the client sent it
+# (string values, any of several spellings per feature, missing fields), each record keeps
+#
+#   features   the imputed 24-feature vector the model was given, packed as little-endian
+#              float32 (96 bytes; the forest's split thresholds are float32 too)
+#   present    bitmask of the features the payload supplied, bit j = FEATURE_NAMES[j]
+#
+# next to its model_version. The raw payload is stored as input_data only with
+# STORE_RAW_INPUT=1. History responses rebuild input_data from the supplied features
+# (expand_inputs), and stored predictions are re-scored straight from the vectors, the
+# unsupplied features re-imputed by the model doing the scoring.
+#
+#   python feature_vectors.py migrate [--keep-raw] [--batch-size N]
+#   python feature_vectors.py rescore [--limit N]
+#
+# migrate packs the records that only have input_data, a batch at a time: bulk_write on
+# MongoDB, one replace_one per record on Mongita, which has no bulk writes. rescore runs the
+# current model over the stored vectors and reports how many predictions it would change.
+
+STORE_RAW_INPUT = os.environ.get("STORE_RAW_INPUT", "0").lower() in ("1", "true", "yes")
+DTYPE = np.dtype("<f4")
+MIGRATE_BATCH_SIZE = 1000
+
+log = get_logger("feature_vectors")
+
+
+def pack(row):
+    return np.asarray(row, dtype=DTYPE).tobytes()
+
+
+def matrix(docs):
+    # (n, 24) float64 matrix of the records' vectors, ready for predict_batch
+    blob = b"".join(doc["features"] for doc in docs)
+    return np.frombuffer(blob, dtype=DTYPE).reshape(-1, len(FEATURE_NAMES)).astype(np.float64)
+
+
+def supplied_matrix(docs):
+    # matrix(docs) with the features the payloads did not supply set to NaN, so the scoring
+    # model imputes them with its own means rather than those of the model that wrote them
+    X = matrix(docs)
+    present = np.array([doc.get("present", 0) for doc in docs], dtype=np.int64)
+    X[(present[:, None] >> np.arange(len(FEATURE_NAMES)) & 1) == 0] = np.nan
+    return X
+
+
+def supplied_inputs(features, present):
+    # {feature name: value} for the supplied features, at the float32 value's shortest repr
+    values = np.frombuffer(features, dtype=DTYPE)
+    return {name: float(str(values[j])) for j, name in enumerate(FEATURE_NAMES) if present >> j & 1}
+
+
+def expand_inputs(docs):
+    # Listing hook: input_data from the packed vector where the raw payload was not kept
+    for doc in docs:
+        features = doc.pop("features", None)
+        present = doc.pop("present", 0)
+        if features is not None and "input_data" not in doc:
+            doc["input_data"] = supplied_inputs(features, present)
+    return docs
+
+
+def scan(db, stored, batch_size):
+    # Prediction records with (stored=True) or without a packed vector
+    if isinstance(db, MongitaDatabase):
+        # No $exists; read the collection up front, it is rewritten while we go
+        return iter([doc for doc in db.predictions.find({}) if ("features" in doc) == stored])
+    return db.predictions.find({"features": {"$exists": stored}}, batch_size=batch_size)
+
+
+def batches(docs, batch_size):
+    while True:
+        batch = list(itertools.islice(docs, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def migrate(db, predictor, keep_raw=False, batch_size=MIGRATE_BATCH_SIZE):
+    # Packs every record that only has input_data; returns how many were converted
+    migrated = 0
+    for batch in batches(scan(db, False, batch_size), batch_size):
+        X, masks = predictor.encode_rows([doc.get("input_data") or {} for doc in batch])
+        for doc, row, mask in zip(batch, X, masks):
+            doc["features"] = pack(row)
+            doc["present"] = mask
+            doc.setdefault("model_version", None)
+            if not keep_raw:
+                doc.pop("input_data", None)
+        if isinstance(db, MongitaDatabase):
+            for doc in batch:
+                db.predictions.replace_one({"_id": doc["_id"]}, doc)
+        else:
+            db.predictions.bulk_write([ReplaceOne({"_id": doc["_id"]}, doc) for doc in batch], ordered=False)
+        migrated += len(batch)
+        log.info("Packed %d prediction records", migrated)
+    return migrated
+
+
+def rescore(db, predictor, limit=None, batch_size=MIGRATE_BATCH_SIZE):
+    # -> (records scored, records the predictor now predicts differently)
+    docs = scan(db, True, batch_size)
+    if limit:
+        docs = itertools.islice(docs, limit)
+    scored = changed = 0
+    for batch in batches(docs, batch_size):
+        results = predictor.predict_batch(supplied_matrix(batch))
+        scored += len(batch)
+        changed += sum(result != doc.get("prediction_result") for doc, result in zip(batch, results))
+    return scored, changed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Packed feature vectors of stored predictions")
+    sub = parser.add_subparsers(dest="command", required=True)
+    migrate_parser = sub.add_parser("migrate", help="pack the records stored with input_data only")
+    migrate_parser.add_argument("--keep-raw", action="store_true", help="keep input_data next to the vector")
+    migrate_parser.add_argument("--batch-size", type=int, default=MIGRATE_BATCH_SIZE)
+    rescore_parser = sub.add_parser("rescore", help="run the current model over the stored vectors")
+    rescore_parser.add_argument("--limit", type=int, default=None)
+    args = parser.parse_args(argv)
+    configure_logging()
+
+    from database import STORAGE_DEFAULTS, connect, storage_setting
+    from ml_model import predictor
+    client, db = connect({key: storage_setting(None, key) for key in STORAGE_DEFAULTS})
+    start = time.perf_counter()
+    if args.command == "migrate":
+        migrated = migrate(db, predictor, args.keep_raw, args.batch_size)
+        print(f"Packed {migrated} prediction records in {time.perf_counter() - start:.1f} s")
+    else:
+        scored, changed = rescore(db, predictor, args.limit)
+        print(f"Re-scored {scored} predictions in {time.perf_counter() - start:.1f} s, {changed} would change")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,62 @@
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import random
+
+# Leveled logging for the backend. Records are handed to a queue and written to stderr by a
+# listener thread, so a slow console never blocks a request. Per-request access logs are
+# sampled with LOG_SAMPLE_RATE (0..1); errors are always logged.
+
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+LOG_SAMPLE_RATE = float(os.environ.get("LOG_SAMPLE_RATE", "0.01"))
+LOG_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+
+logger = logging.getLogger("backend")
+_listener = None
+
+
+def configure_logging(level=None, stream=None):
+    global _listener
+    if _listener is not None:
+        return logger
+    handler = logging.StreamHandler(stream)
+    handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    records = queue.SimpleQueue()
+    _listener = logging.handlers.QueueListener(records, handler)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+    queue_handler = logging.handlers.QueueHandler(records)
+    logger.addHandler(queue_handler)
+    logger.setLevel(level or LOG_LEVEL)
+    logger.propagate = False
+
+    def restart_in_child():
+        # The listener thread does not survive fork; give the child its own queue and thread
+        global _listener
+        child_records = queue.SimpleQueue()
+        queue_handler.queue = child_records
+        _listener = logging.handlers.QueueListener(child_records, handler)
+        _listener.start()
+        atexit.register(_listener.stop)
+
+    os.register_at_fork(after_in_child=restart_in_child)
+    return logger
+
+
+def shutdown_logging():
+    # Flush queued records; needed before os._exit, which skips atexit
+    if _listener is not None:
+        _listener.stop()
+
+
+def get_logger(name):
+    return logger.getChild(name)
+
+
+def sampled(rate=None):
+    # True for roughly `rate` of the calls
+    rate = LOG_SAMPLE_RATE if rate is None else rate
+    return rate >= 1 or (rate > 0 and random.random() < rate)
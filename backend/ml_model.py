@@ -1,10 +1,20 @@
 import numpy as np
-import pandas as pd
 from sklearn.preprocessing import LabelEncoder, StandardScaler
 from sklearn.model_selection import train_test_split
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.metrics import accuracy_score
+import argparse
+import math
 import os
+import time
+
+import dataset
+import model_store
+from caching import LRUCache, MISSING
+from log_setup import configure_logging, get_logger
+from metrics import STAGE_SECONDS
+from explain import PathExplainer
+from tree_engine import CHUNK_ROWS, FlatForest
 
 # Try to import BalancedRandomForest, fallback to standard if not installed
 try:
@@ -13,57 +23,182 @@ try:
 except ImportError:
     HAS_IMBLEARN = False
 
+TRAIN_PATH = os.path.join(os.path.dirname(__file__), "Blood_sample_dataset_balanced.csv")
+TEST_PATH = os.path.join(os.path.dirname(__file__), "blood_samples_dataset_test.csv")
+
+# Default hyperparameters of the serving forest; tuned ones are read from the artifact
+# directory (see model_store.load_params). Both are part of the artifact fingerprint
+MODEL_PARAMS = model_store.DEFAULT_MODEL_PARAMS
+
+FEATURE_NAMES = [
+    "Glucose","Cholesterol","Hemoglobin","Platelets","White Blood Cells",
+    "Red Blood Cells","Hematocrit","Mean Corpuscular Volume","Mean Corpuscular Hemoglobin",
+    "Mean Corpuscular Hemoglobin Concentration","Insulin","BMI","Systolic Blood Pressure",
+    "Diastolic Blood Pressure","Triglycerides","HbA1c","LDL Cholesterol","HDL Cholesterol",
+    "ALT","AST","Heart Rate","Creatinine","Troponin","C-reactive Protein"
+]
+
+# Precedence of loosely normalised keys vs. the alias table (see _parse_dict)
+_FALLBACK_RANK = 5
+_UNSET_RANK = 6
+
+# Above this many rows sklearn's own parallel predict beats the flat engine
+ENGINE_MAX_ROWS = 1024
+
+log = get_logger("ml_model")
+
+# Prediction cache keyed on the imputed feature vector, rounded to PREDICT_CACHE_QUANTUM
+# (0 keys on the exact vector). A size of 0 disables the cache
+PREDICT_CACHE_SIZE = int(os.environ.get("PREDICT_CACHE_SIZE", "4096"))
+PREDICT_CACHE_QUANTUM = float(os.environ.get("PREDICT_CACHE_QUANTUM", "0"))
+
+def load_dataset(path, feature_names=FEATURE_NAMES):
+    # (float64 feature matrix, label array) from the cached, mean-imputed dataset
+    ds = dataset.load(path)
+    return ds.matrix(feature_names, np.float64), ds.labels()
+
+def make_forest(params, **overrides):
+    # The serving estimator: balanced random forest when imblearn is available
+    if HAS_IMBLEARN:
+        return BalancedRandomForestClassifier(**{**params, "warm_start": True, "n_jobs": -1, **overrides})
+    return RandomForestClassifier(**{**params, "class_weight": "balanced", "n_jobs": -1, **overrides})
+
+def scaler_from_stats(stats, feature_names):
+    # StandardScaler fitted from dataset statistics (see dataset.StreamingStats) instead
+    # of another pass over the rows
+    columns = stats["columns"]
+    scaler = StandardScaler()
+    scaler.mean_ = np.array([columns[name]["mean"] for name in feature_names], dtype=np.float64)
+    scaler.var_ = np.array([columns[name]["var"] for name in feature_names], dtype=np.float64)
+    scaler.scale_ = np.sqrt(scaler.var_)
+    scaler.scale_[scaler.scale_ == 0.0] = 1.0 # constant columns are left unscaled, as in sklearn
+    scaler.n_samples_seen_ = int(stats["rows"])
+    scaler.n_features_in_ = len(feature_names)
+    return scaler
+
+def prune_forest(model):
+    # Drops what only fitting needs: BalancedRandomForest keeps every tree's undersampler,
+    # with the training-row indices it drew, plus a pipeline per tree referencing both
+    for name in ("samplers_", "pipelines_"):
+        if hasattr(model, name):
+            setattr(model, name, [])
+    return model
+
 class DiseasePredictor:
-    def __init__(self):
+    def __init__(self, retrain=False, artifact_dir=None, cache_size=PREDICT_CACHE_SIZE,
+                 cache_quantum=PREDICT_CACHE_QUANTUM, params=None, fingerprint=None):
         self.model = None
+        self.engine = None # Flattened copy of self.model used for serving
+        self.explainer = None # Per-node contribution tables over the engine's nodes
         self.scaler = StandardScaler()
         self.label_encoder = LabelEncoder()
-        self.feature_names = [
-            "Glucose","Cholesterol","Hemoglobin","Platelets","White Blood Cells",
-            "Red Blood Cells","Hematocrit","Mean Corpuscular Volume","Mean Corpuscular Hemoglobin",
-            "Mean Corpuscular Hemoglobin Concentration","Insulin","BMI","Systolic Blood Pressure",
-            "Diastolic Blood Pressure","Triglycerides","HbA1c","LDL Cholesterol","HDL Cholesterol",
-            "ALT","AST","Heart Rate","Creatinine","Troponin","C-reactive Protein"
-        ]
+        self.feature_names = list(FEATURE_NAMES)
         self.feature_means = {} # Store means for imputation
         # Classes will be determined from dataset
         self.classes = []
         self.accuracy = 0.0 # Will be calculated from test set
+        self.version = None # Artifact fingerprint, None for the dummy model
+        self.artifact_dir = artifact_dir
+        self.params = dict(params) if params is not None else model_store.load_params(artifact_dir)
+        self._key_index = self._build_key_index()
+        self.cache = LRUCache(cache_size)
+        self.cache_quantum = cache_quantum
+        self._means = None # feature_means in column order, built on first use
         
+        if fingerprint is not None:
+            self.load_artifact(fingerprint)
+        else:
+            self.load_or_train(retrain=retrain)
+
+    def fingerprint(self):
+        params = dict(self.params, imblearn=HAS_IMBLEARN, features=self.feature_names,
+                      dataset=dataset.CACHE_FORMAT)
+        return model_store.fingerprint([TRAIN_PATH, TEST_PATH], params)
+
+    def load_or_train(self, retrain=False):
+        # Serve from the saved artifact unless asked to retrain or the inputs changed
+        if not os.path.exists(TRAIN_PATH):
+            self.train_model()
+            return
+
+        fp = self.fingerprint()
+        if not retrain:
+            start = time.perf_counter()
+            state = model_store.load_artifact(fp, self.artifact_dir)
+            if state is not None and list(state["feature_names"]) == self.feature_names:
+                self._restore_state(state)
+                log.info("Loaded model artifact %s in %.1f ms", fp, (time.perf_counter() - start) * 1000)
+                return
+
         self.train_model()
+        if self.version is not None:
+            path = model_store.save_artifact(fp, self._artifact_state(), self.artifact_dir)
+            log.info("Saved model artifact to %s", path)
+
+    def load_artifact(self, fp):
+        # Serve one artifact that was already built (see model_holder.build_artifact) without
+        # hashing the training inputs again
+        state = model_store.load_artifact(fp, self.artifact_dir)
+        if state is None or list(state["feature_names"]) != self.feature_names:
+            raise RuntimeError(f"No usable model artifact {fp}")
+        self._restore_state(state)
+
+    def _artifact_state(self):
+        return {
+            "model": self.model,
+            "scaler": self.scaler,
+            "label_encoder": self.label_encoder,
+            "classes": list(self.classes),
+            "feature_names": list(self.feature_names),
+            "feature_means": self.feature_means,
+            "accuracy": self.accuracy,
+            "params": self.params,
+            "engine": self.engine.to_state(),
+            "explainer": self.explainer.to_state(),
+        }
+
+    def _restore_state(self, state):
+        self.model = state["model"]
+        self.scaler = state["scaler"]
+        self.label_encoder = state["label_encoder"]
+        self.classes = list(state["classes"])
+        self.feature_means = dict(state["feature_means"])
+        self._means = None
+        self.cache.clear()
+        self.accuracy = float(state["accuracy"])
+        self.version = state["fingerprint"]
+        prune_forest(self.model)
+        self.engine = FlatForest.from_state(state["engine"]) if "engine" in state else None
+        if self.engine is None:
+            self.engine = FlatForest.from_sklearn(self.model)
+        self.explainer = PathExplainer.from_state(state["explainer"]) if "explainer" in state else None
+        if self.explainer is None:
+            self.explainer = PathExplainer.from_sklearn(self.model)
 
     def train_model(self):
-        # Check for CSV files
-        train_path = os.path.join(os.path.dirname(__file__), "Blood_sample_dataset_balanced.csv")
-        test_path = os.path.join(os.path.dirname(__file__), "blood_samples_dataset_test.csv")
-        
-        if os.path.exists(train_path):
-            print("Loading real dataset...")
-            self._train_real_model(train_path, test_path)
+        self.version = None
+        self._means = None
+        self.cache.clear()
+        if os.path.exists(TRAIN_PATH):
+            log.info("Loading real dataset...")
+            self._train_real_model(TRAIN_PATH, TEST_PATH)
         else:
-            print("Dataset not found. Training dummy model (24 features)...")
+            log.warning("Dataset not found. Training dummy model (24 features)...")
             self._train_dummy_model()
+        prune_forest(self.model)
+        self.engine = FlatForest.from_sklearn(self.model)
+        self.explainer = PathExplainer.from_sklearn(self.model)
+        # The memo keeps the memory-mapped training columns alive; serving never reads them
+        dataset.release(TRAIN_PATH, TEST_PATH)
 
     def _train_real_model(self, train_path, test_path):
         try:
-            df_train = pd.read_csv(train_path)
-            
-            # Handle missing values broadly
-            for col in df_train.columns:
-                if df_train[col].dtype == "object":
-                    df_train[col] = df_train[col].fillna(df_train[col].mode()[0])
-                else:
-                    df_train[col] = df_train[col].fillna(df_train[col].mean())
-            
-            # Clean column names
-            df_train.columns = [c.strip() for c in df_train.columns]
-            
-            X_train = df_train[self.feature_names]
-            y_train = df_train["Disease"]
+            train = dataset.load(train_path)
+            X_train, y_train = train.matrix(self.feature_names, np.float64), train.labels()
             
             # Store means for prediction time imputation
-            self.feature_means = X_train.mean().to_dict()
-            print("Feature means calculated for imputing missing values.")
+            self.feature_means = {name: train.means[name] for name in self.feature_names}
+            log.info("Feature means calculated for imputing missing values.")
 
             # Apply SMOTE to balance classes if imblearn is available
             try:
@@ -71,69 +206,41 @@ class DiseasePredictor:
                 smote = SMOTE(random_state=42)
                 X_res, y_res = smote.fit_resample(X_train, y_train)
                 X_train, y_train = X_res, y_res
-                print("SMOTE applied: training set balanced.")
+                log.info("SMOTE applied: training set balanced.")
             except Exception as e:
-                print(f"SMOTE not applied: {e}")
+                log.info("SMOTE not applied: %s", e)
             
             # Encode labels
             y_train_encoded = self.label_encoder.fit_transform(y_train)
             self.classes = self.label_encoder.classes_
             
-            # Scaler
-            X_train_scaled = self.scaler.fit_transform(X_train)
+            # Scaler parameters come from the streaming statistics of the training CSV
+            self.scaler = scaler_from_stats(train.stats, self.feature_names)
+            X_train_scaled = self.scaler.transform(X_train)
             
             # Model
-            if HAS_IMBLEARN:
-                self.model = BalancedRandomForestClassifier(
-                    n_estimators=300,
-                    max_depth=10,
-                    min_samples_leaf=8,
-                    min_samples_split=12,
-                    max_features="sqrt",
-                    warm_start=True,
-                    random_state=42,
-                    n_jobs=-1
-                )
-            else:
-                self.model = RandomForestClassifier(
-                    n_estimators=300,
-                    max_depth=10,
-                    min_samples_leaf=8,
-                    min_samples_split=12,
-                    max_features="sqrt",
-                    class_weight='balanced',
-                    random_state=42,
-                    n_jobs=-1
-                )
+            self.model = make_forest(self.params)
                 
             self.model.fit(X_train_scaled, y_train_encoded)
-            print("Real model trained successfully.")
+            log.info("Real model trained successfully.")
 
             # Calculate Accuracy if test file exists
             if os.path.exists(test_path):
-                df_test = pd.read_csv(test_path)
-                # Clean and fill
-                for col in df_test.columns:
-                    if df_test[col].dtype == "object":
-                        df_test[col] = df_test[col].fillna(df_test[col].mode()[0])
-                    else:
-                        df_test[col] = df_test[col].fillna(df_test[col].mean())
-                df_test.columns = [c.strip() for c in df_test.columns]
-                
-                X_test = df_test[self.feature_names]
-                y_test = df_test["Disease"]
+                X_test, y_test = load_dataset(test_path, self.feature_names)
                 
                 X_test_scaled = self.scaler.transform(X_test)
                 y_test_encoded = self.label_encoder.transform(y_test)
                 
                 predictions = self.model.predict(X_test_scaled)
                 self.accuracy = accuracy_score(y_test_encoded, predictions)
-                print(f"Model Accuracy: {self.accuracy * 100:.2f}%")
+                log.info("Model Accuracy: %.2f%%", self.accuracy * 100)
             else:
                 self.accuracy = 0.0
+
+            self.version = self.fingerprint()
             
         except Exception as e:
-            print(f"Error training real model: {e}")
+            log.error("Error training real model: %s", e)
             self._train_dummy_model()
 
     def _train_dummy_model(self):
@@ -152,52 +259,212 @@ class DiseasePredictor:
         self.model = RandomForestClassifier(n_estimators=10, random_state=42)
         self.model.fit(X_dummy, y_dummy)
 
-    def predict(self, input_data):
+    def _build_key_index(self):
+        # Every accepted spelling of a feature name -> (column, rank); lower rank wins when a
+        # payload carries several spellings of the same feature
+        index = {}
+        for col, name in enumerate(self.feature_names):
+            snake = name.lower().replace(" ", "_").replace("-", "_")
+            aliases = (name, snake, name.replace("_", " "), name.lower(), snake.replace("_", " "))
+            for rank, alias in enumerate(aliases):
+                index.setdefault(alias, (col, rank))
+        return index
+
+    def _parse_dict(self, input_data, out, ranks=None):
+        # Single pass over the payload keys into a row pre-filled with the imputation means.
+        # ranks, when given, is filled in too: below _UNSET_RANK where the payload set a column
+        if ranks is None:
+            ranks = [_UNSET_RANK] * len(out)
+        key_index = self._key_index
+        for key, val in input_data.items():
+            hit = key_index.get(key)
+            if hit is None:
+                if not isinstance(key, str):
+                    continue
+                hit = key_index.get(key.strip().lower().replace(" ", "_").replace("-", "_"))
+                if hit is None:
+                    continue
+                hit = (hit[0], _FALLBACK_RANK)
+            col, rank = hit
+            if rank >= ranks[col] or val is None or val == "":
+                continue
+            try:
+                val = float(val)
+            except (ValueError, TypeError):
+                continue
+            if not math.isfinite(val): # NaN and +/-inf keep the mean
+                continue
+            out[col] = val
+            ranks[col] = rank
+        return out
+
+    def _row_features(self, input_data):
         # Expect input_data to be a list or dict of 24 features
-        # If dict, ensure order
-        
-        if not self.model:
-            self.train_model()
-            
-        features = []
+        # If dict, ensure order and fill missing values with the training means
         if isinstance(input_data, dict):
-            # Map dict keys to feature list order, filling MEAN if missing
-            for name in self.feature_names:
-                # Keys might match exactly or need normalization? 
-                # Assuming frontend sends matching keys or we normalize.
-                
-                # Normalize name: Lower case, replace spaces AND HYPHENS with underscores
-                normalized_name = name.lower().replace(" ", "_").replace("-", "_")
-                # Try original, normalized, and underscore-to-space variants
-                alt_name = name.replace("_", " ")
-                val = input_data.get(name) or input_data.get(normalized_name) or input_data.get(alt_name)
-                
-                # Get mean for this feature
-                default_val = self.feature_means.get(name, 0.0)
-                
-                if val is None or val == "":
-                     features.append(default_val)
-                else:
-                    try:
-                        features.append(float(val))
-                    except (ValueError, TypeError):
-                        features.append(default_val)
-                        
-        elif isinstance(input_data, list):
-            if len(input_data) != 24:
+            return self._parse_dict(input_data, list(self._mean_vector()[1]))
+
+        if isinstance(input_data, (list, tuple, np.ndarray)):
+            features = list(input_data)
+            if len(features) != 24:
                 # This fallback is riskier with list, filling 0s might be bad
                 # But lists are less likely to be used directly by frontend
-                features = input_data[:24] + [0]*(24-len(input_data))
+                features = features[:24] + [0]*(24-len(features))
+            return features
+
+        raise ValueError(f"Unsupported input type: {type(input_data).__name__}")
+
+    def to_matrix(self, rows):
+        # Build one (n, 24) float matrix from dicts/lists or a 2-D array, mean-filling gaps
+        if isinstance(rows, np.ndarray) and rows.ndim == 2:
+            if rows.shape[1] != len(self.feature_names):
+                raise ValueError(f"Expected {len(self.feature_names)} columns, got {rows.shape[1]}")
+            X = np.array(rows, dtype=np.float64)
+            check_missing = True
+        else:
+            means = self._mean_vector()[1]
+            parsed = []
+            check_missing = False
+            for row in rows:
+                if isinstance(row, dict):
+                    parsed.append(self._parse_dict(row, list(means)))
+                else:
+                    parsed.append(self._row_features(row))
+                    check_missing = True
+            X = np.array(parsed, dtype=np.float64).reshape(-1, len(self.feature_names))
+
+        # Dict rows are imputed while parsing; lists and arrays may still carry NaN or +/-inf
+        if check_missing:
+            missing = ~np.isfinite(X)
+            if missing.any():
+                X[missing] = np.take(self._mean_vector()[0], np.nonzero(missing)[1])
+        return X
+
+    def encode_rows(self, rows):
+        # -> (X, masks): the imputed matrix to_matrix builds, and per row a bitmask of the
+        # features the payload actually supplied (bit j is feature_names[j])
+        with STAGE_SECONDS.time("features"):
+            means = self._mean_vector()[1]
+            X = np.empty((len(rows), len(means)))
+            masks = []
+            for i, row in enumerate(rows):
+                if isinstance(row, dict):
+                    ranks = [_UNSET_RANK] * len(means)
+                    X[i] = self._parse_dict(row, list(means), ranks)
+                    masks.append(sum(1 << j for j, rank in enumerate(ranks) if rank < _UNSET_RANK))
+                else:
+                    # Lists are positional; padded and non-finite columns were not supplied
+                    supplied = np.array(self._row_features(row), dtype=np.float64)
+                    X[i] = self.to_matrix(supplied.reshape(1, -1))[0]
+                    n = min(len(row), len(means))
+                    masks.append(sum(1 << j for j in range(n) if math.isfinite(supplied[j])))
+            return X, masks
+
+    def _mean_vector(self):
+        # feature_means in column order, as an array and as a list to copy rows from
+        if self._means is None:
+            means = [float(self.feature_means.get(name, 0.0)) for name in self.feature_names]
+            self._means = (np.array(means), tuple(means))
+        return self._means
+
+    def _features(self, rows):
+        # A matrix from encode_rows was timed as the "features" stage there; to_matrix only
+        # checks it again, so it is not counted twice
+        if isinstance(rows, np.ndarray):
+            return self.to_matrix(rows)
+        with STAGE_SECONDS.time("features"):
+            return self.to_matrix(rows)
+
+    def _cache_keys(self, X):
+        if self.cache_quantum > 0:
+            X = np.round(X / self.cache_quantum).astype(np.int64)
+        return [row.tobytes() for row in X]
+
+    def predict_batch(self, rows):
+        # Impute, scale and predict all rows as a single matrix. Never trains inline: a
+        # replacement model is built off the request path by model_holder.ModelHolder
+        if self.model is None:
+            raise RuntimeError("Model is not loaded")
+
+        X = self._features(rows)
+        if len(X) == 0:
+            return []
+        if self.cache.maxsize <= 0:
+            return self._predict_matrix(X)
+
+        # Only rows whose (quantized) feature vector has not been seen go to the model
+        with STAGE_SECONDS.time("cache"):
+            keys = self._cache_keys(X)
+            results = self.cache.get_many(keys)
+        misses = [i for i, result in enumerate(results) if result is MISSING]
+        if misses:
+            predicted = self._predict_matrix(X[misses])
+            for i, result in zip(misses, predicted):
+                results[i] = result
+            self.cache.put_many((keys[i], result) for i, result in zip(misses, predicted))
+        return results
+
+    def _predict_matrix(self, X):
+        # Same arithmetic as StandardScaler.transform without its per-call validation
+        with STAGE_SECONDS.time("scale"):
+            features_scaled = (X - self.scaler.mean_) / self.scaler.scale_
+        with STAGE_SECONDS.time("inference"):
+            if len(X) <= ENGINE_MAX_ROWS:
+                pred_idx = self.engine.predict(features_scaled)
             else:
-                features = input_data
-        
-        # Scale
-        features_scaled = self.scaler.transform([features])
-        
-        # Predict
-        pred_idx = self.model.predict(features_scaled)[0]
-        pred_class = self.classes[pred_idx]
-        
-        return pred_class
+                pred_idx = self.model.predict(features_scaled)
+        return [self.classes[i] for i in pred_idx]
+
+    def predict(self, input_data):
+        return self.predict_batch([input_data])[0]
+
+    def explain_batch(self, rows, top_k=3):
+        # Prediction, the top_k class probabilities and every feature's contribution to the
+        # predicted class's probability, largest first; base_probability plus the
+        # contributions adds up to that probability. Not cached
+        if self.model is None:
+            raise RuntimeError("Model is not loaded")
+        X = self._features(rows)
+        results = []
+        for start in range(0, len(X), CHUNK_ROWS):
+            with STAGE_SECONDS.time("scale"):
+                features_scaled = (X[start:start + CHUNK_ROWS] - self.scaler.mean_) / self.scaler.scale_
+            with STAGE_SECONDS.time("inference"):
+                leaves = self.engine.apply(features_scaled)
+                proba = self.engine.leaf_proba(leaves)
+            with STAGE_SECONDS.time("explain"):
+                contributions = self.explainer.contributions(leaves)
+            for row, row_proba, row_contributions in zip(X[start:start + CHUNK_ROWS], proba, contributions):
+                best = int(np.argmax(row_proba))
+                scores = row_contributions[:, best]
+                results.append({
+                    "prediction": self.classes[self.engine.classes[best]],
+                    "probabilities": [
+                        {"class": self.classes[self.engine.classes[i]], "probability": float(row_proba[i])}
+                        for i in np.argsort(-row_proba, kind="stable")[:top_k]
+                    ],
+                    "base_probability": float(self.explainer.bias[best]),
+                    "contributions": [
+                        {"feature": self.feature_names[j], "value": float(row[j]),
+                         "contribution": float(scores[j])}
+                        for j in np.argsort(-np.abs(scores), kind="stable")
+                    ],
+                })
+        return results
+
+def main(argv=None):
+    # Explicit training command: python ml_model.py --retrain
+    parser = argparse.ArgumentParser(description="Train or load the disease prediction model artifact")
+    parser.add_argument("--retrain", action="store_true", help="ignore any saved artifact and train from the CSVs")
+    parser.add_argument("--artifact-dir", default=None, help="directory for model artifacts")
+    args = parser.parse_args(argv)
+    configure_logging()
+
+    trained = DiseasePredictor(retrain=args.retrain, artifact_dir=args.artifact_dir)
+    print(f"Model version: {trained.version}")
+    print(f"Model Accuracy: {trained.accuracy * 100:.2f}%")
 
-predictor = DiseasePredictor()
+if __name__ == "__main__":
+    main()
+else:
+    predictor = DiseasePredictor()
@@ -0,0 +1,168 @@
+import os
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+from log_setup import get_logger
+
+# Holds the serving DiseasePredictor and replaces it without a restart. A replacement is
+# built off the request path (training runs in a child process, so it does not compete
+# with requests for the GIL; the new artifact is then loaded in a background thread),
+# checked against the held-out test CSV and swapped in with a single reference
+# assignment. Callers read `current` once per request, so in-flight requests finish on
+# the model they started with.
+
+MODEL_SWAP_TOLERANCE = float(os.environ.get("MODEL_SWAP_TOLERANCE", "0.01"))
+TRAIN_TIMEOUT = float(os.environ.get("MODEL_TRAIN_TIMEOUT", "3600"))
+
+log = get_logger("model_holder")
+
+
+class ReloadInProgress(Exception):
+    pass
+
+
+def build_artifact(retrain=False, artifact_dir=None):
+    # Runs `python ml_model.py`, which loads or (re)trains and saves the artifact, in a child
+    # process -> the fingerprint of the artifact it left behind
+    import ml_model
+    command = [sys.executable, ml_model.__file__]
+    if retrain:
+        command.append("--retrain")
+    if artifact_dir:
+        command += ["--artifact-dir", artifact_dir]
+    done = subprocess.run(command, check=True, capture_output=True, text=True, timeout=TRAIN_TIMEOUT)
+    for line in done.stdout.splitlines():
+        if line.startswith("Model version: "):
+            version = line.split(": ", 1)[1].strip()
+            if version != "None":
+                return version
+    raise RuntimeError("ml_model.py did not produce a trained model")
+
+
+class ModelHolder:
+    def __init__(self, predictor, factory=None, test_path=None, tolerance=MODEL_SWAP_TOLERANCE,
+                 train_in_subprocess=True):
+        self._current = predictor
+        self._factory = factory # factory(retrain) -> DiseasePredictor; defaults to ml_model's
+        self.test_path = test_path
+        self.tolerance = tolerance
+        self.train_in_subprocess = train_in_subprocess
+        self._lock = threading.Lock()
+        self._thread = None
+        self.loaded_at = datetime.utcnow()
+        self.swaps = 0
+        self.last_reload = None # status of the most recent reload
+
+    @property
+    def current(self):
+        return self._current
+
+    def predict(self, input_data):
+        return self._current.predict(input_data)
+
+    def predict_batch(self, rows):
+        return self._current.predict_batch(rows)
+
+    def reloading(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def reload(self, retrain=False, wait=False, fingerprint=None):
+        # Starts building a replacement, or only loading it when the artifact with that
+        # fingerprint was built elsewhere; raises ReloadInProgress if one is already running
+        with self._lock:
+            if self.reloading():
+                raise ReloadInProgress("A model reload is already running")
+            self.last_reload = {"state": "building", "retrain": retrain, "started_at": datetime.utcnow(),
+                                "finished_at": None, "version": None, "test_accuracy": None, "error": None}
+            self._thread = threading.Thread(target=self._reload, args=(retrain, fingerprint), name="model-reload",
+                                            daemon=True)
+            self._thread.start()
+        if wait:
+            self._thread.join()
+        return self.last_reload
+
+    def _reload(self, retrain, fingerprint=None):
+        status = self.last_reload
+        start = time.perf_counter()
+        try:
+            candidate = self._build(retrain, fingerprint)
+            status["state"] = "validating"
+            status["version"] = candidate.version
+            ok, accuracy, reason = self.validate(candidate)
+            status["test_accuracy"] = accuracy
+            if not ok:
+                status["state"] = "rejected"
+                status["error"] = reason
+                log.warning("Rejected model %s: %s", candidate.version, reason)
+                return
+            self.swap(candidate)
+            status["state"] = "swapped"
+            log.info("Swapped in model %s (test accuracy %.4f) after %.1f s",
+                     candidate.version, accuracy, time.perf_counter() - start)
+        except Exception as e:
+            status["state"] = "failed"
+            status["error"] = str(e)
+            log.exception("Model reload failed: %s", e)
+        finally:
+            status["finished_at"] = datetime.utcnow()
+
+    def _build(self, retrain, fingerprint=None):
+        factory = self._factory
+        if factory is None:
+            from ml_model import DiseasePredictor
+            artifact_dir = self._current.artifact_dir
+            if fingerprint is None and self.train_in_subprocess:
+                # This process then only has to load what the child saved
+                fingerprint = build_artifact(retrain, artifact_dir)
+            if fingerprint is not None:
+                return DiseasePredictor(artifact_dir=artifact_dir, fingerprint=fingerprint)
+            factory = lambda retrain: DiseasePredictor(retrain=retrain, artifact_dir=artifact_dir)
+        return factory(retrain)
+
+    def validate(self, candidate):
+        # (ok, test accuracy, reason). The replacement must be a real model and must not
+        # score more than `tolerance` below the model it replaces on the test CSV
+        if candidate.model is None or candidate.version is None:
+            return False, None, "replacement is not a trained model"
+        test_path = self.test_path
+        if test_path is None:
+            from ml_model import TEST_PATH
+            test_path = TEST_PATH
+        if not os.path.exists(test_path):
+            log.warning("No test CSV at %s; swapping without validation", test_path)
+            return True, None, None
+        from ml_model import load_dataset
+        X, y = load_dataset(test_path, candidate.feature_names)
+        # _predict_matrix bypasses the prediction cache, which would fill with test rows
+        predicted = candidate._predict_matrix(candidate.to_matrix(X))
+        accuracy = float(np.mean(np.asarray(predicted) == y))
+        floor = self._current.accuracy - self.tolerance
+        if accuracy < floor:
+            return False, accuracy, f"test accuracy {accuracy:.4f} is below {floor:.4f}"
+        return True, accuracy, None
+
+    def swap(self, candidate):
+        with self._lock:
+            previous = self._current
+            self._current = candidate
+            self.loaded_at = datetime.utcnow()
+            self.swaps += 1
+        return previous
+
+    def stats(self):
+        current = self._current
+        return {
+            "version": current.version,
+            "accuracy": current.accuracy,
+            "params": getattr(current, "params", None),
+            "engine_bytes": current.engine.nbytes if getattr(current, "engine", None) is not None else None,
+            "loaded_at": self.loaded_at.isoformat(),
+            "swaps": self.swaps,
+            "reloading": self.reloading(),
+            "last_reload": self.last_reload,
+        }
@@ -0,0 +1,256 @@
+import argparse
+import html
+import itertools
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import numpy as np
+from sklearn.model_selection import StratifiedKFold
+from sklearn.preprocessing import StandardScaler
+
+import model_store
+from log_setup import configure_logging, get_logger
+
+# Headless hyperparameter search for the serving forest. Every (max_depth,
+# min_samples_leaf, max_features) candidate runs in a process-pool worker, which grows one
+# forest through the n_estimators steps with warm_start, scoring it after each step
+# instead of refitting from scratch. Scores are out-of-bag when the estimator bootstraps;
+# otherwise (imblearn's BalancedRandomForest defaults to bootstrap=False) they are the
+# mean accuracy over cross-validation folds that are resampled and scaled once, up front,
+# and shared with the workers. The best parameters are saved next to the model artifacts,
+# the serving artifact is retrained with them, and a JSON/HTML report is written.
+#
+# Usage: python model_search.py [--n-estimators 100 200 300] [--max-depth 6 10 14]
+#            [--min-samples-leaf 4 8 16] [--max-features sqrt log2] [--cv 3] [--workers N]
+
+log = get_logger("model_search")
+
+_data = None # set in every worker by _init_worker
+
+
+def _smote(X, y):
+    try:
+        from imblearn.over_sampling import SMOTE
+        return SMOTE(random_state=42).fit_resample(X, y)
+    except Exception:
+        return X, y
+
+
+def prepare_data(X, y, cv, seed=42, scaler=None):
+    # Same preprocessing as DiseasePredictor._train_real_model: SMOTE on the training rows,
+    # scaled by the serving scaler, which comes from the training CSV's streaming statistics
+    # (ml_model.scaler_from_stats) and so does not depend on SMOTE or on the fold. Without
+    # one it is fitted on X before resampling. With cv > 0 SMOTE runs once per fold
+    if scaler is None:
+        scaler = StandardScaler().fit(X)
+    if cv <= 0:
+        X_res, y_res = _smote(X, y)
+        return {"mode": "oob", "X": scaler.transform(X_res), "y": np.asarray(y_res)}
+    folds = []
+    for train_idx, val_idx in StratifiedKFold(cv, shuffle=True, random_state=seed).split(X, y):
+        X_res, y_res = _smote(X[train_idx], y[train_idx])
+        folds.append((scaler.transform(X_res), np.asarray(y_res), scaler.transform(X[val_idx]), y[val_idx]))
+    return {"mode": "cv", "folds": folds}
+
+
+def _init_worker(data):
+    global _data
+    _data = data
+
+
+def _grow(forest, steps, X, y, score):
+    # Adds trees with warm_start and scores after each step: {n_estimators: (score, seconds)}
+    results = {}
+    elapsed = 0.0
+    for n in steps:
+        forest.set_params(n_estimators=n)
+        start = time.perf_counter()
+        forest.fit(X, y)
+        elapsed += time.perf_counter() - start
+        results[n] = (score(forest), elapsed)
+    return results
+
+
+def evaluate(candidate):
+    from ml_model import make_forest
+    params, steps = candidate
+    if _data["mode"] == "oob":
+        forest = make_forest(params, n_estimators=steps[0], warm_start=True, oob_score=True, n_jobs=1)
+        per_step = _grow(forest, steps, _data["X"], _data["y"], lambda f: f.oob_score_)
+        scores = {n: ([s], t) for n, (s, t) in per_step.items()}
+    else:
+        scores = {n: ([], 0.0) for n in steps}
+        for X_train, y_train, X_val, y_val in _data["folds"]:
+            forest = make_forest(params, n_estimators=steps[0], warm_start=True, n_jobs=1)
+            per_step = _grow(forest, steps, X_train, y_train, lambda f: float(np.mean(f.predict(X_val) == y_val)))
+            for n, (s, t) in per_step.items():
+                scores[n][0].append(s)
+                scores[n] = (scores[n][0], scores[n][1] + t)
+    return [dict(params, n_estimators=n, score=float(np.mean(s)), score_std=float(np.std(s)), fit_seconds=t)
+            for n, (s, t) in scores.items()]
+
+
+def candidates(space, defaults):
+    steps = sorted(space["n_estimators"])
+    keys = [k for k in space if k != "n_estimators"]
+    for values in itertools.product(*(space[k] for k in keys)):
+        params = dict(defaults, **dict(zip(keys, values)))
+        params.pop("n_estimators", None)
+        yield params, steps
+
+
+def rank(rows):
+    # Best score first; ties go to the smaller, cheaper forest
+    return sorted(rows, key=lambda r: (-round(r["score"], 6), r["n_estimators"], r["max_depth"] or 1 << 30))
+
+
+def search(X, y, space, defaults, cv, workers, scaler=None):
+    data = prepare_data(X, y, cv, scaler=scaler)
+    tasks = list(candidates(space, defaults))
+    rows = []
+    if workers <= 1:
+        _init_worker(data)
+        for task in tasks:
+            rows.extend(evaluate(task))
+    else:
+        with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(data,)) as pool:
+            for result in pool.map(evaluate, tasks):
+                rows.extend(result)
+    return data["mode"], rank(rows)
+
+
+def write_report(report, report_dir):
+    os.makedirs(report_dir, exist_ok=True)
+    json_path = os.path.join(report_dir, "search_report.json")
+    with open(json_path, "w") as f:
+        json.dump(report, f, indent=2, default=str)
+
+    columns = ["n_estimators", "max_depth", "min_samples_leaf", "max_features", "score", "score_std", "fit_seconds"]
+    best = report["best"]
+    rows = []
+    for row in report["candidates"]:
+        is_best = all(row.get(c) == best.get(c) for c in columns[:4])
+        cells = "".join(f"<td>{html.escape(f'{row[c]:.4f}' if isinstance(row[c], float) else str(row[c]))}</td>"
+                        for c in columns)
+        attrs = ' class="best"' if is_best else ''
+        rows.append(f"<tr{attrs}>{cells}</tr>")
+    test_accuracy = "n/a" if report["test_accuracy"] is None else f"{report['test_accuracy']:.4f}"
+    page = f"""<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>Model search report</title>
+<style>body{{font-family:sans-serif}}table{{border-collapse:collapse}}td,th{{border:1px solid #ccc;padding:4px 8px;text-align:right}}tr.best{{background:#dfd}}</style>
+</head><body>
+<h1>Model search report</h1>
+<p>{html.escape(report['created_at'])} &middot; scoring: {html.escape(report['scoring'])} &middot;
+{len(report['candidates'])} candidates in {report['elapsed_seconds']:.1f} s on {report['workers']} workers</p>
+<p>Best: {html.escape(json.dumps(report['best_params']))}<br>
+Selection score {best['score']:.4f} &middot; test accuracy {test_accuracy} &middot; artifact {html.escape(str(report['artifact']))}</p>
+<table><tr>{''.join(f'<th>{c}</th>' for c in columns)}</tr>
+{chr(10).join(rows)}
+</table></body></html>
+"""
+    html_path = os.path.join(report_dir, "search_report.html")
+    with open(html_path, "w") as f:
+        f.write(page)
+    return json_path, html_path
+
+
+def parse_max_depth(value):
+    return None if value.lower() == "none" else int(value)
+
+
+def parse_max_features(value):
+    if value in ("sqrt", "log2"):
+        return value
+    if value.lower() == "none":
+        return None
+    return float(value) if "." in value else int(value)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Parallel hyperparameter search for the serving forest")
+    parser.add_argument("--n-estimators", type=int, nargs="+", default=[100, 200, 300])
+    parser.add_argument("--max-depth", type=parse_max_depth, nargs="+", default=[6, 10, 14])
+    parser.add_argument("--min-samples-leaf", type=int, nargs="+", default=[4, 8, 16])
+    parser.add_argument("--max-features", type=parse_max_features, nargs="+", default=["sqrt", "log2"])
+    parser.add_argument("--cv", type=int, default=3,
+                        help="folds when out-of-bag scoring is unavailable (0 forces OOB)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--artifact-dir", default=None, help="where tuned params and the artifact are written")
+    parser.add_argument("--report-dir", default=None, help="defaults to <artifact dir>/search")
+    parser.add_argument("--no-save", action="store_true", help="only report; keep the current serving model")
+    parser.add_argument("--force", action="store_true",
+                        help="promote the best parameters even if the held-out test accuracy drops")
+    args = parser.parse_args(argv)
+    configure_logging()
+
+    import dataset
+    from ml_model import (DiseasePredictor, FEATURE_NAMES, HAS_IMBLEARN, TRAIN_PATH, load_dataset, make_forest,
+                          scaler_from_stats)
+
+    space = {
+        "n_estimators": args.n_estimators,
+        "max_depth": args.max_depth,
+        "min_samples_leaf": args.min_samples_leaf,
+        "max_features": args.max_features,
+    }
+    defaults = model_store.load_params(args.artifact_dir)
+    cv = args.cv
+    if make_forest(defaults).get_params().get("bootstrap"):
+        cv = 0 # out-of-bag estimates come for free with bootstrapped trees
+    elif cv <= 0:
+        parser.error("the estimator does not bootstrap, so out-of-bag scoring is unavailable; use --cv >= 2")
+
+    X, y = load_dataset(TRAIN_PATH, FEATURE_NAMES)
+    scaler = scaler_from_stats(dataset.stats(TRAIN_PATH), FEATURE_NAMES)
+    start = time.perf_counter()
+    scoring, rows = search(X, y, space, defaults, cv, args.workers, scaler)
+    elapsed = time.perf_counter() - start
+    best = rows[0]
+    best_params = dict(defaults, **{k: best[k] for k in space})
+    log.info("Best %s: %s (score %.4f)", scoring, best_params, best["score"])
+    for row in rows[:5]:
+        print(f"{row['score']:.4f} ±{row['score_std']:.4f}  n_estimators={row['n_estimators']} "
+              f"max_depth={row['max_depth']} min_samples_leaf={row['min_samples_leaf']} "
+              f"max_features={row['max_features']}  ({row['fit_seconds']:.1f} s)")
+
+    test_accuracy, artifact, promoted = None, None, False
+    if not args.no_save:
+        # The test CSV only guards the promotion; it takes no part in the selection
+        current = DiseasePredictor(artifact_dir=args.artifact_dir, params=defaults, cache_size=0)
+        trained = DiseasePredictor(retrain=True, artifact_dir=args.artifact_dir, params=best_params, cache_size=0)
+        test_accuracy, artifact = trained.accuracy, trained.version
+        promoted = args.force or test_accuracy >= current.accuracy
+        if promoted:
+            model_store.save_params(best_params, args.artifact_dir)
+            print(f"Serving artifact {artifact} promoted; test accuracy "
+                  f"{current.accuracy * 100:.2f}% -> {test_accuracy * 100:.2f}%")
+        else:
+            log.warning("Kept the current parameters: test accuracy would drop from %.2f%% to %.2f%% "
+                        "(use --force to promote anyway)", current.accuracy * 100, test_accuracy * 100)
+
+    report = {
+        "created_at": datetime.utcnow().isoformat(),
+        "scoring": f"{cv}-fold cv" if scoring == "cv" else "oob",
+        "estimator": "BalancedRandomForestClassifier" if HAS_IMBLEARN else "RandomForestClassifier",
+        "search_space": space,
+        "workers": args.workers,
+        "elapsed_seconds": elapsed,
+        "best": best,
+        "best_params": best_params,
+        "test_accuracy": test_accuracy,
+        "artifact": artifact,
+        "promoted": promoted,
+        "candidates": rows,
+    }
+    report_dir = args.report_dir or os.path.join(args.artifact_dir or model_store.ARTIFACT_DIR, "search")
+    for path in write_report(report, report_dir):
+        print(f"Report: {path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
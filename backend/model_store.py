@@ -0,0 +1,106 @@
+import hashlib
+import json
+import os
+from datetime import datetime
+
+import joblib
+import sklearn
+
+from log_setup import get_logger
+
+log = get_logger("model_store")
+
+# Bump when the layout of the saved state changes so old artifacts are ignored
+ARTIFACT_FORMAT = 2
+
+ARTIFACT_DIR = os.environ.get(
+    "MODEL_ARTIFACT_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".model_artifacts")
+)
+
+
+# Hyperparameters of the serving forest. model_search.py writes tuned values to
+# PARAMS_FILE in the artifact directory; they override these defaults
+DEFAULT_MODEL_PARAMS = {
+    "n_estimators": 300,
+    "max_depth": 10,
+    "min_samples_leaf": 8,
+    "min_samples_split": 12,
+    "max_features": "sqrt",
+    "random_state": 42,
+}
+PARAMS_FILE = "model_params.json"
+
+
+def load_params(artifact_dir=None, defaults=DEFAULT_MODEL_PARAMS):
+    path = os.path.join(artifact_dir or ARTIFACT_DIR, PARAMS_FILE)
+    params = dict(defaults)
+    if os.path.exists(path):
+        try:
+            with open(path) as f:
+                tuned = json.load(f)
+            params.update({k: v for k, v in tuned.items() if k in defaults})
+        except (OSError, ValueError) as e:
+            log.warning("Ignoring tuned parameters in %s: %s", path, e)
+    return params
+
+
+def save_params(params, artifact_dir=None):
+    path = os.path.join(artifact_dir or ARTIFACT_DIR, PARAMS_FILE)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(params, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+    return path
+
+
+def fingerprint(paths, params):
+    # Hash the training inputs together with everything that changes the fitted model
+    h = hashlib.sha256()
+    header = {
+        "format": ARTIFACT_FORMAT,
+        "sklearn": sklearn.__version__,
+        "params": params,
+    }
+    h.update(json.dumps(header, sort_keys=True, default=str).encode())
+    for path in paths:
+        h.update(os.path.basename(path).encode())
+        if not os.path.exists(path):
+            h.update(b"<missing>")
+            continue
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+    return h.hexdigest()[:16]
+
+
+def artifact_path(fp, artifact_dir=None):
+    return os.path.join(artifact_dir or ARTIFACT_DIR, f"disease_predictor-{fp}.joblib")
+
+
+def save_artifact(fp, state, artifact_dir=None):
+    path = artifact_path(fp, artifact_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    state = dict(state, fingerprint=fp, format=ARTIFACT_FORMAT,
+                 saved_at=datetime.utcnow().isoformat())
+    # Write to a temp file first so a concurrent loader never sees a partial artifact
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    joblib.dump(state, tmp_path)
+    os.replace(tmp_path, path)
+    return path
+
+
+def load_artifact(fp, artifact_dir=None):
+    path = artifact_path(fp, artifact_dir)
+    if not os.path.exists(path):
+        return None
+    try:
+        # Uncompressed numpy arrays are memory-mapped instead of copied into the heap
+        state = joblib.load(path, mmap_mode="r")
+    except Exception as e:
+        log.warning("Could not load model artifact %s: %s", path, e)
+        return None
+    if state.get("format") != ARTIFACT_FORMAT or state.get("fingerprint") != fp:
+        return None
+    return state
@@ -7,20 +7,28 @@ class User:
         return {
             "name": name,
             "email": email,
-            "password": password, # In production, hash this!
+            "password": password, # auth.hash_password() output
+            "role": "patient", # see auth.ROLES; doctors and admins are set with auth.py set-role
             "medical_history": [],
             "created_at": datetime.utcnow()
         }
 
 class Prediction:
     @staticmethod
-    def create(user_id, input_data, prediction_result):
-        return {
+    def create(user_id, input_data, prediction_result, model_version=None, features=None, present=0):
+        doc = {
             "user_id": ObjectId(user_id) if user_id else None,
-            "input_data": input_data,
             "prediction_result": prediction_result,
+            "model_version": model_version,
             "created_at": datetime.utcnow()
         }
+        if features is not None:
+            # Packed vector and presence mask (feature_vectors.py); input_data is then optional
+            doc["features"] = features
+            doc["present"] = present
+        if input_data is not None:
+            doc["input_data"] = input_data
+        return doc
 
 class Disease:
     @staticmethod
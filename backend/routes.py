@@ -1,110 +1,582 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify, stream_with_context
 from database import mongo
 from models import User, Prediction
 from ml_model import predictor, HAS_IMBLEARN
-from bson import ObjectId, json_util
-import json
+from model_holder import ModelHolder, ReloadInProgress
+from batching import MicroBatcher
+from caching import TTLCache, MISSING
+from write_behind import WriteBehindQueue, WriteQueueFull
+from metrics import registry, STAGE_SECONDS, DB_SECONDS
+from log_setup import get_logger
+import aggregates
+import auth
+import feature_vectors
+import serialization
+from bson import ObjectId
+from datetime import datetime
+import base64
+import hmac
+import itertools
+import os
 
 api = Blueprint('api', __name__)
+log = get_logger("routes")
 
-def parse_json(data):
-    return json.loads(json_util.dumps(data))
+MAX_BATCH_SIZE = 1000
+
+# Page sizes for the history/dashboard listings
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+EXPORT_CHUNK_SIZE = 500
+
+# Fields each listing reads and returns. The patient's own history leaves out the stored
+# explanation and their own user_id, and turns the packed feature vector back into
+# input_data; the dashboard leaves out the inputs as well and gets patient_name joined in.
+# Login never reads the medical history
+HISTORY_FIELDS = ("_id", "created_at", "prediction_result", "input_data", "features", "present", "model_version")
+DASHBOARD_FIELDS = ("_id", "created_at", "user_id", "prediction_result", "model_version", "explanation")
+LOGIN_FIELDS = ("_id", "name", "email", "password", "role", "created_at")
+
+# Concurrent /predict calls are coalesced into one model call; a 0 ms window disables it
+PREDICT_BATCH_WINDOW_MS = float(os.environ.get("PREDICT_BATCH_WINDOW_MS", "2"))
+PREDICT_MAX_BATCH = int(os.environ.get("PREDICT_MAX_BATCH", "64"))
+# Class probabilities returned by /predict with "explain": true unless top_k is given
+DEFAULT_TOP_K = 3
+RECOMMENDATION = "Consult a doctor for further advice."
+# The serving model; replaced at runtime through /api/admin/model/reload
+model_holder = ModelHolder(predictor)
+
+# Admin endpoints require this value in X-Admin-Token; without it they are disabled
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN")
+
+# Password hashing runs on a bounded thread pool; login hands out signed session tokens
+# whose verification is cached (see auth.py)
+password_pool = auth.PasswordPool()
+sessions = auth.TokenAuth(auth.secret_key())
+
+predict_batcher = MicroBatcher(lambda inputs: score_rows(inputs), PREDICT_MAX_BATCH, PREDICT_BATCH_WINDOW_MS)
+
+# Prediction records are written in the background with insert_many. PREDICTION_WRITE_MODE
+# "sync" makes /predict wait for the flush containing its record
+prediction_writer = WriteBehindQueue(
+    lambda: mongo.db.predictions,
+    max_queue=int(os.environ.get("PREDICTION_WRITE_QUEUE", "10000")),
+    flush_size=int(os.environ.get("PREDICTION_FLUSH_SIZE", "256")),
+    flush_interval_ms=float(os.environ.get("PREDICTION_FLUSH_MS", "50")),
+    durability=os.environ.get("PREDICTION_WRITE_MODE", "async"),
+)
+# Every written batch is folded into the counters /api/stats reads
+prediction_writer.add_flush_listener(lambda docs: aggregates.record(mongo.db, docs))
+
+# user _id -> display name (None when the user no longer exists) for dashboard refreshes
+patient_name_cache = TTLCache(maxsize=50000, ttl=float(os.environ.get("PATIENT_NAME_TTL", "60")))
+
+registry.stats_gauges("predict_batching", predict_batcher.stats)
+registry.stats_gauges("prediction_cache", lambda: model_holder.current.cache.stats())
+registry.stats_gauges("model", model_holder.stats)
+registry.stats_gauges("prediction_writes", prediction_writer.stats)
+registry.stats_gauges("patient_name_cache", patient_name_cache.stats)
+registry.stats_gauges("password_hashing", password_pool.stats)
+registry.stats_gauges("session_cache", sessions.stats)
+
+class ApiError(Exception):
+    # An error response, {"error": message, **extra} with the given status, raised by the
+    # handler bodies the Flask routes and asgi.py share
+    def __init__(self, message, status=400, **extra):
+        super().__init__(message)
+        self.status = status
+        self.extra = extra
+
+    def body(self):
+        return {"error": str(self), **self.extra}
+
+def json_response(obj, status=200):
+    # Mongo documents encoded in one pass, ObjectIds and datetimes included (serialization.py)
+    return Response(serialization.dumps(obj), status, mimetype="application/json")
+
+def attach_patient_names(db, predictions, cache=None):
+    # Resolve every distinct user once with a single $in query instead of one lookup per row
+    user_ids = list({p['user_id'] for p in predictions if p.get('user_id')})
+    cached = cache.get_many(user_ids) if cache is not None else [MISSING] * len(user_ids)
+    names = {uid: name for uid, name in zip(user_ids, cached) if name is not MISSING}
+
+    missing = [uid for uid, name in zip(user_ids, cached) if name is MISSING]
+    if missing:
+        found = {}
+        with DB_SECONDS.time("users.find_many"):
+            for user in db.users.find({"_id": mongo.in_filter(missing)}):
+                found[user['_id']] = user.get('name', 'Unknown')
+        fetched = {uid: found.get(uid) for uid in missing}
+        names.update(fetched)
+        if cache is not None:
+            cache.put_many(fetched.items())
+
+    for p in predictions:
+        name = names.get(p['user_id']) if p.get('user_id') else None
+        p['patient_name'] = "Anonymous" if name is None else name
+    return predictions
+
+def authenticate(required=True):
+    # Identity behind the request's bearer token; None without one when it is optional
+    token = auth.bearer_token(request.headers.get('Authorization'))
+    if token is None:
+        if required:
+            raise auth.AuthError("Authentication required")
+        return None
+    with STAGE_SECONDS.time("auth"):
+        return sessions.verify(token, mongo.db)
+
+def prediction_owner(identity, user_id):
+    # Predictions belong to the token's user; a user_id sent alongside must be that user.
+    # Without a token they are anonymous ("anonymous" or no user_id)
+    try:
+        requested = ObjectId(user_id) if user_id else None
+    except Exception:
+        requested = None
+    if identity is None:
+        if requested is not None:
+            raise auth.AuthError("Authentication required to record predictions for a user")
+        return None
+    if requested is not None and requested != identity["user_id"]:
+        raise auth.AuthError("Cannot record predictions for another user", 403)
+    return identity["user_id"]
+
+def score_rows(inputs):
+    # Parses the payloads once and predicts them on one model -> per input
+    # (result, model version, feature vector, presence mask). Reading model_holder.current
+    # once keeps the stored vector and version those of the model that gave the result,
+    # even when a reload swaps models meanwhile
+    model = model_holder.current
+    try:
+        X, masks = model.encode_rows(inputs)
+        results = model.predict_batch(X)
+    except (ValueError, TypeError) as e:
+        raise ApiError(str(e))
+    return list(zip(results, itertools.repeat(model.version), X, masks))
+
+def explain_one(input_data, top_k):
+    # /predict with "explain": true -> (scored as score_rows gives it, explanation)
+    model = model_holder.current
+    try:
+        X, masks = model.encode_rows([input_data])
+        explanation = model.explain_batch(X, top_k)[0]
+    except (ValueError, TypeError) as e:
+        raise ApiError(str(e))
+    return (explanation.pop("prediction"), model.version, X[0], masks[0]), explanation
+
+def prediction_docs(owners, inputs, scored):
+    # Records of one request's predictions, inputs packed by feature_vectors
+    keep_raw = feature_vectors.STORE_RAW_INPUT
+    return [Prediction.create(owner, input_data if keep_raw else None, result, version,
+                              feature_vectors.pack(row), mask)
+            for owner, input_data, (result, version, row, mask) in zip(owners, inputs, scored)]
+
+def predict_records(owners, inputs):
+    # Batch predictions from a single parse of the inputs -> (results, records)
+    scored = score_rows(inputs)
+    return [result for result, _, _, _ in scored], prediction_docs(owners, inputs, scored)
+
+def encode_cursor(doc):
+    # Opaque keyset cursor: position just after (created_at, _id) of the last returned doc
+    raw = f"{doc['created_at'].isoformat()}|{doc['_id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(token):
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)).decode()
+        created_at, doc_id = raw.split("|")
+        return datetime.fromisoformat(created_at), ObjectId(doc_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+def iter_newest_first(collection, filter, after=None, fields=None):
+    # Keyset scan over (created_at, _id) descending. Mongita has no $or, so the cursor's
+    # timestamp is matched with $lte and same-timestamp rows already returned are skipped here.
+    # fields must include both keys
+    query = dict(filter)
+    if after:
+        after_created, after_id = after
+        query["created_at"] = {"$lte": after_created}
+    for doc in mongo.find(collection, query, fields, [("created_at", -1), ("_id", -1)]):
+        if after and doc.get('created_at') == after_created and doc['_id'] >= after_id:
+            continue
+        yield doc
+
+def fetch_page(filter, after=None, limit=None, enrich=None, fields=None):
+    # One page of prediction documents plus the cursor of the next page (or None)
+    docs = iter_newest_first(mongo.db.predictions, filter, after, fields)
+    limit = min(max(limit or DEFAULT_PAGE_SIZE, 1), MAX_PAGE_SIZE)
+    with DB_SECONDS.time("predictions.find_page"):
+        page = list(itertools.islice(docs, limit + 1))
+    next_cursor = encode_cursor(page[limit - 1]) if len(page) > limit else None
+    page = page[:limit]
+    if enrich:
+        enrich(page)
+    return page, next_cursor
+
+def export_chunks(filter, after=None, limit=None, enrich=None, fields=None):
+    # NDJSON export, EXPORT_CHUNK_SIZE documents per yielded bytes
+    docs = iter_newest_first(mongo.db.predictions, filter, after, fields)
+    if limit:
+        docs = itertools.islice(docs, limit)
+    while True:
+        chunk = list(itertools.islice(docs, EXPORT_CHUNK_SIZE))
+        if not chunk:
+            return
+        if enrich:
+            enrich(chunk)
+        yield serialization.dumps_lines(chunk)
+
+# Handler bodies shared by the Flask routes below and the ASGI app (asgi.py). They take the
+# decoded payload or query arguments and the caller's identity, never the request itself,
+# and raise ApiError/auth.AuthError for an error response. Blocking ones (storage, model,
+# password hashing) are called inline here and on asgi's executors there
+
+def listing_args(args):
+    # ?after=&limit=&format= of the history/dashboard listings -> (after, limit, ndjson)
+    try:
+        after = decode_cursor(args['after']) if args.get('after') else None
+    except ValueError as e:
+        raise ApiError(str(e))
+    # Checked here, before the NDJSON export has sent its 200 and could only cut the stream
+    try:
+        limit = int(args['limit']) if args.get('limit') else None
+    except ValueError:
+        raise ApiError("limit must be a positive integer")
+    if limit is not None and limit < 1:
+        raise ApiError("limit must be a positive integer")
+    return after, limit, args.get('format') == 'ndjson'
+
+def history_filter(user_id):
+    try:
+        return {"user_id": ObjectId(user_id)}
+    except Exception:
+        raise ApiError("Invalid user id")
+
+def check_history_reader(filter, identity):
+    # A patient's history is theirs only
+    if identity["user_id"] != filter["user_id"]:
+        raise ApiError("Forbidden", 403)
+
+def dashboard_names(page):
+    # Listing hook of the doctor dashboard
+    return attach_patient_names(mongo.db, page, patient_name_cache)
+
+def json_body(data):
+    if not isinstance(data, dict):
+        raise ApiError("Invalid JSON body")
+    return data
+
+def credentials(data, fields):
+    # The named fields of a register/login payload, each a non-empty string
+    data = json_body(data)
+    values = [data.get(field) for field in fields]
+    for field, value in zip(fields, values):
+        if not isinstance(value, str) or not value:
+            raise ApiError(f"{field} must be a non-empty string")
+    return values
+
+def new_user(data):
+    # Register's storage half before hashing -> (name, email, password) of a free email
+    name, email, password = credentials(data, ("name", "email", "password"))
+    with DB_SECONDS.time("users.find_one"):
+        existing = mongo.db.users.find_one({"email": email})
+    if existing:
+        log.debug("Register: %s already exists", email)
+        raise ApiError("User already exists")
+    return name, email, password
+
+def insert_user(name, email, password_hash):
+    new_user = User.create(name, email, password_hash)
+    with DB_SECONDS.time("users.insert_one"):
+        result = mongo.db.users.insert_one(new_user)
+    log.debug("Register: created user %s", result.inserted_id)
+    return {"message": "User created", "id": str(result.inserted_id)}
+
+def register_user(data):
+    name, email, password = new_user(data)
+    return insert_user(name, email, password_pool.hash(password))
+
+def login_lookup(data):
+    # Login's storage half before the password check -> (email, password, user or None)
+    email, password = credentials(data, ("email", "password"))
+    with DB_SECONDS.time("users.find_one"):
+        user = mongo.find_one(mongo.db.users, {"email": email}, LOGIN_FIELDS)
+    return email, password, user
+
+def store_rehash(user, password_hash):
+    # Plaintext from before hashing, or fewer iterations than configured now
+    user['password'] = password_hash
+    with DB_SECONDS.time("users.update_one"):
+        mongo.db.users.update_one({"_id": user['_id']}, {"$set": {"password": password_hash}})
+
+def login_reply(email, user, matches):
+    # -> the login body; a Mongo document, so encoded with json_response
+    if matches:
+        return {"message": "Login successful", "user": auth.public_user(user),
+                "token": sessions.issue(user), "expires_in": sessions.max_age}
+    if user:
+        log.debug("Login: password mismatch for %s", email)
+    else:
+        log.debug("Login: unknown email %s", email)
+    raise ApiError("Invalid credentials", 401)
+
+def login_user(data):
+    email, password, user = login_lookup(data)
+    matches, rehash = password_pool.check(password, user['password'] if user else None)
+    if matches and rehash:
+        store_rehash(user, password_pool.hash(password))
+    return login_reply(email, user, matches)
+
+def predict_request(data):
+    # -> (symptoms, top_k). {"explain": true, "top_k": 3} adds class probabilities and
+    # per-feature contributions; top_k is None without it
+    data = json_body(data)
+    input_data = data.get('symptoms')
+    if not input_data:
+        raise ApiError("No input data provided")
+    if not data.get('explain'):
+        return input_data, None
+    try:
+        top_k = int(data.get('top_k', DEFAULT_TOP_K))
+    except (ValueError, TypeError) as e:
+        raise ApiError(str(e))
+    if top_k < 1:
+        raise ApiError("top_k must be at least 1")
+    return input_data, top_k
+
+def score_one(input_data, top_k=None):
+    # /predict without the micro-batcher -> (scored, explanation or None)
+    if top_k is not None:
+        return explain_one(input_data, top_k)
+    return score_rows([input_data])[0], None
+
+def prediction_reply(owner, input_data, scored, explanation=None):
+    # -> (response body, record to persist)
+    pred_doc = prediction_docs([owner], [input_data], [scored])[0]
+    body = {"prediction": scored[0], "recommendation": RECOMMENDATION}
+    if explanation:
+        # Kept with the record so the doctor dashboard can show what drove it
+        pred_doc["explanation"] = explanation
+        body.update(explanation)
+    return body, pred_doc
+
+def batch_request(data):
+    # -> (user_ids, inputs). Each sample is either {"user_id": ..., "symptoms": {...}} or
+    # the symptoms themselves
+    data = json_body(data)
+    samples = data.get('samples')
+    if not samples or not isinstance(samples, list):
+        raise ApiError("No samples provided")
+    if len(samples) > MAX_BATCH_SIZE:
+        raise ApiError(f"Batch too large (max {MAX_BATCH_SIZE} samples)")
+
+    default_user_id = data.get('user_id')
+    user_ids, inputs = [], []
+    for sample in samples:
+        if isinstance(sample, dict) and 'symptoms' in sample:
+            user_ids.append(sample.get('user_id', default_user_id))
+            inputs.append(sample['symptoms'])
+        else:
+            user_ids.append(default_user_id)
+            inputs.append(sample)
+    return user_ids, inputs
+
+def stats_reply(args, identity=None):
+    # Prediction counts come from the materialized aggregates, not a scan of predictions.
+    # One patient's counts (?user_id=) are for that patient and the staff only
+    try:
+        days = stats_days(args)
+    except ValueError as e:
+        raise ApiError(str(e))
+    if args.get('user_id'):
+        if identity is None:
+            raise auth.AuthError("Authentication required")
+        if str(identity["user_id"]) != args['user_id']:
+            auth.require_role(identity, auth.STAFF_ROLES)
+    with DB_SECONDS.time("prediction_aggregates.find"):
+        counts = aggregates.read(mongo.db, days, args.get('user_id'))
+    return stats_payload(counts)
+
+def check_admin(headers):
+    if not admin_authorized(headers):
+        raise ApiError("Forbidden", 403)
+
+def reload_reply(data):
+    # Builds and validates a replacement in the background; poll GET /admin/model for the outcome
+    data = data if isinstance(data, dict) else {}
+    try:
+        status = model_holder.reload(retrain=bool(data.get('retrain')))
+    except ReloadInProgress as e:
+        raise ApiError(str(e), 409, last_reload=model_holder.last_reload)
+    return {"message": "Reload started", "current_version": model_holder.current.version,
+            "last_reload": status}
+
+@api.errorhandler(ApiError)
+def api_error(e):
+    return jsonify(e.body()), e.status
+
+@api.errorhandler(auth.AuthError)
+def auth_error(e):
+    return jsonify({"error": str(e)}), e.status
+
+@api.errorhandler(WriteQueueFull)
+@api.errorhandler(auth.PasswordPoolBusy)
+def busy(e):
+    log.warning("%s %s rejected: %s", request.method, request.path, e)
+    return jsonify({"error": "Server busy, please retry"}), 503
+
+def list_predictions(filter, fields, enrich=None):
+    # Shared paging for history and dashboard: JSON array plus X-Next-Cursor, or NDJSON export
+    after, limit, ndjson = listing_args(request.args)
+    if ndjson:
+        chunks = export_chunks(filter, after, limit, enrich, fields)
+        return Response(stream_with_context(chunks), mimetype="application/x-ndjson")
+
+    page, next_cursor = fetch_page(filter, after, limit, enrich, fields)
+    response = json_response(page)
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response, 200
 
 @api.route('/auth/register', methods=['POST'])
 def register():
-    data = request.json
-    print(f"DEBUG: Register Request: {data}")
-    # Check if user exists
-    if mongo.db.users.find_one({"email": data['email']}):
-        print("DEBUG: User already exists")
-        return jsonify({"error": "User already exists"}), 400
-    
-    new_user = User.create(data['name'], data['email'], data['password'])
-    result = mongo.db.users.insert_one(new_user)
-    print(f"DEBUG: User created with ID: {result.inserted_id}")
-    return jsonify({"message": "User created", "id": str(result.inserted_id)}), 201
+    return jsonify(register_user(request.get_json(silent=True))), 201
 
 @api.route('/auth/login', methods=['POST'])
 def login():
-    data = request.json
-    print(f"DEBUG: Login Request: {data}")
-    user = mongo.db.users.find_one({"email": data['email']})
-    if user:
-        print(f"DEBUG: User found: {user['email']}")
-        if user['password'] == data['password']:
-            print("DEBUG: Password match")
-            return jsonify({"message": "Login successful", "user": parse_json(user)}), 200
-        else:
-            print("DEBUG: Password mismatch")
-    else:
-        print("DEBUG: User not found")
-        
-    return jsonify({"error": "Invalid credentials"}), 401
+    return json_response(login_user(request.get_json(silent=True)))
 
 @api.route('/predict', methods=['POST'])
 def predict():
-    data = request.json
-    print(f"DEBUG: Predict Request Payload: {data}")
-    user_id = data.get('user_id')
-    input_data = data.get('symptoms')
-    
-    if not input_data:
-        print("DEBUG: No input data provided in payload")
-        return jsonify({"error": "No input data provided"}), 400
-
-    print(f"DEBUG: Calling predictor with: {input_data}")
-    result = predictor.predict(input_data)
-    print(f"DEBUG: Prediction result: {result}")
-    
-    # Store prediction
-    try:
-        user_obj_id = ObjectId(user_id)
-    except Exception:
-        user_obj_id = None
-        
-    pred_doc = Prediction.create(user_obj_id, input_data, result)
-    mongo.db.predictions.insert_one(pred_doc)
-    
-    return jsonify({"prediction": result, "recommendation": "Consult a doctor for further advice."}), 200
+    with STAGE_SECONDS.time("parse"):
+        data = request.get_json(silent=True)
+    input_data, top_k = predict_request(data)
+    owner = prediction_owner(authenticate(required=False), data.get('user_id'))
+
+    if top_k is None and PREDICT_BATCH_WINDOW_MS > 0:
+        scored, explanation = predict_batcher.predict(input_data), None
+    else:
+        scored, explanation = score_one(input_data, top_k)
+    log.debug("Predict: %s -> %s", input_data, scored[0])
+
+    body, pred_doc = prediction_reply(owner, input_data, scored, explanation)
+    with STAGE_SECONDS.time("persist"):
+        prediction_writer.submit(pred_doc)
+    with STAGE_SECONDS.time("serialize"):
+        response = jsonify(body)
+    return response, 200
+
+@api.route('/predict/batch', methods=['POST'])
+def predict_batch():
+    with STAGE_SECONDS.time("parse"):
+        data = request.get_json(silent=True)
+    user_ids, inputs = batch_request(data)
+    identity = authenticate(required=False)
+    owners = [prediction_owner(identity, user_id) for user_id in user_ids]
+
+    results, pred_docs = predict_records(owners, inputs)
+    with STAGE_SECONDS.time("persist"):
+        prediction_writer.submit_many(pred_docs)
+    with STAGE_SECONDS.time("serialize"):
+        response = jsonify({"predictions": results, "recommendation": RECOMMENDATION})
+    return response, 200
 
 @api.route('/history/<user_id>', methods=['GET'])
 def get_history(user_id):
-    predictions = mongo.db.predictions.find({"user_id": ObjectId(user_id)})
-    return jsonify(parse_json(list(predictions))), 200
+    filter = history_filter(user_id)
+    check_history_reader(filter, authenticate())
+    return list_predictions(filter, HISTORY_FIELDS, feature_vectors.expand_inputs)
 
 @api.route('/doctor/predictions', methods=['GET'])
 def get_all_predictions():
-    # Fetch all predictions
-    predictions = list(mongo.db.predictions.find().sort("timestamp", -1))
-    
-    # Manually join with user data for display
-    enriched_predictions = []
-    for p in predictions:
-        user_id = p.get('user_id')
-        user_name = "Anonymous"
-        if user_id:
-            user = mongo.db.users.find_one({"_id": user_id})
-            if user:
-                user_name = user.get('name', 'Unknown')
-        
-        p['patient_name'] = user_name
-        enriched_predictions.append(p)
-
-    return jsonify(parse_json(enriched_predictions)), 200
+    # Newest first, one page at a time, joined with user data for display. Staff only
+    auth.require_role(authenticate(), auth.STAFF_ROLES)
+    return list_predictions({}, DASHBOARD_FIELDS, dashboard_names)
+
+# Mock data or fetch from DB
+DISEASES = [
+    {"name": "Common Cold", "symptoms": ["Runny nose", "Sore throat"], "treatments": ["Rest", "Fluids"]},
+    {"name": "Influenza", "symptoms": ["Fever", "Chills", "Muscle aches"], "treatments": ["Antivirals", "Rest"]},
+    {"name": "COVID-19", "symptoms": ["Fever", "Cough", "Loss of taste"], "treatments": ["Isolation", "Supportive care"]}
+]
 
 @api.route('/diseases', methods=['GET'])
 def get_diseases():
-    # Mock data or fetch from DB
-    diseases = [
-        {"name": "Common Cold", "symptoms": ["Runny nose", "Sore throat"], "treatments": ["Rest", "Fluids"]},
-        {"name": "Influenza", "symptoms": ["Fever", "Chills", "Muscle aches"], "treatments": ["Antivirals", "Rest"]},
-        {"name": "COVID-19", "symptoms": ["Fever", "Cough", "Loss of taste"], "treatments": ["Isolation", "Supportive care"]}
-    ]
-    return jsonify(diseases), 200
+    return jsonify(DISEASES), 200
+
+def stats_days(args):
+    # ?days= for /stats; raises ValueError with the message for a 400
+    try:
+        days = int(args.get('days', aggregates.DEFAULT_DAYS))
+    except ValueError:
+        raise ValueError("days must be an integer")
+    if not 1 <= days <= 366:
+        raise ValueError("days must be between 1 and 366")
+    return days
+
+def stats_payload(counts):
+    return {
+        "accuracy": model_holder.current.accuracy,
+        "model_type": "Balanced Random Forest" if HAS_IMBLEARN else "Random Forest",
+        "predict_batching": predict_batcher.stats(),
+        "prediction_cache": model_holder.current.cache.stats(),
+        "prediction_writes": prediction_writer.stats(),
+        **counts
+    }
 
 @api.route('/stats', methods=['GET'])
 def get_stats():
-    return jsonify({
-        "accuracy": predictor.accuracy,
-        "model_type": "Balanced Random Forest" if HAS_IMBLEARN else "Random Forest"
-    }), 200
+    identity = authenticate(required=False)
+    return jsonify(stats_reply(request.args, identity)), 200
+
+@api.route('/health', methods=['GET'])
+def health():
+    # Liveness: the worker is up and answering
+    return jsonify({"status": "ok", "pid": os.getpid()}), 200
+
+def readiness():
+    # Readiness: model loaded, storage reachable and the write queue has room -> (body, status)
+    current = model_holder.current
+    checks = {"model": current.model is not None and current.engine is not None}
+    try:
+        if mongo.backend == "mongodb":
+            mongo.cx.admin.command("ping")
+        else:
+            mongo.db.list_collection_names()
+        checks["storage"] = True
+    except Exception as e:
+        log.warning("Readiness storage check failed: %s", e)
+        checks["storage"] = False
+    writes = prediction_writer.stats()
+    checks["write_queue"] = writes["queue_depth"] < writes["max_queue"]
+    ok = all(checks.values())
+    return {"status": "ready" if ok else "unavailable", "pid": os.getpid(), "checks": checks,
+            "model_version": current.version}, 200 if ok else 503
+
+@api.route('/ready', methods=['GET'])
+def ready():
+    body, status = readiness()
+    return jsonify(body), status
+
+def admin_authorized(headers=None):
+    headers = request.headers if headers is None else headers
+    # Fails closed: with no ADMIN_TOKEN configured nobody is an admin
+    supplied = headers.get('X-Admin-Token')
+    if not ADMIN_TOKEN or supplied is None:
+        return False
+    return hmac.compare_digest(supplied.encode(), ADMIN_TOKEN.encode())
+
+@api.route('/admin/model', methods=['GET'])
+def get_model():
+    check_admin(request.headers)
+    return jsonify(model_holder.stats()), 200
+
+@api.route('/admin/model/reload', methods=['POST'])
+def reload_model():
+    check_admin(request.headers)
+    return jsonify(reload_reply(request.get_json(silent=True))), 202
+
+@api.route('/metrics', methods=['GET'])
+def get_metrics():
+    return Response(registry.render(), mimetype="text/plain; version=0.0.4")
@@ -0,0 +1,49 @@
+import json
+from datetime import datetime
+from bson import ObjectId, json_util
+
+# Single-pass JSON encoding of Mongo documents straight to response bytes, in the same
+# extended-JSON shapes json_util.dumps produces ({"$oid": ...}, {"$date": ...}) so clients
+# see no difference. orjson is used when it is installed (pip install orjson); otherwise
+# the stdlib encoder runs with the same hook, still in one pass. Output is compact, keeps
+# document key order and ends with a newline like flask.jsonify.
+
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+if HAS_ORJSON:
+    # Datetimes go through extended() instead of orjson's own RFC 3339 strings
+    ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_APPEND_NEWLINE
+
+
+def extended(obj):
+    # default= hook for both encoders; the two common types skip json_util's dispatch
+    if isinstance(obj, ObjectId):
+        return {"$oid": str(obj)}
+    if isinstance(obj, datetime) and obj.tzinfo is None and 1970 <= obj.year:
+        # json_util's relaxed ISO-8601 form: milliseconds only when non-zero, naive is UTC
+        millis = obj.microsecond // 1000
+        text = obj.strftime("%Y-%m-%dT%H:%M:%S")
+        return {"$date": f"{text}.{millis:03d}Z" if millis else f"{text}Z"}
+    # Aware and pre-1970 datetimes, Decimal128, Binary, ... ; raises TypeError otherwise
+    return json_util.default(obj)
+
+
+def dumps(obj):
+    # -> bytes
+    if HAS_ORJSON:
+        return orjson.dumps(obj, default=extended, option=ORJSON_OPTIONS)
+    return (json.dumps(obj, default=extended, ensure_ascii=False, separators=(",", ":")) + "\n").encode()
+
+
+def dumps_lines(docs):
+    # NDJSON: one document per line
+    return b"".join(dumps(doc) for doc in docs)
+
+
+def project(doc, fields):
+    # The given fields of doc (those it has), in the order listed
+    return {field: doc[field] for field in fields if field in doc}
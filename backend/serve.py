@@ -0,0 +1,214 @@
+import argparse
+import gc
+import mmap
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+
+from log_setup import configure_logging, get_logger, shutdown_logging
+
+# Production entry point: a pre-forking WSGI server.
+#
+#   python serve.py --workers 4 --port 5000
+#
+# The master imports the app once, so the model artifact is loaded (or trained) a single
+# time, then binds the listening socket and forks the workers, which all accept on it. The
+# loaded objects are moved out of the garbage collector's reach with gc.freeze() before
+# forking: otherwise the first collection in each worker writes to every object header
+# and un-shares the pages holding the forest. The forest's arrays come from the
+# memory-mapped artifact, so their pages are shared read-only between workers anyway.
+#
+# Each worker reconnects to storage after fork (see database.Storage.reopen) and starts
+# its own batcher / write-behind threads on first use. The master restarts workers that
+# die and forwards SIGTERM/SIGINT for a graceful shutdown that drains pending writes.
+# SIGHUP to the master builds (or finds) the latest model artifact once, in a child
+# process, then signals every worker to load that artifact by fingerprint in the background
+# (POST /api/admin/model/reload only reaches the worker that serves it). Workers restarted
+# later load it too, since the master itself keeps the model it started with.
+#
+# The embedded Mongita store is not safe for concurrent writers in several processes; run
+# more than one worker with STORAGE_BACKEND=mongodb. Probes: /api/health and /api/ready.
+
+log = get_logger("serve")
+
+# Fingerprint of the artifact the workers should serve, in shared memory created before
+# the fork: the master writes it, then sends SIGHUP
+FINGERPRINT_BYTES = 64
+
+
+def publish(shared, fp):
+    shared[:] = fp.encode().ljust(FINGERPRINT_BYTES, b"\0")
+
+
+def published(shared):
+    return shared[:].rstrip(b"\0").decode() or None
+
+
+def bind(host, port, backlog):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    # Every worker polls the same socket and only one wins each connection; the others
+    # must get EAGAIN from accept() instead of blocking in it
+    sock.setblocking(False)
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_worker(app, sock, host, port, threaded, shared):
+    from werkzeug.serving import WSGIRequestHandler, make_server
+    from routes import model_holder, prediction_writer
+    from model_holder import ReloadInProgress
+
+    class RequestHandler(WSGIRequestHandler):
+        # Access logging is done (sampled) by app.record_request
+        def log_request(self, *args, **kwargs):
+            pass
+
+    signal.signal(signal.SIGINT, signal.SIG_IGN) # the master coordinates shutdown
+    server = make_server(host, port, app, threaded=threaded, request_handler=RequestHandler, fd=sock.fileno())
+
+    def stop(signum, frame):
+        # shutdown() waits for serve_forever to return, so it cannot run on this thread
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    def reload(signum=None, frame=None):
+        fp = published(shared)
+        if fp is None or fp == model_holder.current.version:
+            return
+
+        def start():
+            try:
+                model_holder.reload(fingerprint=fp)
+            except ReloadInProgress:
+                pass
+        threading.Thread(target=start, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGHUP, reload)
+    reload() # a restarted worker catches up with a reload it missed
+    log.info("Worker %d serving on %s:%d", os.getpid(), host, port)
+    try:
+        server.serve_forever()
+    finally:
+        prediction_writer.close()
+    return 0
+
+
+def spawn(app, sock, args, shared):
+    pid = os.fork()
+    if pid == 0:
+        code = 1
+        try:
+            code = run_worker(app, sock, args.host, args.port, not args.no_threads, shared)
+        except Exception:
+            log.exception("Worker %d crashed", os.getpid())
+        finally:
+            shutdown_logging()
+            os._exit(code)
+    return pid
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pre-forking production server for the backend")
+    parser.add_argument("--host", default=os.environ.get("HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("PORT", "5000")))
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("WEB_CONCURRENCY", os.cpu_count() or 1)))
+    parser.add_argument("--backlog", type=int, default=1024)
+    parser.add_argument("--no-threads", action="store_true", help="handle one request at a time per worker")
+    parser.add_argument("--no-gc-freeze", action="store_true", help="skip gc.freeze() (for memory comparisons)")
+    args = parser.parse_args(argv)
+
+    configure_logging()
+    start = time.perf_counter()
+    from app import app
+    from database import mongo
+    from ml_model import predictor
+    from model_holder import build_artifact
+    predictor.predict({}) # first call builds the lazy mean vector before it is shared
+    log.info("Master %d loaded model %s in %.1f ms", os.getpid(), predictor.version,
+             (time.perf_counter() - start) * 1000)
+    if mongo.backend == "mongita" and args.workers > 1:
+        log.warning("STORAGE_BACKEND=mongita with %d workers: Mongita is not multi-process safe, "
+                    "use STORAGE_BACKEND=mongodb", args.workers)
+
+    sock = bind(args.host, args.port, args.backlog)
+    shared = mmap.mmap(-1, FINGERPRINT_BYTES)
+    gc.collect()
+    if not args.no_gc_freeze:
+        gc.freeze()
+
+    workers = {spawn(app, sock, args, shared) for _ in range(args.workers)}
+    stopping = False
+    builder = None # pid of the child building a model for SIGHUP
+
+    def shutdown(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in workers | ({builder} if builder else set()):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def reload(signum, frame):
+        # The build runs in a child of its own, so os.wait() below sees it finish
+        nonlocal builder
+        if builder is not None:
+            log.warning("A model reload is already running")
+            return
+        # A second SIGHUP waits until the parent knows the builder's pid
+        signal.pthread_sigmask(signal.SIG_BLOCK, {signal.SIGHUP})
+        builder = os.fork()
+        if builder != 0:
+            signal.pthread_sigmask(signal.SIG_UNBLOCK, {signal.SIGHUP})
+        else:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_IGN)
+            signal.signal(signal.SIGHUP, signal.SIG_IGN)
+            signal.pthread_sigmask(signal.SIG_UNBLOCK, {signal.SIGHUP})
+            code = 1
+            try:
+                start = time.perf_counter()
+                fp = build_artifact(artifact_dir=predictor.artifact_dir)
+                publish(shared, fp)
+                log.info("Built model %s in %.1f s", fp, time.perf_counter() - start)
+                code = 0
+            except Exception as e:
+                log.error("Model reload failed, workers keep their model: %s", e)
+            finally:
+                shutdown_logging()
+                os._exit(code)
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+    signal.signal(signal.SIGHUP, reload)
+    log.info("Listening on http://%s:%d with %d workers", args.host, args.port, args.workers)
+
+    while workers:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        if pid == builder:
+            builder = None
+            if os.waitstatus_to_exitcode(status) == 0 and not stopping:
+                log.info("Signalling workers to load model %s", published(shared))
+                for worker in workers:
+                    os.kill(worker, signal.SIGHUP)
+            continue
+        workers.discard(pid)
+        if not stopping:
+            log.warning("Worker %d exited with status %d, restarting", pid, os.waitstatus_to_exitcode(status))
+            time.sleep(0.5) # do not spin if workers die on startup
+            workers.add(spawn(app, sock, args, shared))
+    sock.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,39 @@
+import argparse
+import os
+import sys
+import uvicorn
+from log_setup import configure_logging, get_logger
+
+log = get_logger("serve_asgi")
+
+# Entry point for the ASGI variant of the API (asgi.app), served by uvicorn.
+#
+#   python serve_asgi.py --port 5000 [--workers N]
+#
+# Several workers need STORAGE_BACKEND=mongodb, as for serve.py. Request bodies are read
+# in chunks and refused past asgi.MAX_BODY_BYTES; uvicorn bounds the request head, closes
+# idle keep-alive connections after --keep-alive seconds and answers 503 past
+# --limit-concurrency open connections. There is no TLS; put it behind a proxy.
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="ASGI server for the backend")
+    parser.add_argument("--host", default=os.environ.get("HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("PORT", "5000")))
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--backlog", type=int, default=2048)
+    parser.add_argument("--keep-alive", type=int, default=5, help="seconds an idle connection is kept open")
+    parser.add_argument("--limit-concurrency", type=int, default=None,
+                        help="open connections per worker past which requests get 503")
+    args = parser.parse_args(argv)
+    configure_logging()
+
+    log.info("Serving on http://%s:%d with %d uvicorn worker(s)", args.host, args.port, args.workers)
+    uvicorn.run("asgi:app", app_dir=os.path.dirname(os.path.abspath(__file__)), host=args.host, port=args.port,
+                workers=args.workers, backlog=args.backlog, timeout_keep_alive=args.keep_alive,
+                limit_concurrency=args.limit_concurrency, access_log=False, lifespan="on")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,99 @@
+import unittest
+import os
+import json
+from datetime import datetime, timedelta
+from bson import ObjectId
+from mongita import MongitaClientMemory
+# Tests run against a throwaway store, never the tracked .mongita_db
+os.environ["STORAGE_BACKEND"] = "memory"
+import aggregates
+from app import app
+from database import mongo
+from routes import prediction_writer, sessions
+from write_behind import WriteBehindQueue
+
+def prediction(i, start=datetime(2026, 1, 1)):
+    return {
+        "user_id": ObjectId(f"{i % 3:024x}") if i % 4 else None,
+        "prediction_result": ["Diabetes", "Healthy", "Anemia"][i % 3],
+        "model_version": "v1" if i < 20 else "v2",
+        "created_at": start + timedelta(hours=7 * i),
+    }
+
+def stored(db):
+    return {doc["_id"]: doc["count"] for doc in db[aggregates.COLLECTION].find({})}
+
+class TestAggregates(unittest.TestCase):
+    def test_incremental_matches_rebuild(self):
+        db = MongitaClientMemory()["test_aggregates"]
+        writer = WriteBehindQueue(lambda: db.predictions, flush_size=7, flush_interval_ms=5)
+        writer.add_flush_listener(lambda docs: aggregates.record(db, docs))
+        writer.submit_many([prediction(i) for i in range(40)])
+        writer.close()
+        incremental = stored(db)
+        self.assertEqual(incremental["total:all"], 40)
+        self.assertEqual(incremental["model:v2"], 20)
+        self.assertEqual(incremental["user:anonymous"], 10)
+
+        aggregates.rebuild(db)
+        self.assertEqual(stored(db), incremental)
+        aggregates.rebuild(db, slices=5)
+        self.assertEqual(stored(db), incremental)
+
+    def test_read(self):
+        db = MongitaClientMemory()["test_aggregates_read"]
+        aggregates.record(db, [prediction(i) for i in range(10)])
+        aggregates.record(db, [prediction(0)]) # existing keys are incremented
+        user = str(ObjectId(f"{1:024x}"))
+        stats = aggregates.read(db, days=3, user_id=user, today=datetime(2026, 1, 3).date())
+        self.assertEqual(stats["total_predictions"], 11)
+        self.assertEqual(stats["predictions_by_disease"], {"Diabetes": 5, "Anemia": 3, "Healthy": 3})
+        self.assertEqual(stats["predictions_by_model"], {"v1": 11})
+        self.assertEqual(stats["predictions_by_day"], {"2026-01-01": 5, "2026-01-02": 3, "2026-01-03": 3})
+        self.assertEqual(stats["user_predictions"], 2)
+
+    def test_time_slices_cover_the_collection(self):
+        db = MongitaClientMemory()["test_aggregates_slices"]
+        self.assertEqual(aggregates.time_slices(db.predictions, 4), [])
+        db.predictions.insert_many([prediction(i) for i in range(9)])
+        bounds = aggregates.time_slices(db.predictions, 4)
+        self.assertEqual(len(bounds), 4)
+        self.assertIsNone(bounds[-1][1])
+        sizes = [db.predictions.count_documents(aggregates._slice_filter(lo, hi)) for lo, hi in bounds]
+        self.assertEqual(sum(sizes), 9)
+
+class TestStatsEndpoint(unittest.TestCase):
+    def test_stats_reports_new_predictions(self):
+        client = app.test_client()
+        user = {"_id": ObjectId(), "name": "Stats Patient", "password": "unused"}
+        user_id = str(user["_id"])
+        with app.app_context():
+            mongo.db.users.insert_one(user)
+        headers = {"Authorization": f"Bearer {sessions.issue(user)}"}
+        before = client.get('/api/stats').get_json()["total_predictions"]
+        for _ in range(2):
+            response = client.post('/api/predict', data=json.dumps({"symptoms": {"glucose": 1}}),
+                                   content_type='application/json', headers=headers)
+            self.assertEqual(response.status_code, 200)
+        prediction_writer.flush()
+
+        # One patient's counts are for that patient (or the staff) only
+        self.assertEqual(client.get(f'/api/stats?user_id={user_id}').status_code, 401)
+        other = {"_id": ObjectId(), "name": "Other Patient", "password": "unused"}
+        with app.app_context():
+            mongo.db.users.insert_one(other)
+        other_headers = {"Authorization": f"Bearer {sessions.issue(other)}"}
+        self.assertEqual(client.get(f'/api/stats?user_id={user_id}', headers=other_headers).status_code, 403)
+        stats = client.get(f'/api/stats?user_id={user_id}&days=7', headers=headers).get_json()
+        self.assertEqual(stats["total_predictions"], before + 2)
+        self.assertEqual(stats["user_predictions"], 2)
+        self.assertEqual(len(stats["predictions_by_day"]), 7)
+        self.assertGreaterEqual(list(stats["predictions_by_day"].values())[-1], 2)
+        self.assertGreaterEqual(sum(stats["predictions_by_model"].values()), 2)
+        self.assertEqual(client.get('/api/stats?days=0').status_code, 400)
+        with app.app_context():
+            mongo.db.predictions.delete_many({"user_id": user["_id"]})
+            mongo.db.users.delete_many({"_id": {"$in": [user["_id"], other["_id"]]}})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,181 @@
+import unittest
+import os
+import asyncio
+import uvicorn
+import json
+from concurrent.futures import Future
+from unittest import mock
+from datetime import datetime, timedelta
+from bson import ObjectId
+# Tests run against a throwaway store, never the tracked .mongita_db
+os.environ["STORAGE_BACKEND"] = "memory"
+import asgi
+from app import app
+from database import mongo
+from routes import password_pool, prediction_writer, sessions
+
+def call(method, path, body=None, headers=None):
+    # Runs one request through asgi.app -> (status, headers, body bytes)
+    return asyncio.run(acall(method, path, body, headers))
+
+async def acall(method, path, body=None, headers=None):
+    raw = json.dumps(body).encode() if body is not None else b""
+    path, _, query = path.partition("?")
+    scope = {"type": "http", "method": method, "path": path, "query_string": query.encode(),
+             "headers": [(k.lower().encode(), v.encode()) for k, v in (headers or {}).items()]}
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": raw, "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    await asgi.app(scope, receive, send)
+    start = messages[0]
+    return start["status"], dict(start["headers"]), b"".join(m.get("body", b"") for m in messages[1:])
+
+class TestAsgiRoutes(unittest.TestCase):
+    def setUp(self):
+        self.client = app.test_client()
+        self.user = {"_id": ObjectId(), "name": "Async Patient", "password": "unused"}
+        base = datetime(2024, 1, 1)
+        self.docs = [{"_id": ObjectId(), "user_id": self.user["_id"], "prediction_result": f"r{i}",
+                      "created_at": base + timedelta(minutes=i)} for i in range(5)]
+        with app.app_context():
+            mongo.db.users.insert_one(self.user)
+            mongo.db.predictions.insert_many(self.docs)
+        self.headers = {"Authorization": f"Bearer {sessions.issue(self.user)}"}
+
+    def tearDown(self):
+        prediction_writer.flush()
+        with app.app_context():
+            mongo.db.predictions.delete_many({"user_id": self.user["_id"]})
+            mongo.db.users.delete_one({"_id": self.user["_id"]})
+
+    def test_same_bytes_as_flask(self):
+        for path in ("/api/diseases", f"/api/history/{self.user['_id']}?limit=2"):
+            status, headers, body = call("GET", path, headers=self.headers)
+            expected = self.client.get(path, headers=self.headers)
+            self.assertEqual(status, expected.status_code)
+            self.assertEqual(body, expected.data)
+            self.assertEqual(headers.get(b"x-next-cursor", b"").decode(), expected.headers.get("X-Next-Cursor", ""))
+
+    def test_predict(self):
+        payload = {"symptoms": {"glucose": 250, "hba1c": 9.0}}
+        status, _, body = call("POST", "/api/predict", payload, self.headers)
+        expected = self.client.post("/api/predict", data=json.dumps(payload), content_type="application/json")
+        self.assertEqual(status, 200)
+        self.assertEqual(body, expected.data)
+
+        status, _, body = call("POST", "/api/predict", dict(payload, explain=True, top_k=2), self.headers)
+        self.assertEqual(len(json.loads(body)["probabilities"]), 2)
+        status, _, body = call("POST", "/api/predict/batch", {"samples": [{}, payload["symptoms"]]}, self.headers)
+        self.assertEqual(len(json.loads(body)["predictions"]), 2)
+        prediction_writer.flush()
+        with app.app_context():
+            self.assertEqual(mongo.db.predictions.count_documents({"user_id": self.user["_id"]}), 5 + 4)
+
+    def test_errors(self):
+        self.assertEqual(call("POST", "/api/predict", {"symptoms": {}})[0], 400)
+        self.assertEqual(call("POST", "/api/predict", {"user_id": str(ObjectId()), "symptoms": {"a": 1}})[0], 401)
+        self.assertEqual(call("GET", f"/api/history/{self.user['_id']}")[0], 401)
+        self.assertEqual(call("GET", f"/api/history/{ObjectId()}", headers=self.headers)[0], 403)
+        self.assertEqual(call("GET", "/api/nope")[0], 404)
+        self.assertEqual(call("GET", "/api/predict")[0], 405)
+        self.assertEqual(call("GET", "/api/stats?days=0")[0], 400)
+
+    def test_shared_handlers_answer_alike(self):
+        # Repeated query keys keep their first value, and errors carry the same body
+        for path in ("/api/stats?days=7&days=0", "/api/stats?days=0&days=7", "/api/history/not-an-id"):
+            status, _, body = call("GET", path)
+            expected = self.client.get(path)
+            self.assertEqual((status, body), (expected.status_code, expected.data))
+        for payload in ({"symptoms": {"glucose": 1}, "explain": True, "top_k": 0}, {"samples": [[{}, 1, 2]]}):
+            path = "/api/predict/batch" if "samples" in payload else "/api/predict"
+            status, _, body = call("POST", path, payload)
+            expected = self.client.post(path, json=payload)
+            self.assertEqual((status, body), (expected.status_code, expected.data))
+
+    def test_ndjson_stream(self):
+        status, headers, body = call("GET", f"/api/history/{self.user['_id']}?format=ndjson", headers=self.headers)
+        self.assertEqual(headers[b"content-type"], b"application/x-ndjson")
+        self.assertNotIn(b"content-length", headers)
+        ids = [json.loads(line)["_id"]["$oid"] for line in body.decode().splitlines()]
+        self.assertEqual(ids, [str(d["_id"]) for d in reversed(self.docs)])
+
+    def test_full_executor_answers_503(self):
+        executor, asgi.storage = asgi.storage, asgi.BoundedExecutor("storage", 1, max_pending=0)
+        try:
+            asgi.storage._slots.acquire() # taken, as if a slow query were running
+            self.assertEqual(call("GET", "/api/stats")[0], 503)
+            self.assertEqual(asgi.storage.stats()["rejected"], 1)
+        finally:
+            asgi.storage.shutdown()
+            asgi.storage = executor
+
+    def test_password_work_leaves_storage_free(self):
+        # A login waiting on its password check holds no storage thread
+        pending = Future()
+        executor, asgi.storage = asgi.storage, asgi.BoundedExecutor("storage", 1, max_pending=0)
+
+        async def scenario():
+            login = asyncio.create_task(acall("POST", "/api/auth/login", {"email": "a@example.com", "password": "pw"}))
+            while not check.called:
+                await asyncio.sleep(0.01)
+            stats = await acall("GET", "/api/stats")
+            pending.set_result((False, False))
+            return stats[0], (await login)[0]
+
+        try:
+            with mock.patch.object(password_pool, "submit_check", return_value=pending) as check:
+                self.assertEqual(asyncio.run(scenario()), (200, 401))
+        finally:
+            asgi.storage.shutdown()
+            asgi.storage = executor
+
+    def test_register_and_login(self):
+        email = f"{ObjectId()}@example.com"
+        try:
+            self.assertEqual(call("POST", "/api/auth/register", {"name": "N", "email": email, "password": "pw"})[0],
+                             201)
+            status, _, body = call("POST", "/api/auth/login", {"email": email, "password": "pw"})
+            self.assertEqual(status, 200)
+            self.assertEqual(json.loads(body)["user"]["email"], email)
+            self.assertEqual(call("POST", "/api/auth/login", {"email": email, "password": "no"})[0], 401)
+        finally:
+            with app.app_context():
+                mongo.db.users.delete_one({"email": email})
+
+class TestUvicorn(unittest.TestCase):
+    def test_keep_alive_and_body_limit(self):
+        async def scenario():
+            config = uvicorn.Config(asgi.app, host="127.0.0.1", port=0, lifespan="off", log_level="warning")
+            server = uvicorn.Server(config)
+            serving = asyncio.create_task(server.serve())
+            while not server.started:
+                await asyncio.sleep(0.01)
+            port = server.servers[0].sockets[0].getsockname()[1]
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            responses = []
+            for _ in range(2):
+                writer.write(b"GET /api/health HTTP/1.1\r\nHost: test\r\n\r\n")
+                head = await reader.readuntil(b"\r\n\r\n")
+                length = int(head.split(b"content-length: ")[1].split(b"\r\n")[0])
+                responses.append((head.split(b"\r\n")[0], json.loads(await reader.readexactly(length))))
+            # A declared length past the limit is refused without the body being sent
+            writer.write(b"POST /api/predict HTTP/1.1\r\nHost: test\r\nContent-Length: %d\r\n\r\n"
+                         % (asgi.MAX_BODY_BYTES + 1) + b"x" * 65536)
+            responses.append((await reader.readuntil(b"\r\n")).strip())
+            writer.close()
+            server.should_exit = True
+            await serving
+            return responses
+
+        responses = asyncio.run(scenario())
+        self.assertEqual([status for status, _ in responses[:2]], [b"HTTP/1.1 200 OK"] * 2)
+        self.assertEqual(responses[0][1]["status"], "ok")
+        self.assertEqual(responses[2], b"HTTP/1.1 413 Request Entity Too Large")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,171 @@
+import unittest
+import os
+import json
+import threading
+import time
+from bson import ObjectId
+from mongita import MongitaClientMemory
+# Tests run against a throwaway store, never the tracked .mongita_db
+os.environ["STORAGE_BACKEND"] = "memory"
+import auth
+from app import app
+from database import mongo
+from routes import sessions
+
+class CountingDb:
+    def __init__(self, db):
+        self.db = db
+        self.lookups = 0
+        self.users = self
+
+    def find_one(self, *args, **kwargs):
+        self.lookups += 1
+        return self.db.users.find_one(*args, **kwargs)
+
+class TestPasswords(unittest.TestCase):
+    def test_hash_round_trip(self):
+        stored = auth.hash_password("s3cret", iterations=1000)
+        self.assertTrue(auth.is_hashed(stored))
+        self.assertNotIn("s3cret", stored)
+        self.assertEqual(auth.check_password("s3cret", stored, iterations=1000), (True, False))
+        self.assertEqual(auth.check_password("wrong", stored, iterations=1000), (False, False))
+        # Raising the cost flags existing hashes for a rehash
+        self.assertEqual(auth.check_password("s3cret", stored, iterations=2000), (True, True))
+
+    def test_plaintext_needs_rehash(self):
+        self.assertEqual(auth.check_password("pw", "pw"), (True, True))
+        self.assertEqual(auth.check_password("pw", "other"), (False, True))
+
+    def test_pool_rejects_when_full(self):
+        pool = auth.PasswordPool(workers=1, max_pending=0, iterations=1000)
+        release = threading.Event()
+        started = threading.Event()
+        blocker = pool.submit(lambda: (started.set(), release.wait()))
+        started.wait()
+        with self.assertRaises(auth.PasswordPoolBusy):
+            pool.hash("pw")
+        release.set()
+        blocker.result()
+        self.assertTrue(auth.is_hashed(pool.hash("pw")))
+        self.assertEqual(pool.stats()["rejected"], 1)
+
+    def test_migrate_passwords(self):
+        db = MongitaClientMemory()["test_auth_migrate"]
+        db.users.insert_many([{"email": f"u{i}@example.com", "password": f"pw{i}"} for i in range(5)])
+        pool = auth.PasswordPool(workers=2, max_pending=1, iterations=1000)
+        self.assertEqual(auth.migrate_passwords(db, pool), 5)
+        self.assertEqual(auth.migrate_passwords(db, pool), 0)
+        user = db.users.find_one({"email": "u3@example.com"})
+        self.assertEqual(auth.check_password("pw3", user["password"], iterations=1000), (True, False))
+
+class TestTokens(unittest.TestCase):
+    def setUp(self):
+        self.db = CountingDb(MongitaClientMemory()["test_auth_tokens"])
+        self.user = {"_id": ObjectId(), "name": "Token User", "email": "t@example.com", "password": "h1"}
+        self.db.db.users.insert_one(self.user)
+
+    def test_verification_is_cached(self):
+        tokens = auth.TokenAuth("secret", cache_ttl=60)
+        token = tokens.issue(self.user)
+        for _ in range(5):
+            self.assertEqual(tokens.verify(token, self.db)["user_id"], self.user["_id"])
+        self.assertEqual(self.db.lookups, 1)
+
+    def test_rejects_tampered_expired_and_stale_tokens(self):
+        tokens = auth.TokenAuth("secret", cache_ttl=0)
+        token = tokens.issue(self.user)
+        with self.assertRaises(auth.AuthError):
+            tokens.verify(token[:-2] + "xx", self.db)
+        with self.assertRaises(auth.AuthError):
+            auth.TokenAuth("other-secret").verify(token, self.db)
+        with self.assertRaises(auth.AuthError):
+            auth.TokenAuth("secret", max_age=-1).verify(token, self.db)
+        # A password change revokes older tokens
+        self.db.db.users.update_one({"_id": self.user["_id"]}, {"$set": {"password": "h2"}})
+        with self.assertRaises(auth.AuthError):
+            tokens.verify(token, self.db)
+
+    def test_bearer_token(self):
+        self.assertEqual(auth.bearer_token("Bearer abc"), "abc")
+        self.assertIsNone(auth.bearer_token("Basic abc"))
+        self.assertIsNone(auth.bearer_token(None))
+
+class TestAuthRoutes(unittest.TestCase):
+    def setUp(self):
+        self.client = app.test_client()
+        self.email = f"{ObjectId()}@example.com"
+
+    def tearDown(self):
+        with app.app_context():
+            user = mongo.db.users.find_one({"email": self.email})
+            if user:
+                mongo.db.predictions.delete_many({"user_id": user["_id"]})
+                mongo.db.users.delete_one({"_id": user["_id"]})
+
+    def post(self, url, payload, headers=None):
+        return self.client.post(url, data=json.dumps(payload), content_type='application/json', headers=headers)
+
+    def test_legacy_plaintext_password_is_migrated_on_login(self):
+        with app.app_context():
+            mongo.db.users.insert_one({"name": "Legacy", "email": self.email, "password": "old-pw"})
+        response = self.post('/api/auth/login', {"email": self.email, "password": "old-pw"})
+        self.assertEqual(response.status_code, 200)
+        body = response.get_json()
+        self.assertNotIn("password", body["user"])
+        self.assertNotIn("medical_history", body["user"])
+        self.assertEqual(body["user"]["email"], self.email)
+        with app.app_context():
+            self.assertTrue(auth.is_hashed(mongo.db.users.find_one({"email": self.email})["password"]))
+        self.assertEqual(self.post('/api/auth/login', {"email": self.email, "password": "old-pw"}).status_code, 200)
+
+    def test_token_guards_history_and_predict(self):
+        self.assertEqual(self.post('/api/auth/register', {"name": "N", "email": self.email, "password": "pw"}).status_code, 201)
+        body = self.post('/api/auth/login', {"email": self.email, "password": "pw"}).get_json()
+        headers = {"Authorization": f"Bearer {body['token']}"}
+        user_id = body["user"]["_id"]["$oid"]
+
+        self.assertEqual(self.client.get(f'/api/history/{user_id}').status_code, 401)
+        self.assertEqual(self.client.get(f'/api/history/{ObjectId()}', headers=headers).status_code, 403)
+        self.assertEqual(self.client.get(f'/api/history/{user_id}', headers={"Authorization": "Bearer junk"}).status_code, 401)
+        self.assertEqual(self.client.get(f'/api/history/{user_id}', headers=headers).status_code, 200)
+
+        symptoms = {"glucose": 120}
+        self.assertEqual(self.post('/api/predict', {"user_id": user_id, "symptoms": symptoms}).status_code, 401)
+        self.assertEqual(self.post('/api/predict', {"user_id": "anonymous", "symptoms": symptoms}).status_code, 200)
+        self.assertEqual(self.post('/api/predict', {"user_id": user_id, "symptoms": symptoms}, headers).status_code, 200)
+
+    def test_credentials_must_be_strings(self):
+        for payload in ({"name": "N", "email": self.email, "password": 123}, {"name": ["N"], "email": self.email,
+                        "password": "pw"}, {"name": "N", "password": "pw"}):
+            response = self.post('/api/auth/register', payload)
+            self.assertEqual(response.status_code, 400)
+            self.assertIn("must be a non-empty string", response.get_json()["error"])
+        self.assertEqual(self.post('/api/auth/login', {"email": self.email, "password": None}).status_code, 400)
+        self.assertEqual(self.post('/api/auth/login', {"email": {"$ne": ""}, "password": "pw"}).status_code, 400)
+        self.assertEqual(self.client.post('/api/auth/login', data="[]", content_type='application/json').status_code, 400)
+
+    def test_set_role_grants_the_dashboard(self):
+        self.assertEqual(self.post('/api/auth/register', {"name": "N", "email": self.email, "password": "pw"}).status_code, 201)
+        body = self.post('/api/auth/login', {"email": self.email, "password": "pw"}).get_json()
+        self.assertEqual(body["user"]["role"], "patient")
+        headers = {"Authorization": f"Bearer {body['token']}"}
+        self.assertEqual(self.client.get('/api/doctor/predictions', headers=headers).status_code, 403)
+
+        with app.app_context():
+            self.assertTrue(auth.set_role(mongo.db, self.email, "doctor"))
+            self.assertFalse(auth.set_role(mongo.db, f"nobody-{self.email}", "doctor"))
+        with self.assertRaises(ValueError):
+            auth.set_role(None, self.email, "superuser")
+        sessions.cache.clear() # as if AUTH_CACHE_TTL had passed
+        body = self.post('/api/auth/login', {"email": self.email, "password": "pw"}).get_json()
+        headers = {"Authorization": f"Bearer {body['token']}"}
+        self.assertEqual(self.client.get('/api/doctor/predictions', headers=headers).status_code, 200)
+
+    def test_unknown_email_costs_a_hash(self):
+        start = time.perf_counter()
+        response = self.post('/api/auth/login', {"email": self.email, "password": "pw"})
+        self.assertEqual(response.status_code, 401)
+        self.assertGreater(time.perf_counter() - start, 0.01)
+
+if __name__ == '__main__':
+    unittest.main()
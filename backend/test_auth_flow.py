@@ -1,17 +1,18 @@
 
 import unittest
 import json
-import shutil
 import os
+# Tests run against a throwaway store, never the tracked .mongita_db
+os.environ["STORAGE_BACKEND"] = "memory"
 from app import app
 from database import mongo
 
 class TestAuthFlow(unittest.TestCase):
     @classmethod
     def setUpClass(cls):
-        # Clean up database once before all tests
-        if os.path.exists("./.mongita_db"):
-            shutil.rmtree("./.mongita_db")
+        # Clean up the test user once before all tests
+        with app.app_context():
+            mongo.db.users.delete_many({"email": "test@example.com"})
 
     def setUp(self):
         self.app = app.test_client()
@@ -0,0 +1,79 @@
+import unittest
+import os
+import json
+import threading
+import time
+# Tests run against a throwaway store, never the tracked .mongita_db
+os.environ["STORAGE_BACKEND"] = "memory"
+from app import app
+from batching import MicroBatcher
+from ml_model import predictor
+
+class TestMicroBatcher(unittest.TestCase):
+    def test_coalesces_concurrent_requests(self):
+        calls = []
+
+        def predict_fn(items):
+            calls.append(len(items))
+            time.sleep(0.01)
+            return [item * 2 for item in items]
+
+        batcher = MicroBatcher(predict_fn, max_batch_size=8, max_wait_ms=20)
+        futures = [batcher.submit(i) for i in range(20)]
+        self.assertEqual([f.result(timeout=5) for f in futures], [i * 2 for i in range(20)])
+        self.assertLessEqual(max(calls), 8)
+        self.assertLess(len(calls), 20)
+
+        stats = batcher.stats()
+        self.assertEqual(stats["requests"], 20)
+        self.assertEqual(stats["batches"], len(calls))
+        self.assertGreater(stats["avg_batch_size"], 1)
+
+    def test_lone_request_does_not_wait_out_the_window(self):
+        batcher = MicroBatcher(lambda items: items, max_batch_size=8, max_wait_ms=2000)
+        batcher.predict("warm", timeout=5)
+        start = time.perf_counter()
+        self.assertEqual(batcher.predict("x", timeout=5), "x")
+        self.assertLess(time.perf_counter() - start, 1.0)
+
+    def test_bad_item_only_fails_itself(self):
+        def predict_fn(items):
+            if "bad" in items:
+                raise ValueError("bad input")
+            return [item.upper() for item in items]
+
+        batcher = MicroBatcher(predict_fn, max_batch_size=4, max_wait_ms=20)
+        futures = [batcher.submit(item) for item in ("a", "bad", "c")]
+        self.assertEqual(futures[0].result(timeout=5), "A")
+        self.assertEqual(futures[2].result(timeout=5), "C")
+        with self.assertRaises(ValueError):
+            futures[1].result(timeout=5)
+
+    def test_threads_get_their_own_results(self):
+        batcher = MicroBatcher(predictor.predict_batch, max_batch_size=16, max_wait_ms=5)
+        payloads = [{"glucose": 50 + 20 * i, "hba1c": 4 + i % 6} for i in range(32)]
+        expected = predictor.predict_batch(payloads)
+        results = [None] * len(payloads)
+
+        def worker(i):
+            results[i] = batcher.predict(payloads[i], timeout=5)
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(len(payloads))]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(results, expected)
+
+    def test_predict_route_contract(self):
+        client = app.test_client()
+        response = client.post('/api/predict', data=json.dumps({"symptoms": {"glucose": 250}}),
+                               content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.data)["prediction"], predictor.predict({"glucose": 250}))
+
+        stats = json.loads(client.get('/api/stats').data)
+        self.assertIn("predict_batching", stats)
+
+if __name__ == '__main__':
+    unittest.main()
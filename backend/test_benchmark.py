@@ -0,0 +1,33 @@
+import unittest
+from benchmark import compare, summarize
+
+class TestBenchmarkHarness(unittest.TestCase):
+    def test_summarize_percentiles(self):
+        latencies = [i / 1000 for i in range(1, 101)] # 1..100 ms
+        result = summarize(latencies, elapsed=2.0)
+        self.assertEqual(result["iterations"], 100)
+        self.assertAlmostEqual(result["throughput"], 50.0)
+        self.assertAlmostEqual(result["p50_ms"], 50.5)
+        self.assertAlmostEqual(result["p95_ms"], 95.05)
+        self.assertAlmostEqual(result["p99_ms"], 99.01)
+
+    def test_compare_flags_latency_and_throughput(self):
+        baseline = {
+            "api_predict": {"throughput": 100.0, "p95_ms": 10.0},
+            "api_login": {"throughput": 100.0, "p95_ms": 10.0},
+            "api_history": {"throughput": 100.0, "p95_ms": 10.0},
+        }
+        results = {
+            "api_predict": {"throughput": 95.0, "p95_ms": 11.0}, # within 20%
+            "api_login": {"throughput": 100.0, "p95_ms": 12.5},
+            "api_history": {"throughput": 70.0, "p95_ms": 10.0},
+            "predict_single": {"throughput": 1.0, "p95_ms": 999.0}, # not in the baseline
+        }
+        regressions = compare(results, baseline, threshold=0.2)
+        self.assertEqual(len(regressions), 2)
+        self.assertTrue(regressions[0].startswith("api_login: p95"))
+        self.assertTrue(regressions[1].startswith("api_history: throughput"))
+        self.assertEqual(compare(results, baseline, threshold=0.5), [])
+
+if __name__ == '__main__':
+    unittest.main()
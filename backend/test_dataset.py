@@ -0,0 +1,114 @@
+import unittest
+import os
+import shutil
+import tempfile
+from unittest import mock
+import numpy as np
+import pandas as pd
+import dataset
+from ml_model import TRAIN_PATH
+
+CSV = """Glucose, Hemoglobin,Disease
+1.0,5.0,Healthy
+3.0,,Anemia 
+3.0,7.0,
+,9.0,Anemia
+"""
+
+class TestDataset(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.cache_dir = os.path.join(self.dir, "cache")
+        self.path = os.path.join(self.dir, "data.csv")
+        with open(self.path, "w") as f:
+            f.write(CSV)
+        dataset._loaded.clear()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+        dataset._loaded.clear()
+
+    def test_imputes_and_encodes(self):
+        ds = dataset.load(self.path, self.cache_dir)
+        self.assertEqual(ds.columns, ["Glucose", "Hemoglobin"])
+        self.assertEqual(ds.classes, ["Anemia", "Healthy"])
+        self.assertEqual(ds.labels().tolist(), ["Healthy", "Anemia", "Anemia", "Anemia"])
+        self.assertAlmostEqual(ds.means["Glucose"], 7 / 3)
+        self.assertEqual(ds.modes["Glucose"], 3.0)
+        self.assertEqual(ds.missing, {"Glucose": 1, "Hemoglobin": 1, "Disease": 1})
+        X = ds.matrix(["Hemoglobin", "Glucose"])
+        self.assertEqual(X.dtype, np.float32)
+        np.testing.assert_allclose(X[:, 0], [5, 7, 7, 9])
+        np.testing.assert_allclose(X[:, 1], [1, 3, 3, 7 / 3], rtol=1e-6)
+        self.assertEqual(ds.class_counts(), {"Anemia": 3, "Healthy": 1})
+
+    def test_streams_in_chunks(self):
+        target = dataset.build(self.path, self.cache_dir, chunk_rows=1)
+        ds = dataset._open(self.path, target)
+        np.testing.assert_allclose(ds.column("Hemoglobin"), [5, 7, 7, 9])
+        self.assertEqual(ds.labels().tolist(), ["Healthy", "Anemia", "Anemia", "Anemia"])
+        stats = ds.stats
+        self.assertEqual(stats["rows"], 4)
+        self.assertEqual(stats["class_counts"], {"Anemia": 2, "Healthy": 1})
+        self.assertEqual(stats["missing_labels"], 1)
+        glucose = stats["columns"]["Glucose"]
+        self.assertEqual(glucose["count"], 3)
+        self.assertAlmostEqual(glucose["var"], np.var([1.0, 3.0, 3.0]))
+        self.assertEqual((glucose["min"], glucose["max"], glucose["quantiles"]["0.5"]), (1.0, 3.0, 3.0))
+
+    def test_streaming_stats_match_numpy(self):
+        X = pd.read_csv(TRAIN_PATH).drop(columns=["Disease"]).to_numpy()
+        stats = dataset.scan(TRAIN_PATH, chunk_rows=300)
+        np.testing.assert_allclose(stats.mean, X.mean(axis=0), rtol=1e-12)
+        np.testing.assert_allclose(stats.variance, X.var(axis=0), rtol=1e-10)
+        np.testing.assert_array_equal(stats.min, X.min(axis=0))
+        np.testing.assert_array_equal(stats.max, X.max(axis=0))
+        np.testing.assert_allclose(stats.quantiles(), np.quantile(X, dataset.QUANTILES, axis=0))
+
+        sampled = dataset.scan(TRAIN_PATH, chunk_rows=300, sample_size=1000)
+        self.assertEqual(len(sampled._sample), 1000)
+        self.assertFalse(sampled.to_dict()["quantiles_exact"])
+
+    def test_scaler_from_stats(self):
+        from sklearn.preprocessing import StandardScaler
+        from ml_model import FEATURE_NAMES, scaler_from_stats
+        ds = dataset.load(TRAIN_PATH, self.cache_dir)
+        X = ds.matrix(FEATURE_NAMES, np.float64)
+        expected = StandardScaler().fit(X)
+        scaler = scaler_from_stats(ds.stats, FEATURE_NAMES)
+        np.testing.assert_allclose(scaler.transform(X), expected.transform(X), atol=1e-5)
+
+    def test_stats_without_cache(self):
+        stats = dataset.stats(self.path, self.cache_dir)
+        self.assertFalse(os.path.exists(self.cache_dir))
+        self.assertEqual(stats, dataset.load(self.path, self.cache_dir).stats)
+
+    def test_parses_once(self):
+        dataset.load(self.path, self.cache_dir)
+        dataset._loaded.clear() # as in a fresh process
+        with mock.patch.object(dataset, "_chunks", side_effect=AssertionError("re-parsed")):
+            ds = dataset.load(self.path, self.cache_dir)
+        self.assertIsInstance(ds.features, np.memmap)
+        self.assertIs(dataset.load(self.path, self.cache_dir), ds)
+
+    def test_revalidates_by_content(self):
+        first = dataset.load(self.path, self.cache_dir)
+        with open(self.path, "w") as f:
+            f.write(CSV.replace("1.0,5.0", "2.0,5.0"))
+        dataset._loaded.clear()
+        second = dataset.load(self.path, self.cache_dir)
+        self.assertNotEqual(first.sha256, second.sha256)
+        self.assertEqual(second.column("Glucose")[0], 2.0)
+        self.assertEqual(os.listdir(self.cache_dir), [os.path.basename(os.path.dirname(second.features.filename))])
+
+    def test_matches_pandas_on_training_csv(self):
+        ds = dataset.load(TRAIN_PATH, self.cache_dir)
+        df = pd.read_csv(TRAIN_PATH)
+        df.columns = [c.strip() for c in df.columns]
+        np.testing.assert_array_equal(ds.matrix(ds.columns), df[ds.columns].to_numpy(dtype=np.float32))
+        self.assertEqual(ds.labels().tolist(), df["Disease"].str.strip().tolist())
+        for name in ds.columns:
+            self.assertAlmostEqual(ds.means[name], df[name].mean(), places=12)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+import unittest
+import os
+import json
+from datetime import datetime
+from bson import ObjectId
+from mongita import MongitaClientMemory
+# Tests run against a throwaway store, never the tracked .mongita_db
+os.environ["STORAGE_BACKEND"] = "memory"
+from app import app
+from caching import TTLCache
+from database import mongo
+from routes import attach_patient_names, sessions
+
+class CountingUsers:
+    def __init__(self, users):
+        self.users = users
+        self.queries = 0
+
+    def find(self, *args, **kwargs):
+        self.queries += 1
+        return self.users.find(*args, **kwargs)
+
+class TestPatientNameJoin(unittest.TestCase):
+    def setUp(self):
+        self.db = MongitaClientMemory()["test_doctor_predictions"]
+        self.alice = self.db.users.insert_one({"name": "Alice"}).inserted_id
+        self.nameless = self.db.users.insert_one({"email": "x@example.com"}).inserted_id
+        self.predictions = [
+            {"user_id": self.alice}, {"user_id": None}, {"user_id": self.nameless},
+            {"user_id": ObjectId()}, {"user_id": self.alice},
+        ]
+
+    def test_names_resolved_with_one_query(self):
+        self.db.users = CountingUsers(self.db.users)
+        attach_patient_names(self.db, self.predictions)
+        self.assertEqual([p["patient_name"] for p in self.predictions],
+                         ["Alice", "Anonymous", "Unknown", "Anonymous", "Alice"])
+        self.assertEqual(self.db.users.queries, 1)
+
+    def test_cache_skips_repeat_lookups(self):
+        self.db.users = CountingUsers(self.db.users)
+        cache = TTLCache(maxsize=100, ttl=60)
+        attach_patient_names(self.db, self.predictions, cache)
+        attach_patient_names(self.db, self.predictions, cache)
+        self.assertEqual(self.db.users.queries, 1)
+        self.assertEqual(self.predictions[0]["patient_name"], "Alice")
+
+    def test_ttl_expiry(self):
+        now = [0.0]
+        cache = TTLCache(maxsize=10, ttl=5, clock=lambda: now[0])
+        cache.put("a", 1)
+        self.assertEqual(cache.get("a"), 1)
+        now[0] = 6.0
+        self.assertIsNone(cache.get("a"))
+
+class TestDoctorPredictionsRoute(unittest.TestCase):
+    def test_route_attaches_names(self):
+        with app.app_context():
+            user_id = mongo.db.users.insert_one({"name": "Route Patient", "email": "route@example.com"}).inserted_id
+            doctor = {"_id": ObjectId(), "name": "Route Doctor", "password": "unused", "role": "doctor"}
+            mongo.db.users.insert_one(doctor)
+            pred_id = mongo.db.predictions.insert_one({"user_id": user_id, "prediction_result": "Healthy",
+                                                       "created_at": datetime.utcnow()}).inserted_id
+        try:
+            response = app.test_client().get('/api/doctor/predictions',
+                                             headers={"Authorization": f"Bearer {sessions.issue(doctor)}"})
+            self.assertEqual(response.status_code, 200)
+            records = {r["_id"]["$oid"]: r for r in json.loads(response.data)}
+            self.assertEqual(records[str(pred_id)]["patient_name"], "Route Patient")
+        finally:
+            with app.app_context():
+                mongo.db.predictions.delete_one({"_id": pred_id})
+                mongo.db.users.delete_many({"_id": {"$in": [user_id, doctor["_id"]]}})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import unittest
+import os
+import json
+import numpy as np
+from bson import ObjectId
+# Tests run against a throwaway store, never the tracked .mongita_db
+os.environ["STORAGE_BACKEND"] = "memory"
+from app import app
+from database import mongo
+from ml_model import predictor, TEST_PATH, load_dataset
+from explain import PathExplainer
+from routes import prediction_writer, sessions
+
+class TestExplain(unittest.TestCase):
+    def setUp(self):
+        self.app = app.test_client()
+        self.user_id = ObjectId()
+        user = {"_id": self.user_id, "name": "Explain Patient", "password": "unused"}
+        with app.app_context():
+            mongo.db.users.insert_one(user)
+        self.headers = {"Authorization": f"Bearer {sessions.issue(user)}"}
+
+    def tearDown(self):
+        prediction_writer.flush()
+        with app.app_context():
+            mongo.db.predictions.delete_many({"user_id": self.user_id})
+            mongo.db.users.delete_one({"_id": self.user_id})
+
+    def test_contributions_add_up_to_probabilities(self):
+        X = predictor.to_matrix(load_dataset(TEST_PATH, predictor.feature_names)[0][:200])
+        X_scaled = (X - predictor.scaler.mean_) / predictor.scaler.scale_
+        leaves = predictor.engine.apply(X_scaled)
+        contributions = predictor.explainer.contributions(leaves)
+        np.testing.assert_allclose(predictor.explainer.bias + contributions.sum(axis=1),
+                                   predictor.model.predict_proba(X_scaled), atol=1e-6)
+
+    def test_explanation_matches_prediction(self):
+        rows = [{}, {"glucose": "250", "hba1c": "9.0"}, {"hemoglobin": "5.0"}, [0.5] * 24]
+        explained = predictor.explain_batch(rows, top_k=2)
+        self.assertEqual([e["prediction"] for e in explained], predictor.predict_batch(rows))
+        for e in explained:
+            self.assertEqual(len(e["probabilities"]), 2)
+            self.assertEqual(e["probabilities"][0]["class"], e["prediction"])
+            self.assertEqual(len(e["contributions"]), 24)
+            total = e["base_probability"] + sum(c["contribution"] for c in e["contributions"])
+            self.assertAlmostEqual(total, e["probabilities"][0]["probability"], places=6)
+            magnitudes = [abs(c["contribution"]) for c in e["contributions"]]
+            self.assertEqual(magnitudes, sorted(magnitudes, reverse=True))
+
+    def test_state_round_trip(self):
+        explainer = PathExplainer.from_state(predictor.explainer.to_state())
+        leaves = predictor.engine.apply(np.zeros((2, 24)))
+        np.testing.assert_array_equal(explainer.contributions(leaves), predictor.explainer.contributions(leaves))
+
+    def test_api_explain(self):
+        payload = {"user_id": str(self.user_id), "symptoms": {"glucose": 250}, "explain": True, "top_k": 2}
+        response = self.app.post('/api/predict', data=json.dumps(payload), content_type='application/json', headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        body = response.get_json()
+        self.assertEqual(body["prediction"], predictor.predict({"glucose": 250}))
+        self.assertEqual(len(body["probabilities"]), 2)
+        self.assertEqual(body["contributions"][0].keys(), {"feature", "value", "contribution"})
+
+        prediction_writer.flush()
+        with app.app_context():
+            doc = mongo.db.predictions.find_one({"user_id": self.user_id})
+        self.assertEqual(doc["explanation"]["probabilities"], body["probabilities"])
+
+    def test_api_without_explain(self):
+        payload = {"user_id": str(self.user_id), "symptoms": {"glucose": 250}}
+        response = self.app.post('/api/predict', data=json.dumps(payload), content_type='application/json', headers=self.headers)
+        self.assertNotIn("contributions", response.get_json())
+
+        payload.update(explain=True, top_k=0)
+        response = self.app.post('/api/predict', data=json.dumps(payload), content_type='application/json', headers=self.headers)
+        self.assertEqual(response.status_code, 400)
+
+if __name__ == '__main__':
+    unittest.main()
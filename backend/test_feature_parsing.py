@@ -0,0 +1,52 @@
+import unittest
+import numpy as np
+from ml_model import predictor
+
+class TestFeatureParsing(unittest.TestCase):
+    def row(self, payload):
+        return dict(zip(predictor.feature_names, predictor.to_matrix([payload])[0]))
+
+    def test_zero_is_not_missing(self):
+        row = self.row({"glucose": 0, "hba1c": "0"})
+        self.assertEqual(row["Glucose"], 0.0)
+        self.assertEqual(row["HbA1c"], 0.0)
+
+    def test_missing_and_invalid_values_use_means(self):
+        row = self.row({"glucose": "", "hemoglobin": "abc", "insulin": None})
+        for name in ("Glucose", "Hemoglobin", "Insulin", "BMI"):
+            self.assertAlmostEqual(row[name], predictor.feature_means[name])
+
+    def test_non_finite_values_use_means(self):
+        row = self.row({"glucose": "inf", "hemoglobin": "-inf", "insulin": "nan", "bmi": float("inf")})
+        for name in ("Glucose", "Hemoglobin", "Insulin", "BMI"):
+            self.assertAlmostEqual(row[name], predictor.feature_means[name])
+
+    def test_non_finite_list_values_use_means(self):
+        means = [predictor.feature_means[name] for name in predictor.feature_names]
+        payload = [float("inf"), float("-inf"), 1e309] + means[3:]
+        np.testing.assert_allclose(predictor.to_matrix([payload])[0], means)
+        X, masks = predictor.encode_rows([payload])
+        np.testing.assert_allclose(X[0], means)
+        self.assertEqual(masks[0] & 0b111, 0)
+
+    def test_accepted_spellings(self):
+        payload = {
+            "Glucose": 1, "white_blood_cells": 2, "c_reactive_protein": 3,
+            "c-reactive protein": 4, "heart rate": 5, "LDL_CHOLESTEROL": 6,
+        }
+        row = self.row(payload)
+        self.assertEqual(row["Glucose"], 1.0)
+        self.assertEqual(row["White Blood Cells"], 2.0)
+        self.assertEqual(row["C-reactive Protein"], 3.0)
+        self.assertEqual(row["Heart Rate"], 5.0)
+        self.assertEqual(row["LDL Cholesterol"], 6.0)
+
+    def test_exact_name_takes_precedence(self):
+        row = self.row({"glucose": 2, "Glucose": 1})
+        self.assertEqual(row["Glucose"], 1.0)
+
+    def test_unknown_keys_are_ignored(self):
+        self.assertEqual(self.row({"age": 40, 7: 1}), self.row({}))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+import unittest
+import os
+import json
+import numpy as np
+from bson import ObjectId
+from mongita import MongitaClientMemory
+# Tests run against a throwaway store, never the tracked .mongita_db
+os.environ["STORAGE_BACKEND"] = "memory"
+from app import app
+from database import mongo
+from ml_model import predictor, FEATURE_NAMES
+from models import Prediction
+from routes import prediction_writer, sessions
+import feature_vectors
+
+class TestFeatureVectors(unittest.TestCase):
+    def setUp(self):
+        self.app = app.test_client()
+        self.user_id = ObjectId()
+        user = {"_id": self.user_id, "name": "Vector Patient", "password": "unused"}
+        with app.app_context():
+            mongo.db.users.insert_one(user)
+        self.headers = {"Authorization": f"Bearer {sessions.issue(user)}"}
+
+    def tearDown(self):
+        prediction_writer.flush()
+        with app.app_context():
+            mongo.db.predictions.delete_many({"user_id": self.user_id})
+            mongo.db.users.delete_one({"_id": self.user_id})
+
+    def test_encode_rows_matches_to_matrix(self):
+        rows = [{}, {"glucose": "0.5", "HbA1c": 0.25}, [0.5] * 24, [0.1, float("nan"), 0.3]]
+        X, masks = predictor.encode_rows(rows)
+        self.assertEqual(predictor.predict_batch(X), predictor.predict_batch(rows))
+        glucose = 1 << FEATURE_NAMES.index("Glucose")
+        self.assertEqual(masks[0], 0)
+        self.assertEqual(masks[1] & glucose, glucose)
+        self.assertEqual(bin(masks[1]).count("1"), 2)
+        self.assertEqual(masks[2], (1 << 24) - 1)
+        self.assertEqual(masks[3], 0b101)
+
+    def test_pack_round_trip(self):
+        X, masks = predictor.encode_rows([{"glucose": 0.5}])
+        blob = feature_vectors.pack(X[0])
+        self.assertEqual(len(blob), 24 * 4)
+        np.testing.assert_allclose(feature_vectors.matrix([{"features": blob}])[0], X[0], rtol=1e-6)
+        self.assertEqual(feature_vectors.supplied_inputs(blob, masks[0]), {"Glucose": 0.5})
+
+    def test_predict_stores_packed_vector(self):
+        resp = self.app.post('/api/predict', headers=self.headers,
+                             json={"symptoms": {"glucose": "0.5"}, "user_id": str(self.user_id)})
+        self.assertEqual(resp.status_code, 200)
+        prediction_writer.flush()
+        with app.app_context():
+            doc = mongo.db.predictions.find_one({"user_id": self.user_id})
+        self.assertNotIn("input_data", doc)
+        self.assertEqual(len(doc["features"]), 96)
+        self.assertEqual(doc["model_version"], predictor.version)
+        self.assertEqual(doc["prediction_result"], json.loads(resp.data)["prediction"])
+        db = MongitaClientMemory()["test_feature_vectors_rescore"]
+        db.predictions.insert_one(doc)
+        self.assertEqual(feature_vectors.rescore(db, predictor), (1, 0))
+
+        resp = self.app.get(f'/api/history/{self.user_id}', headers=self.headers)
+        history = json.loads(resp.data)
+        self.assertEqual(history[0]["input_data"], {"Glucose": 0.5})
+        self.assertNotIn("features", history[0])
+
+    def test_rescore_reimputes_unsupplied_features(self):
+        # Vectors imputed with another model's means are scored on the current model's
+        X, _ = predictor.encode_rows([{}])
+        stale = {"features": feature_vectors.pack(X[0] + 1000), "present": 0}
+        np.testing.assert_allclose(predictor.to_matrix(feature_vectors.supplied_matrix([stale])), X)
+        db = MongitaClientMemory()["test_feature_vectors_reimpute"]
+        db.predictions.insert_one(dict(stale, prediction_result=predictor.predict({})))
+        self.assertEqual(feature_vectors.rescore(db, predictor), (1, 0))
+
+    def test_migrate_packs_legacy_records(self):
+        db = MongitaClientMemory()["test_feature_vectors_migrate"]
+        legacy = Prediction.create(self.user_id, {"glucose": "0.5", "unknown": "x"}, "Healthy")
+        legacy["_id"] = ObjectId()
+        del legacy["model_version"]
+        db.predictions.insert_one(legacy)
+        self.assertEqual(feature_vectors.migrate(db, predictor), 1)
+        doc = db.predictions.find_one({"_id": legacy["_id"]})
+        self.assertNotIn("input_data", doc)
+        self.assertIsNone(doc["model_version"])
+        self.assertEqual(feature_vectors.supplied_inputs(doc["features"], doc["present"]), {"Glucose": 0.5})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+import unittest
+from mongita import MongitaClientMemory
+from database import INDEXES, ensure_indexes
+
+class FakeCollection:
+    def __init__(self, calls, name):
+        self.calls = calls
+        self.name = name
+
+    def create_index(self, keys, **options):
+        self.calls.append((self.name, keys, options))
+        return "_".join(f"{k}_{d}" for k, d in keys)
+
+class FakeMongoDatabase(dict):
+    def __init__(self):
+        super().__init__()
+        self.calls = []
+
+    def __missing__(self, name):
+        return FakeCollection(self.calls, name)
+
+class TestIndexes(unittest.TestCase):
+    def test_mongita_gets_single_field_indexes(self):
+        db = MongitaClientMemory()["test_indexes"]
+        db.users.insert_one({"email": "a@example.com"})
+        names = ensure_indexes(db)
+        self.assertEqual(names, ["email_1", "user_id_1", "dimension_1"])
+        self.assertEqual(db.users.find_one({"email": "a@example.com"})["email"], "a@example.com")
+
+    def test_mongita_is_idempotent(self):
+        db = MongitaClientMemory()["test_indexes_idempotent"]
+        self.assertEqual(ensure_indexes(db), ensure_indexes(db))
+        info = db.predictions.index_information()
+        self.assertEqual(len(info), 2) # _id and user_id
+
+    def test_mongodb_gets_full_registry(self):
+        db = FakeMongoDatabase()
+        names = ensure_indexes(db)
+        self.assertEqual(names, ["email_1", "user_id_1_created_at_-1", "created_at_-1", "dimension_1"])
+        self.assertIn(("users", [("email", 1)], {"unique": True}), db.calls)
+        self.assertEqual(len(db.calls), sum(len(specs) for specs in INDEXES.values()))
+        self.assertTrue(all("embedded" not in options for _, _, options in db.calls))
+
+if __name__ == '__main__':
+    unittest.main()
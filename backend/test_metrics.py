@@ -0,0 +1,99 @@
+import unittest
+import os
+import json
+import logging
+from bson import ObjectId
+# Tests run against a throwaway store, never the tracked .mongita_db
+os.environ["STORAGE_BACKEND"] = "memory"
+from app import app
+from log_setup import sampled
+from metrics import Counter, Histogram, Registry, STAGE_SECONDS
+from database import mongo
+from ml_model import predictor
+from routes import prediction_writer, sessions
+
+class TestHistogram(unittest.TestCase):
+    def test_buckets_are_cumulative(self):
+        histogram = Histogram("latency_seconds", "test", ("stage",), buckets=(0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 2.0):
+            histogram.observe(value, "parse")
+        cumulative, count, total = histogram.snapshot("parse")
+        self.assertEqual(cumulative, [2, 3, 4])
+        self.assertEqual(count, 4)
+        self.assertAlmostEqual(total, 2.65)
+        self.assertIsNone(histogram.snapshot("other"))
+
+    def test_timer_records_one_observation(self):
+        histogram = Histogram("t_seconds", "test", ("stage",))
+        with histogram.time("inference"):
+            pass
+        self.assertEqual(histogram.snapshot("inference")[1], 1)
+
+    def test_text_format(self):
+        registry = Registry()
+        histogram = registry.histogram("req_seconds", "Request time", ("route",), buckets=(0.5,))
+        counter = registry.counter("errors_total", "Errors", ("kind",))
+        registry.stats_gauges("queue", lambda: {"depth": 3, "mode": "async", "enabled": True})
+        histogram.observe(0.25, '/a"b')
+        counter.inc("timeout", amount=2)
+        text = registry.render()
+        self.assertIn("# TYPE req_seconds histogram", text)
+        self.assertIn('req_seconds_bucket{route="/a\\"b",le="0.5"} 1', text)
+        self.assertIn('req_seconds_bucket{route="/a\\"b",le="+Inf"} 1', text)
+        self.assertIn('req_seconds_count{route="/a\\"b"} 1', text)
+        self.assertIn('errors_total{kind="timeout"} 2', text)
+        self.assertIn("queue_depth 3", text)
+        self.assertNotIn("queue_mode", text)
+        self.assertNotIn("queue_enabled", text)
+        self.assertIsInstance(counter, Counter)
+
+class TestMetricsEndpoint(unittest.TestCase):
+    def test_predict_stages_are_exposed(self):
+        client = app.test_client()
+        user = {"_id": ObjectId(), "name": "Metrics Patient", "password": "unused"}
+        with app.app_context():
+            mongo.db.users.insert_one(user)
+        before = (STAGE_SECONDS.snapshot("parse") or (None, 0))[1]
+        features_before = (STAGE_SECONDS.snapshot("features") or (None, 0))[1]
+        response = client.post('/api/predict',
+                               data=json.dumps({"symptoms": {"glucose": 101.5}}),
+                               content_type='application/json',
+                               headers={"Authorization": f"Bearer {sessions.issue(user)}"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(STAGE_SECONDS.snapshot("parse")[1], before + 1)
+        # Encoding the payload is the features stage, counted once per request
+        self.assertEqual(STAGE_SECONDS.snapshot("features")[1], features_before + 1)
+        X, _ = predictor.encode_rows([{"glucose": 101.5}])
+        self.assertEqual(STAGE_SECONDS.snapshot("features")[1], features_before + 2)
+        predictor.predict_batch(X)
+        predictor.explain_batch(X)
+        self.assertEqual(STAGE_SECONDS.snapshot("features")[1], features_before + 2)
+
+        response = client.get('/api/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.content_type.startswith("text/plain"))
+        text = response.get_data(as_text=True)
+        for stage in ("parse", "auth", "features", "persist", "serialize"):
+            self.assertIn(f'prediction_stage_seconds_count{{stage="{stage}"}}', text)
+        self.assertIn('http_request_duration_seconds_count{method="POST",route="/api/predict",status="200"}', text)
+        self.assertIn("prediction_writes_queue_depth", text)
+
+        prediction_writer.flush()
+        with app.app_context():
+            mongo.db.predictions.delete_many({"user_id": user["_id"]})
+            mongo.db.users.delete_one({"_id": user["_id"]})
+
+class TestSampledLogging(unittest.TestCase):
+    def test_sampling_rate(self):
+        self.assertTrue(all(sampled(1) for _ in range(100)))
+        self.assertFalse(any(sampled(0) for _ in range(100)))
+
+    def test_request_bodies_not_logged_at_info(self):
+        with self.assertLogs("backend.requests", level=logging.INFO) as captured:
+            logging.getLogger("backend.requests").info("marker")
+            app.test_client().post('/api/auth/login', data=json.dumps({"email": "x@y.z", "password": "secret"}),
+                                   content_type='application/json')
+        self.assertFalse(any("secret" in line for line in captured.output))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,119 @@
+import unittest
+import os
+import json
+import threading
+from unittest import mock
+# Tests run against a throwaway store, never the tracked .mongita_db
+os.environ["STORAGE_BACKEND"] = "memory"
+import model_holder
+import routes
+from app import app
+from ml_model import DiseasePredictor, predictor
+from model_holder import ModelHolder, ReloadInProgress
+
+class StubPredictor:
+    def __init__(self, accuracy, version="stub"):
+        self.accuracy = accuracy
+        self.version = version
+        self.model = object()
+
+    def predict_batch(self, rows):
+        return [self.version] * len(rows)
+
+class TestModelHolder(unittest.TestCase):
+    def test_swap_after_validation(self):
+        replacement = DiseasePredictor(cache_size=0)
+        holder = ModelHolder(predictor, factory=lambda retrain: replacement)
+        status = holder.reload(wait=True)
+        self.assertEqual(status["state"], "swapped")
+        self.assertAlmostEqual(status["test_accuracy"], predictor.accuracy)
+        self.assertIs(holder.current, replacement)
+        self.assertEqual(holder.swaps, 1)
+
+    def test_rejects_worse_model(self):
+        current = StubPredictor(accuracy=0.99)
+        holder = ModelHolder(current, factory=lambda retrain: predictor)
+        status = holder.reload(wait=True)
+        self.assertEqual(status["state"], "rejected")
+        self.assertIn("below", status["error"])
+        self.assertIs(holder.current, current)
+
+    def test_in_flight_requests_keep_their_model(self):
+        old, new = StubPredictor(0.5, "old"), StubPredictor(0.5, "new")
+        holder = ModelHolder(old)
+        model = holder.current # what a request captured before the swap
+        holder.swap(new)
+        self.assertEqual(model.predict_batch([{}]), ["old"])
+        self.assertEqual(holder.predict_batch([{}]), ["new"])
+
+    def test_one_reload_at_a_time(self):
+        release = threading.Event()
+
+        def slow_factory(retrain):
+            release.wait()
+            raise RuntimeError("training failed")
+
+        holder = ModelHolder(StubPredictor(0.5), factory=slow_factory)
+        holder.reload()
+        with self.assertRaises(ReloadInProgress):
+            holder.reload()
+        release.set()
+        holder._thread.join()
+        self.assertEqual(holder.last_reload["state"], "failed")
+        self.assertEqual(holder.last_reload["error"], "training failed")
+
+    def test_reload_by_fingerprint_only_loads(self):
+        # serve.py's master built the artifact; a worker must not build it again
+        holder = ModelHolder(predictor)
+        with mock.patch.object(model_holder, "build_artifact", side_effect=AssertionError("rebuilt")):
+            status = holder.reload(wait=True, fingerprint=predictor.version)
+        self.assertEqual(status["state"], "swapped")
+        self.assertIsNot(holder.current, predictor)
+        self.assertEqual(holder.current.version, predictor.version)
+        with self.assertRaises(RuntimeError):
+            DiseasePredictor(fingerprint="0" * 16)
+
+    def test_predict_never_trains_inline(self):
+        unloaded = DiseasePredictor.__new__(DiseasePredictor)
+        unloaded.model = None
+        with self.assertRaises(RuntimeError):
+            unloaded.predict_batch([{}])
+
+class TestAdminEndpoints(unittest.TestCase):
+    def setUp(self):
+        self.client = app.test_client()
+        self.factory = routes.model_holder._factory
+        routes.ADMIN_TOKEN = "secret"
+        self.headers = {"X-Admin-Token": "secret"}
+
+    def tearDown(self):
+        routes.model_holder._factory = self.factory
+        routes.ADMIN_TOKEN = None
+
+    def test_reload_and_report_version(self):
+        routes.model_holder._factory = lambda retrain: predictor
+        response = self.client.post('/api/admin/model/reload', data=json.dumps({}), content_type='application/json',
+                                    headers=self.headers)
+        self.assertEqual(response.status_code, 202)
+        routes.model_holder._thread.join()
+
+        data = json.loads(self.client.get('/api/admin/model', headers=self.headers).data)
+        self.assertEqual(data["version"], predictor.version)
+        self.assertEqual(data["last_reload"]["state"], "swapped")
+
+    def test_admin_token(self):
+        self.assertEqual(self.client.get('/api/admin/model').status_code, 403)
+        self.assertEqual(self.client.get('/api/admin/model', headers={"X-Admin-Token": "wrong"}).status_code, 403)
+        response = self.client.get('/api/admin/model', headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+
+    def test_admin_disabled_without_token(self):
+        # No ADMIN_TOKEN configured: nobody may reload, anonymous or not
+        routes.ADMIN_TOKEN = None
+        response = self.client.post('/api/admin/model/reload', data=json.dumps({"retrain": True}),
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(self.client.get('/api/admin/model', headers={"X-Admin-Token": ""}).status_code, 403)
+
+if __name__ == '__main__':
+    unittest.main()
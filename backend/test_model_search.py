@@ -0,0 +1,80 @@
+import unittest
+import os
+import tempfile
+import numpy as np
+from sklearn.preprocessing import StandardScaler
+import model_store
+from ml_model import make_forest
+from model_search import candidates, prepare_data, rank, search, write_report
+
+def synthetic(n=240, seed=0):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(n, 6))
+    y = np.where(X[:, 0] + 0.5 * rng.normal(size=n) > 0, "Diabetes", "Healthy")
+    return X, y
+
+class TestModelSearch(unittest.TestCase):
+    def test_candidates_cover_the_grid(self):
+        space = {"n_estimators": [20, 10], "max_depth": [3, None], "min_samples_leaf": [1, 4], "max_features": ["sqrt"]}
+        tasks = list(candidates(space, model_store.DEFAULT_MODEL_PARAMS))
+        self.assertEqual(len(tasks), 4)
+        for params, steps in tasks:
+            self.assertEqual(steps, [10, 20])
+            self.assertNotIn("n_estimators", params)
+            self.assertEqual(params["random_state"], 42)
+
+    def test_rank_prefers_smaller_forests_on_ties(self):
+        rows = [
+            {"score": 0.9, "n_estimators": 200, "max_depth": 6},
+            {"score": 0.9, "n_estimators": 100, "max_depth": 10},
+            {"score": 0.95, "n_estimators": 300, "max_depth": None},
+        ]
+        self.assertEqual([r["n_estimators"] for r in rank(rows)], [300, 100, 200])
+
+    def test_warm_start_growth_keeps_existing_trees(self):
+        X, y = synthetic()
+        forest = make_forest(dict(model_store.DEFAULT_MODEL_PARAMS, max_depth=4), n_estimators=5, warm_start=True,
+                             n_jobs=1)
+        forest.fit(X, y)
+        first = list(forest.estimators_)
+        forest.set_params(n_estimators=10)
+        forest.fit(X, y)
+        self.assertEqual(len(forest.estimators_), 10)
+        self.assertTrue(all(a is b for a, b in zip(first, forest.estimators_)))
+
+    def test_folds_use_the_serving_scaler(self):
+        X, y = synthetic()
+        scaler = StandardScaler().fit(X * 3) # not what a fold would fit for itself
+        rows = {tuple(np.round(row, 6)) for row in X}
+        for _, _, X_val, _ in prepare_data(X, y, cv=2, scaler=scaler)["folds"]:
+            self.assertTrue(all(tuple(np.round(row, 6)) in rows for row in scaler.inverse_transform(X_val)))
+        data = prepare_data(X, y, cv=0, scaler=scaler)
+        np.testing.assert_allclose(data["X"][:len(X)], scaler.transform(X))
+
+    def test_search_scores_every_step(self):
+        X, y = synthetic()
+        space = {"n_estimators": [5, 10], "max_depth": [2, 4], "min_samples_leaf": [2], "max_features": ["sqrt"]}
+        mode, rows = search(X, y, space, model_store.DEFAULT_MODEL_PARAMS, cv=2, workers=1)
+        self.assertEqual(mode, "cv")
+        self.assertEqual(len(rows), 4)
+        self.assertTrue(all(0.5 < r["score"] <= 1.0 for r in rows))
+        self.assertEqual(rows, rank(rows))
+
+        report_dir = tempfile.mkdtemp()
+        report = {"created_at": "now", "scoring": "2-fold cv", "workers": 1, "elapsed_seconds": 1.0,
+                  "best": rows[0], "best_params": {}, "test_accuracy": None, "artifact": None, "candidates": rows}
+        json_path, html_path = write_report(report, report_dir)
+        self.assertTrue(os.path.exists(json_path))
+        with open(html_path) as f:
+            self.assertEqual(f.read().count('class="best"'), 1)
+
+    def test_tuned_params_round_trip(self):
+        artifact_dir = tempfile.mkdtemp()
+        self.assertEqual(model_store.load_params(artifact_dir), model_store.DEFAULT_MODEL_PARAMS)
+        model_store.save_params(dict(model_store.DEFAULT_MODEL_PARAMS, max_depth=6, unknown=1), artifact_dir)
+        params = model_store.load_params(artifact_dir)
+        self.assertEqual(params["max_depth"], 6)
+        self.assertNotIn("unknown", params)
+
+if __name__ == '__main__':
+    unittest.main()
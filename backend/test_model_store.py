@@ -0,0 +1,56 @@
+import unittest
+import os
+import shutil
+import tempfile
+import time
+import model_store
+from ml_model import DiseasePredictor, MODEL_PARAMS, TRAIN_PATH, TEST_PATH
+
+class TestModelStore(unittest.TestCase):
+    def setUp(self):
+        self.artifact_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.artifact_dir, ignore_errors=True)
+
+    def test_fingerprint_tracks_params(self):
+        fp1 = model_store.fingerprint([TRAIN_PATH, TEST_PATH], MODEL_PARAMS)
+        fp2 = model_store.fingerprint([TRAIN_PATH, TEST_PATH], MODEL_PARAMS)
+        fp3 = model_store.fingerprint([TRAIN_PATH, TEST_PATH], dict(MODEL_PARAMS, max_depth=3))
+        self.assertEqual(fp1, fp2)
+        self.assertNotEqual(fp1, fp3)
+
+    def test_fingerprint_tracks_data(self):
+        path = os.path.join(self.artifact_dir, "data.csv")
+        with open(path, "w") as f:
+            f.write("a,b\n1,2\n")
+        fp1 = model_store.fingerprint([path], MODEL_PARAMS)
+        with open(path, "a") as f:
+            f.write("3,4\n")
+        fp2 = model_store.fingerprint([path], MODEL_PARAMS)
+        self.assertNotEqual(fp1, fp2)
+
+    def test_round_trip(self):
+        model_store.save_artifact("abc", {"accuracy": 0.5}, self.artifact_dir)
+        state = model_store.load_artifact("abc", self.artifact_dir)
+        self.assertEqual(state["accuracy"], 0.5)
+        self.assertEqual(state["fingerprint"], "abc")
+        self.assertIsNone(model_store.load_artifact("other", self.artifact_dir))
+
+    def test_predictor_reuses_artifact(self):
+        trained = DiseasePredictor(artifact_dir=self.artifact_dir)
+        self.assertIsNotNone(trained.version)
+        self.assertTrue(os.path.exists(model_store.artifact_path(trained.version, self.artifact_dir)))
+
+        start = time.perf_counter()
+        loaded = DiseasePredictor(artifact_dir=self.artifact_dir)
+        elapsed = time.perf_counter() - start
+        print(f"\nArtifact load took {elapsed * 1000:.1f} ms")
+
+        self.assertEqual(loaded.version, trained.version)
+        self.assertEqual(loaded.accuracy, trained.accuracy)
+        for sample in ({}, {"glucose": "250", "hba1c": "9.0"}, {"hemoglobin": "5.0"}):
+            self.assertEqual(loaded.predict(sample), trained.predict(sample))
+
+if __name__ == '__main__':
+    unittest.main()
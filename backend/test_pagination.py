@@ -0,0 +1,94 @@
+import unittest
+import os
+import json
+from datetime import datetime, timedelta
+from bson import ObjectId
+# Tests run against a throwaway store, never the tracked .mongita_db
+os.environ["STORAGE_BACKEND"] = "memory"
+from app import app
+from database import mongo
+from routes import encode_cursor, decode_cursor, sessions
+
+class TestPagination(unittest.TestCase):
+    def setUp(self):
+        self.client = app.test_client()
+        self.user_id = ObjectId()
+        base = datetime(2024, 1, 1)
+        # Two pairs share a timestamp to exercise the _id tie-breaker
+        offsets = [0, 1, 1, 2, 3, 3, 4]
+        self.docs = [{"_id": ObjectId(), "user_id": self.user_id, "prediction_result": f"r{i}",
+                      "created_at": base + timedelta(minutes=m)} for i, m in enumerate(offsets)]
+        user = {"_id": self.user_id, "name": "Paging Patient", "password": "unused"}
+        self.doctor = {"_id": ObjectId(), "name": "Paging Doctor", "password": "unused", "role": "doctor"}
+        with app.app_context():
+            mongo.db.predictions.insert_many(self.docs)
+            mongo.db.users.insert_many([user, self.doctor])
+        self.headers = {"Authorization": f"Bearer {sessions.issue(user)}"}
+        self.doctor_headers = {"Authorization": f"Bearer {sessions.issue(self.doctor)}"}
+        self.expected = [str(d["_id"]) for d in sorted(self.docs, key=lambda d: (d["created_at"], d["_id"]), reverse=True)]
+
+    def tearDown(self):
+        with app.app_context():
+            mongo.db.predictions.delete_many({"user_id": self.user_id})
+            mongo.db.users.delete_many({"_id": {"$in": [self.user_id, self.doctor["_id"]]}})
+
+    def pages(self, url, limit):
+        seen, after = [], None
+        while True:
+            params = f"?limit={limit}" + (f"&after={after}" if after else "")
+            response = self.client.get(url + params, headers=self.headers)
+            self.assertEqual(response.status_code, 200)
+            seen += [d["_id"]["$oid"] for d in json.loads(response.data)]
+            after = response.headers.get("X-Next-Cursor")
+            if not after:
+                return seen
+
+    def test_history_pages_newest_first(self):
+        for limit in (1, 2, 3, 7, 50):
+            self.assertEqual(self.pages(f"/api/history/{self.user_id}", limit), self.expected)
+
+    def test_listings_return_their_fields_only(self):
+        with app.app_context():
+            mongo.db.predictions.update_one({"_id": self.docs[0]["_id"]},
+                                            {"$set": {"explanation": {"probabilities": []}, "input_data": {"a": 1}}})
+        history = json.loads(self.client.get(f"/api/history/{self.user_id}?limit=50", headers=self.headers).data)
+        first = next(d for d in history if d["_id"]["$oid"] == str(self.docs[0]["_id"]))
+        self.assertEqual(set(first), {"_id", "created_at", "prediction_result", "input_data"})
+        dashboard = json.loads(self.client.get("/api/doctor/predictions?limit=500", headers=self.doctor_headers).data)
+        mine = [d for d in dashboard if d.get("user_id") == {"$oid": str(self.user_id)}]
+        self.assertEqual(len(mine), len(self.docs))
+        self.assertTrue(all("input_data" not in d and d["patient_name"] == "Paging Patient" for d in mine))
+        first = next(d for d in mine if d["_id"]["$oid"] == str(self.docs[0]["_id"]))
+        self.assertEqual(set(first), {"_id", "created_at", "user_id", "prediction_result", "explanation",
+                                      "patient_name"})
+
+    def test_dashboard_pages_include_names(self):
+        # Staff only: no token is a 401, a patient's token a 403
+        self.assertEqual(self.client.get("/api/doctor/predictions").status_code, 401)
+        self.assertEqual(self.client.get("/api/doctor/predictions", headers=self.headers).status_code, 403)
+        response = self.client.get("/api/doctor/predictions?limit=2", headers=self.doctor_headers)
+        self.assertEqual(response.status_code, 200)
+        page = json.loads(response.data)
+        self.assertLessEqual(len(page), 2)
+        self.assertTrue(all("patient_name" in p for p in page))
+
+    def test_ndjson_export(self):
+        response = self.client.get(f"/api/history/{self.user_id}?format=ndjson", headers=self.headers)
+        self.assertEqual(response.mimetype, "application/x-ndjson")
+        lines = [json.loads(line) for line in response.data.decode().splitlines()]
+        self.assertEqual([d["_id"]["$oid"] for d in lines], self.expected)
+
+    def test_cursor_round_trip_and_validation(self):
+        created_at, doc_id = decode_cursor(encode_cursor(self.docs[0]))
+        self.assertEqual((created_at, doc_id), (self.docs[0]["created_at"], self.docs[0]["_id"]))
+        response = self.client.get(f"/api/history/{self.user_id}?after=not-a-cursor", headers=self.headers)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.get("/api/history/not-an-id").status_code, 400)
+        # A bad limit is refused before the export starts streaming
+        for limit in ("-5", "0", "ten"):
+            for export in ("", "&format=ndjson"):
+                response = self.client.get(f"/api/history/{self.user_id}?limit={limit}{export}", headers=self.headers)
+                self.assertEqual(response.status_code, 400)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+import unittest
+import os
+import json
+import numpy as np
+from bson import ObjectId
+# Tests run against a throwaway store, never the tracked .mongita_db
+os.environ["STORAGE_BACKEND"] = "memory"
+from app import app
+from database import mongo
+from ml_model import predictor
+from routes import prediction_writer, sessions
+
+SAMPLES = [
+    {},
+    {"glucose": "250", "hba1c": "9.0"},
+    {"hemoglobin": "5.0"},
+    {"c_reactive_protein": "20.0", "Troponin": 0.5},
+    [0.5] * 24,
+]
+
+class TestPredictBatch(unittest.TestCase):
+    def setUp(self):
+        self.app = app.test_client()
+        self.app.testing = True
+        self.user_id = str(ObjectId())
+        user = {"_id": ObjectId(self.user_id), "name": "Batch Patient", "password": "unused"}
+        with app.app_context():
+            mongo.db.users.insert_one(user)
+        self.headers = {"Authorization": f"Bearer {sessions.issue(user)}"}
+
+    def tearDown(self):
+        prediction_writer.flush()
+        with app.app_context():
+            mongo.db.predictions.delete_many({"user_id": ObjectId(self.user_id)})
+            mongo.db.users.delete_one({"_id": ObjectId(self.user_id)})
+
+    def test_batch_matches_single(self):
+        expected = [predictor.predict(sample) for sample in SAMPLES]
+        self.assertEqual(predictor.predict_batch(SAMPLES), expected)
+
+    def test_batch_from_array(self):
+        X = np.full((3, 24), np.nan)
+        X[1, 0] = 250.0
+        X[2] = 0.5
+        results = predictor.predict_batch(X)
+        self.assertEqual(results[0], predictor.predict({}))
+        self.assertEqual(results[1], predictor.predict({"Glucose": 250.0}))
+        self.assertEqual(results[2], predictor.predict([0.5] * 24))
+
+    def test_batch_rejects_bad_width(self):
+        with self.assertRaises(ValueError):
+            predictor.predict_batch(np.zeros((2, 5)))
+        self.assertEqual(predictor.predict_batch([]), [])
+
+    def test_batch_endpoint(self):
+        payload = {
+            "user_id": self.user_id,
+            "samples": SAMPLES[:3] + [{"user_id": self.user_id, "symptoms": SAMPLES[3]}],
+        }
+        response = self.app.post('/api/predict/batch',
+                                 data=json.dumps(payload),
+                                 content_type='application/json',
+                                 headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.data)
+        self.assertEqual(data["predictions"], predictor.predict_batch(SAMPLES[:4]))
+
+        prediction_writer.flush()
+        with app.app_context():
+            stored = mongo.db.predictions.count_documents({"user_id": ObjectId(self.user_id)})
+        self.assertEqual(stored, 4)
+
+    def test_batch_endpoint_checks_owner(self):
+        payload = {"user_id": self.user_id, "samples": SAMPLES[:2]}
+        response = self.app.post('/api/predict/batch', data=json.dumps(payload), content_type='application/json')
+        self.assertEqual(response.status_code, 401)
+        payload["samples"].append({"user_id": str(ObjectId()), "symptoms": SAMPLES[2]})
+        response = self.app.post('/api/predict/batch', data=json.dumps(payload), content_type='application/json',
+                                 headers=self.headers)
+        self.assertEqual(response.status_code, 403)
+
+    def test_batch_endpoint_requires_samples(self):
+        response = self.app.post('/api/predict/batch',
+                                 data=json.dumps({"samples": []}),
+                                 content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        # A sample that cannot be parsed is the client's error, not a 500
+        response = self.app.post('/api/predict/batch',
+                                 data=json.dumps({"samples": [[{}, 1, 2]]}),
+                                 content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+if __name__ == '__main__':
+    unittest.main()
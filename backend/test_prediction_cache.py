@@ -0,0 +1,67 @@
+import unittest
+import os
+import json
+# Tests run against a throwaway store, never the tracked .mongita_db
+os.environ["STORAGE_BACKEND"] = "memory"
+from app import app
+from caching import LRUCache
+from ml_model import DiseasePredictor, predictor
+
+class TestLRUCache(unittest.TestCase):
+    def test_eviction_order_and_counters(self):
+        cache = LRUCache(maxsize=2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        self.assertEqual(cache.get("a"), 1) # "a" is now most recent
+        cache.put("c", 3)                   # evicts "b"
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("c"), 3)
+
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["evictions"]), (2, 1, 1))
+        self.assertEqual(stats["size"], 2)
+
+    def test_disabled_cache_stores_nothing(self):
+        cache = LRUCache(maxsize=0)
+        cache.put("a", 1)
+        self.assertEqual(len(cache), 0)
+
+class TestPredictionCache(unittest.TestCase):
+    def setUp(self):
+        self.predictor = DiseasePredictor(cache_size=16)
+
+    def test_repeated_vectors_hit_the_cache(self):
+        first = self.predictor.predict({"glucose": "250", "hba1c": "9.0"})
+        # Different spelling, same imputed vector
+        second = self.predictor.predict({"Glucose": 250, "HbA1c": 9})
+        self.assertEqual(first, second)
+        stats = self.predictor.cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+
+    def test_batch_results_match_uncached(self):
+        payloads = [{"glucose": g} for g in (0.1, 0.5, 0.1, 0.9, 0.5)]
+        uncached = DiseasePredictor(cache_size=0)
+        self.assertEqual(self.predictor.predict_batch(payloads), uncached.predict_batch(payloads))
+        self.assertEqual(self.predictor.predict_batch(payloads), uncached.predict_batch(payloads))
+        self.assertEqual(self.predictor.cache.stats()["hits"], 5)
+
+    def test_quantization_merges_close_vectors(self):
+        self.predictor.cache_quantum = 0.01
+        self.predictor.predict({"glucose": 0.5})
+        self.predictor.predict({"glucose": 0.5001})
+        self.assertEqual(self.predictor.cache.stats()["hits"], 1)
+
+    def test_model_reload_invalidates(self):
+        self.predictor.predict({"glucose": 0.5})
+        self.assertEqual(len(self.predictor.cache), 1)
+        self.predictor.load_or_train()
+        self.assertEqual(len(self.predictor.cache), 0)
+
+    def test_stats_endpoint_reports_cache(self):
+        stats = json.loads(app.test_client().get('/api/stats').data)
+        self.assertEqual(stats["prediction_cache"]["maxsize"], predictor.cache.maxsize)
+        for key in ("hits", "misses", "evictions"):
+            self.assertIn(key, stats["prediction_cache"])
+
+if __name__ == '__main__':
+    unittest.main()
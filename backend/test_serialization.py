@@ -0,0 +1,42 @@
+import unittest
+import json
+from datetime import datetime, timedelta, timezone
+from bson import ObjectId, Decimal128, json_util
+import serialization
+
+DOCS = [
+    {"_id": ObjectId(), "user_id": ObjectId(), "created_at": datetime(2024, 1, 2, 3, 4, 5),
+     "input_data": {"glucose": 120.5, "note": "héllo"}, "prediction_result": "Diabetes", "model_version": None},
+    {"_id": ObjectId(), "created_at": datetime(2024, 1, 2, 3, 4, 5, 123456),
+     "explanation": {"contributions": [["glucose", 0.25]], "top": [{"label": "Healthy", "p": 0.5}]}},
+    {"at": datetime(2024, 1, 1, 0, 0, 0, 999), "before_epoch": datetime(1960, 1, 1),
+     "aware": datetime(2024, 1, 1, tzinfo=timezone(timedelta(hours=2))), "price": Decimal128("1.5")},
+]
+
+class TestSerialization(unittest.TestCase):
+    def test_same_values_as_json_util(self):
+        for doc in DOCS:
+            self.assertEqual(json.loads(serialization.dumps(doc)), json.loads(json_util.dumps(doc)))
+
+    def test_stdlib_fallback_matches(self):
+        if not serialization.HAS_ORJSON:
+            self.skipTest("orjson is not installed")
+        fast = [serialization.dumps(doc) for doc in DOCS]
+        serialization.HAS_ORJSON = False
+        try:
+            self.assertEqual([serialization.dumps(doc) for doc in DOCS], fast)
+        finally:
+            serialization.HAS_ORJSON = True
+
+    def test_lines_and_unknown_types(self):
+        lines = serialization.dumps_lines(DOCS[:2]).decode().splitlines()
+        self.assertEqual([json.loads(line)["_id"]["$oid"] for line in lines], [str(d["_id"]) for d in DOCS[:2]])
+        with self.assertRaises(TypeError):
+            serialization.dumps({"x": object()})
+
+    def test_project(self):
+        self.assertEqual(list(serialization.project(DOCS[0], ("_id", "prediction_result", "missing"))),
+                         ["_id", "prediction_result"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+import unittest
+import os
+import json
+from flask import Flask
+# Tests run against a throwaway store, never the tracked .mongita_db
+os.environ["STORAGE_BACKEND"] = "memory"
+from app import app
+from database import Storage
+from serve import FINGERPRINT_BYTES, bind, publish, published
+
+class TestHealthEndpoints(unittest.TestCase):
+    def setUp(self):
+        self.client = app.test_client()
+
+    def test_health(self):
+        response = self.client.get('/api/health')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.data)["status"], "ok")
+
+    def test_ready(self):
+        response = self.client.get('/api/ready')
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.data)
+        self.assertEqual(data["status"], "ready")
+        self.assertEqual(data["checks"], {"model": True, "storage": True, "write_queue": True})
+
+class TestForkSafety(unittest.TestCase):
+    def make_storage(self, **config):
+        flask_app = Flask(__name__)
+        flask_app.config.update(config)
+        storage = Storage()
+        storage.init_app(flask_app)
+        return storage
+
+    def test_reopen_reconnects_disk_store(self):
+        import tempfile
+        storage = self.make_storage(STORAGE_BACKEND="mongita", MONGITA_PATH=tempfile.mkdtemp())
+        storage.db.users.insert_one({"email": "a@example.com"})
+        client = storage.cx
+        storage.reopen()
+        self.assertIsNot(storage.cx, client)
+        self.assertEqual(storage.db.users.count_documents({}), 1)
+
+    def test_reopen_keeps_memory_store(self):
+        storage = self.make_storage(STORAGE_BACKEND="memory")
+        storage.db.users.insert_one({"email": "a@example.com"})
+        client = storage.cx
+        storage.reopen()
+        self.assertIs(storage.cx, client)
+        self.assertEqual(storage.db.users.count_documents({}), 1)
+
+    def test_shared_socket_does_not_block_accept(self):
+        sock = bind("127.0.0.1", 0, 8)
+        try:
+            self.assertFalse(sock.getblocking())
+            self.assertTrue(sock.get_inheritable())
+            with self.assertRaises(BlockingIOError):
+                sock.accept()
+        finally:
+            sock.close()
+
+    def test_fingerprint_is_shared_with_workers(self):
+        import mmap
+        shared = mmap.mmap(-1, FINGERPRINT_BYTES)
+        self.assertIsNone(published(shared))
+        pid = os.fork()
+        if pid == 0:
+            publish(shared, "0123456789abcdef")
+            os._exit(0)
+        os.waitpid(pid, 0)
+        self.assertEqual(published(shared), "0123456789abcdef")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+import os
+import tempfile
+import unittest
+from bson import ObjectId
+from flask import Flask
+from mongita.database import Database as MongitaDatabase
+from database import Storage, connect, storage_setting
+
+class TestStorageBackends(unittest.TestCase):
+    def make_storage(self, **config):
+        app = Flask(__name__)
+        app.config.update(config)
+        storage = Storage()
+        storage.init_app(app)
+        return app, storage
+
+    def test_memory_backend(self):
+        app, storage = self.make_storage(STORAGE_BACKEND="memory")
+        self.assertIs(app.extensions["pymongo"], storage)
+        user_id = storage.db.users.insert_one({"email": "a@example.com"}).inserted_id
+        self.assertEqual(storage.db.users.find_one({"email": "a@example.com"})["_id"], user_id)
+        self.assertIn("email_1", {name for info in storage.db.users.index_information() for name in info})
+        self.assertIsInstance(storage.in_filter([user_id])["$in"], set)
+        # Every memory store starts empty
+        _, other = self.make_storage(STORAGE_BACKEND="memory")
+        self.assertEqual(other.db.users.count_documents({}), 0)
+
+    def test_mongita_backend_uses_configured_path(self):
+        path = tempfile.mkdtemp()
+        _, storage = self.make_storage(STORAGE_BACKEND="mongita", MONGITA_PATH=path)
+        self.assertIsInstance(storage.db, MongitaDatabase)
+        storage.db.users.insert_one({"email": "b@example.com"})
+        self.assertTrue(os.listdir(path))
+
+    def test_mongodb_client_options(self):
+        # MongoClient connects lazily, so the options can be checked without a server
+        client, db = connect({
+            "STORAGE_BACKEND": "mongodb",
+            "MONGO_URI": "mongodb://db.invalid:27017/clinic",
+            "MONGO_MAX_POOL_SIZE": 20,
+            "MONGO_SERVER_SELECTION_TIMEOUT_MS": 250,
+            "MONGO_WRITE_CONCERN": "majority",
+            "MONGO_JOURNAL": True,
+        })
+        try:
+            self.assertEqual(db.name, "clinic")
+            self.assertEqual(client.options.pool_options.max_pool_size, 20)
+            self.assertEqual(client.options.server_selection_timeout, 0.25)
+            self.assertEqual(db.write_concern.document, {"w": "majority", "j": True})
+        finally:
+            client.close()
+
+    def test_mongodb_in_filter_is_a_list(self):
+        storage = Storage()
+        storage.backend = "mongodb"
+        ids = [ObjectId(), ObjectId()]
+        self.assertEqual(storage.in_filter(ids), {"$in": ids})
+
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            connect({"STORAGE_BACKEND": "sqlite"})
+
+    def test_env_overrides_defaults(self):
+        os.environ["MONGO_MAX_POOL_SIZE"] = "7"
+        try:
+            self.assertEqual(storage_setting({}, "MONGO_MAX_POOL_SIZE"), 7)
+            self.assertEqual(storage_setting({"MONGO_MAX_POOL_SIZE": 3}, "MONGO_MAX_POOL_SIZE"), 3)
+        finally:
+            del os.environ["MONGO_MAX_POOL_SIZE"]
+
+if __name__ == '__main__':
+    unittest.main()
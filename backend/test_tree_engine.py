@@ -0,0 +1,55 @@
+import unittest
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from ml_model import predictor, TEST_PATH, load_dataset
+from tree_engine import FlatForest, float32_floor
+
+class TestTreeEngine(unittest.TestCase):
+    def test_matches_sklearn_on_test_csv(self):
+        X = predictor.to_matrix(load_dataset(TEST_PATH, predictor.feature_names)[0])
+        X_scaled = (X - predictor.scaler.mean_) / predictor.scaler.scale_
+
+        np.testing.assert_array_equal(predictor.engine.predict(X_scaled), predictor.model.predict(X_scaled))
+        np.testing.assert_array_equal(predictor.engine.predict_proba(X_scaled),
+                                      predictor.model.predict_proba(X_scaled))
+
+    def test_matches_unbounded_depth_forest(self):
+        rng = np.random.default_rng(0)
+        X = rng.random((300, 6)) * 100
+        y = rng.integers(0, 3, 300)
+        model = RandomForestClassifier(n_estimators=15, random_state=0).fit(X, y)
+        engine = FlatForest.from_sklearn(model)
+
+        X_new = rng.random((500, 6)) * 100
+        np.testing.assert_array_equal(engine.predict(X_new), model.predict(X_new))
+        np.testing.assert_array_equal(engine.predict(X[:1]), model.predict(X[:1]))
+
+    def test_state_round_trip(self):
+        engine = FlatForest.from_state(predictor.engine.to_state())
+        X = np.random.default_rng(1).normal(size=(10, 24))
+        np.testing.assert_array_equal(engine.predict(X), predictor.engine.predict(X))
+
+    def test_compact_layout(self):
+        engine = predictor.engine
+        self.assertEqual(engine.feature.dtype, np.uint8)
+        self.assertEqual(engine.threshold.dtype, np.float32)
+        self.assertLessEqual(engine.children.dtype.itemsize, 4)
+        self.assertIsNone(FlatForest.from_state(dict(engine.to_state(), format=1)))
+        # Pure leaves reference the one-hot rows, i.e. store their class index
+        np.testing.assert_array_equal(engine.table[:len(engine.classes)], np.eye(len(engine.classes)))
+
+    def test_float32_thresholds_keep_comparisons(self):
+        rng = np.random.default_rng(2)
+        thresholds = rng.normal(size=2000) * 10.0 ** rng.integers(-3, 4, 2000)
+        rounded = float32_floor(thresholds)
+        x = thresholds.astype(np.float32)
+        for candidates in (x, np.nextafter(x, np.float32(np.inf)), np.nextafter(x, np.float32(-np.inf))):
+            np.testing.assert_array_equal(candidates <= thresholds, candidates <= rounded)
+
+    def test_predictor_serves_from_engine(self):
+        X = predictor.to_matrix([{}, {"glucose": 250, "hba1c": 9.0}])
+        expected = predictor.model.predict(predictor.scaler.transform(X))
+        self.assertEqual(predictor.predict_batch(X), [predictor.classes[i] for i in expected])
+
+if __name__ == '__main__':
+    unittest.main()
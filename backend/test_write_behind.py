@@ -0,0 +1,126 @@
+import unittest
+import os
+import json
+import threading
+import time
+from bson import ObjectId
+from mongita import MongitaClientMemory
+# Tests run against a throwaway store, never the tracked .mongita_db
+os.environ["STORAGE_BACKEND"] = "memory"
+from app import app
+from database import mongo
+from routes import prediction_writer, sessions
+from write_behind import WriteBehindQueue, WriteQueueFull
+
+class RecordingCollection:
+    def __init__(self, fail_times=0, block=None):
+        self.db = MongitaClientMemory()["test_write_behind"]
+        self.calls = []
+        self.fail_times = fail_times
+        self.block = block
+
+    def insert_many(self, docs):
+        if self.block is not None:
+            self.block.wait()
+        self.calls.append(len(docs))
+        if self.fail_times:
+            self.fail_times -= 1
+            # Simulate a partial write before the error
+            self.db.items.insert_many(docs[:1])
+            raise RuntimeError("disk hiccup")
+        self.db.items.insert_many(docs)
+
+    def find(self, *args, **kwargs):
+        return self.db.items.find(*args, **kwargs)
+
+class TestWriteBehindQueue(unittest.TestCase):
+    def test_groups_documents_into_flushes(self):
+        collection = RecordingCollection()
+        writer = WriteBehindQueue(lambda: collection, flush_size=10, flush_interval_ms=50)
+        writer.submit_many([{"n": i} for i in range(25)])
+        writer.flush()
+        self.assertEqual(collection.db.items.count_documents({}), 25)
+        self.assertLessEqual(max(collection.calls), 10)
+        self.assertLess(len(collection.calls), 25)
+        stats = writer.stats()
+        self.assertEqual((stats["enqueued"], stats["written"], stats["queue_depth"]), (25, 25, 0))
+        writer.close()
+
+    def test_sync_mode_waits_for_flush(self):
+        collection = RecordingCollection()
+        writer = WriteBehindQueue(lambda: collection, durability="sync", flush_interval_ms=5)
+        writer.submit({"n": 1})
+        self.assertEqual(collection.db.items.count_documents({}), 1)
+        writer.close()
+
+    def test_backpressure_when_full(self):
+        release = threading.Event()
+        collection = RecordingCollection(block=release)
+        writer = WriteBehindQueue(lambda: collection, max_queue=2, flush_size=1, put_timeout=0.05)
+        writer.submit({"n": 0}) # taken by the blocked writer
+        time.sleep(0.05)
+        writer.submit_many([{"n": 1}, {"n": 2}])
+        with self.assertRaises(WriteQueueFull):
+            writer.submit({"n": 3})
+        self.assertEqual(writer.stats()["rejected"], 1)
+        release.set()
+        writer.flush()
+        self.assertEqual(collection.db.items.count_documents({}), 3)
+        writer.close()
+
+    def test_batch_is_queued_whole_or_not_at_all(self):
+        release = threading.Event()
+        collection = RecordingCollection(block=release)
+        writer = WriteBehindQueue(lambda: collection, max_queue=3, flush_size=1, put_timeout=0.05)
+        writer.submit({"n": 0}) # taken by the blocked writer
+        time.sleep(0.05)
+        writer.submit({"n": 1})
+        # Two documents of room left is not enough for three; none of them may be queued
+        with self.assertRaises(WriteQueueFull):
+            writer.submit_many([{"n": 2}, {"n": 3}, {"n": 4}])
+        with self.assertRaises(WriteQueueFull):
+            writer.submit_many([{"n": i} for i in range(4)])
+        self.assertEqual(writer.stats()["queue_depth"], 1)
+        release.set()
+        writer.flush()
+        self.assertEqual(sorted(d["n"] for d in collection.db.items.find({})), [0, 1])
+        writer.close()
+
+    def test_retry_skips_partially_written_documents(self):
+        collection = RecordingCollection(fail_times=1)
+        writer = WriteBehindQueue(lambda: collection, flush_size=5, flush_interval_ms=20)
+        writer.submit_many([{"n": i} for i in range(5)])
+        writer.flush()
+        self.assertEqual(collection.db.items.count_documents({}), 5)
+        self.assertEqual(writer.stats()["written"], 5)
+        writer.close()
+
+    def test_close_drains_and_notifies_listeners(self):
+        collection = RecordingCollection()
+        flushed = []
+        writer = WriteBehindQueue(lambda: collection, flush_interval_ms=1000)
+        writer.add_flush_listener(flushed.extend)
+        writer.submit_many([{"n": i} for i in range(3)])
+        writer.close()
+        self.assertEqual(collection.db.items.count_documents({}), 3)
+        self.assertEqual(len(flushed), 3)
+
+class TestPredictPersistence(unittest.TestCase):
+    def test_predict_record_is_written(self):
+        user_id = ObjectId()
+        user = {"_id": user_id, "name": "Writer Patient", "password": "unused"}
+        with app.app_context():
+            mongo.db.users.insert_one(user)
+        response = app.test_client().post('/api/predict',
+                                          data=json.dumps({"user_id": str(user_id), "symptoms": {"glucose": 1}}),
+                                          content_type='application/json',
+                                          headers={"Authorization": f"Bearer {sessions.issue(user)}"})
+        self.assertEqual(response.status_code, 200)
+        prediction_writer.flush()
+        with app.app_context():
+            self.assertEqual(mongo.db.predictions.count_documents({"user_id": user_id}), 1)
+            mongo.db.predictions.delete_many({"user_id": user_id})
+            mongo.db.users.delete_one({"_id": user_id})
+
+if __name__ == '__main__':
+    unittest.main()
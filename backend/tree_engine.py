@@ -0,0 +1,166 @@
+import numpy as np
+
+# Fitted sklearn forests compiled into flat node arrays so inference is a handful of
+# vectorized gathers instead of one Python/joblib call per tree.
+#
+# The arrays are inference-only and compact: split features and child indices use the
+# smallest unsigned type that holds them, thresholds are float32 and a node's class
+# distribution is an index into a deduplicated leaf table. sklearn compares float32
+# inputs against float64 thresholds; each threshold is rounded *down* to float32, which
+# gives the same comparison for every float32 input, so paths and predictions are
+# unchanged. The first n_classes rows of the table are one-hot, so a pure leaf (nearly
+# all of them with min_samples_leaf) stores its class index.
+
+ARRAY_FIELDS = ("feature", "threshold", "children", "leaf", "table", "roots")
+
+# Bump when the layout of to_state() changes; older states are rebuilt from the model
+STATE_FORMAT = 2
+
+# Rows walked together; keeps the (n_trees, rows) working set cache-resident
+CHUNK_ROWS = 64
+
+
+def index_dtype(max_value):
+    return np.min_scalar_type(max(int(max_value), 0))
+
+
+def float32_floor(values):
+    # Largest float32 <= each value: for float32 x, x <= t exactly when x <= float32_floor(t)
+    values = np.asarray(values, dtype=np.float64)
+    rounded = values.astype(np.float32)
+    above = rounded.astype(np.float64) > values
+    rounded[above] = np.nextafter(rounded[above], np.float32(-np.inf))
+    return rounded
+
+
+class FlatForest:
+    def __init__(self, feature, threshold, children, leaf, table, roots, classes, max_depth):
+        self.feature = feature      # split feature per node (0 for leaves)
+        self.threshold = threshold  # go left when x <= threshold (float32)
+        self.children = children    # (n_nodes, 2) [right, left] child per node; leaves point to themselves
+        self.leaf = leaf            # row of `table` holding the node's class distribution (leaves only)
+        self.table = table          # (n_distributions, n_classes) normalized class distributions
+        self.roots = roots          # root node index of every tree
+        self.classes = classes
+        self.max_depth = int(max_depth)
+
+    @classmethod
+    def from_sklearn(cls, model):
+        n_classes = model.n_classes_
+        features, thresholds, children, values, leaves, roots = [], [], [], [], [], []
+        offset = 0
+        max_depth = 0
+        for estimator in model.estimators_:
+            tree = estimator.tree_
+            n = tree.node_count
+            ids = np.arange(offset, offset + n, dtype=np.int64)
+            is_leaf = tree.children_left == -1
+
+            features.append(np.where(is_leaf, 0, tree.feature))
+            thresholds.append(tree.threshold)
+            left = np.where(is_leaf, ids, tree.children_left + offset)
+            right = np.where(is_leaf, ids, tree.children_right + offset)
+            children.append(np.stack([right, left], axis=1))
+
+            # Same normalization as DecisionTreeClassifier.predict_proba
+            value = tree.value[:, 0, :n_classes].astype(np.float64)
+            normalizer = value.sum(axis=1, keepdims=True)
+            normalizer[normalizer == 0.0] = 1.0
+            values.append(value / normalizer)
+            leaves.append(is_leaf)
+
+            roots.append(offset)
+            max_depth = max(max_depth, tree.max_depth)
+            offset += n
+
+        # Deduplicate the leaf distributions, one-hot rows first
+        rows = {row.tobytes(): i for i, row in enumerate(np.eye(n_classes))}
+        table = list(np.eye(n_classes))
+        values = np.concatenate(values)
+        leaf = np.zeros(offset, dtype=np.int64)
+        for i in np.flatnonzero(np.concatenate(leaves)):
+            row = values[i]
+            key = row.tobytes()
+            index = rows.get(key)
+            if index is None:
+                index = rows[key] = len(table)
+                table.append(row)
+            leaf[i] = index
+
+        node_dtype = index_dtype(offset - 1)
+        feature = np.concatenate(features)
+        return cls(
+            feature=feature.astype(index_dtype(feature.max())),
+            threshold=float32_floor(np.concatenate(thresholds)),
+            children=np.concatenate(children).astype(node_dtype),
+            leaf=leaf.astype(index_dtype(len(table) - 1)),
+            table=np.array(table, dtype=np.float64),
+            roots=np.array(roots, dtype=node_dtype),
+            classes=np.asarray(model.classes_),
+            max_depth=max_depth,
+        )
+
+    @classmethod
+    def from_state(cls, state):
+        # None for a state saved in another layout
+        if state.get("format") != STATE_FORMAT:
+            return None
+        # Plain ndarray views of joblib's memory maps: np.memmap results go through the
+        # subclass machinery on every gather
+        return cls(classes=np.asarray(state["classes"]), max_depth=state["max_depth"],
+                   **{name: np.asarray(state[name]) for name in ARRAY_FIELDS})
+
+    def to_state(self):
+        state = {name: getattr(self, name) for name in ARRAY_FIELDS}
+        state["classes"] = self.classes
+        state["max_depth"] = self.max_depth
+        state["format"] = STATE_FORMAT
+        return state
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    @property
+    def n_nodes(self):
+        return len(self.feature)
+
+    @property
+    def nbytes(self):
+        return sum(getattr(self, name).nbytes for name in ARRAY_FIELDS)
+
+    def apply(self, X):
+        # Leaf index of every (tree, row) pair, walking all trees one level per step
+        # sklearn evaluates splits on float32 inputs, so do the same to get identical paths
+        X = np.asarray(X, dtype=np.float32)
+        n_rows, n_features = X.shape
+        flat_X = X.ravel()
+        row_offsets = (np.arange(n_rows, dtype=np.intp) * n_features)[None, :]
+
+        # Walk with machine-size indices; the compact arrays are only gathered from
+        nodes = np.repeat(self.roots.astype(np.intp)[:, None], n_rows, axis=1)
+        branch = np.empty_like(nodes)
+        children = self.children.ravel()
+        for _ in range(self.max_depth):
+            go_left = flat_X.take(row_offsets + self.feature.take(nodes)) <= self.threshold.take(nodes)
+            np.multiply(nodes, 2, out=branch)
+            branch += go_left
+            nodes[...] = children.take(branch)
+        return nodes
+
+    def predict_proba(self, X):
+        X = np.asarray(X)
+        if len(X) > CHUNK_ROWS:
+            return np.concatenate([self.predict_proba(X[i:i + CHUNK_ROWS])
+                                   for i in range(0, len(X), CHUNK_ROWS)])
+        return self.leaf_proba(self.apply(X))
+
+    def leaf_proba(self, leaves):
+        # Class probabilities from the (n_trees, n_rows) leaf ids returned by apply().
+        # Reducing over the tree axis adds one tree at a time, in the same order as sklearn
+        proba = np.add.reduce(self.table.take(self.leaf.take(leaves), axis=0), axis=0)
+        proba /= self.n_trees
+        return proba
+
+    def predict(self, X):
+        return self.classes.take(np.argmax(self.predict_proba(X), axis=1), axis=0)
@@ -0,0 +1,216 @@
+import atexit
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from bson import ObjectId
+from log_setup import get_logger
+
+log = get_logger("write_behind")
+
+# Buffers documents in memory and writes them with insert_many from a background thread.
+# "async" returns as soon as a document is queued; "sync" waits until the flush that
+# contains it has been written.
+
+DURABILITY_MODES = ("async", "sync")
+_STOP = object()
+
+
+class WriteQueueFull(Exception):
+    pass
+
+
+class WriteBehindQueue:
+    def __init__(self, get_collection, max_queue=10000, flush_size=256, flush_interval_ms=50,
+                 durability="async", put_timeout=5.0, retries=3):
+        if durability not in DURABILITY_MODES:
+            raise ValueError(f"durability must be one of {DURABILITY_MODES}")
+        self.get_collection = get_collection # resolved on every flush
+        self.max_queue = max_queue
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.durability = durability
+        self.put_timeout = put_timeout
+        self.retries = retries
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        # Room is reserved for a whole enqueue() call before any of it is queued, so a
+        # rejected batch leaves nothing behind for a retry to write twice
+        self._space = threading.Condition()
+        self._reserved = 0
+        self._worker = None
+        self._worker_pid = None
+        self._closed = False
+        self._on_flush = []
+        self._reset_metrics()
+        atexit.register(self.close)
+
+    def _reset_metrics(self):
+        self._enqueued = 0
+        self._written = 0
+        self._failed = 0
+        self._flushes = 0
+        self._flush_total = 0.0
+        self._flush_max = 0.0
+        self._rejected = 0
+
+    def add_flush_listener(self, callback):
+        # callback(docs) runs on the writer thread after each successful insert_many
+        self._on_flush.append(callback)
+
+    def submit(self, doc):
+        return self.submit_many([doc])
+
+    def submit_many(self, docs):
+        # Blocks for up to put_timeout when the queue is full (backpressure), then raises.
+        # In sync mode every document's flush must have been written before returning
+        for future in self.enqueue(docs, self.put_timeout):
+            future.result()
+        return len(docs)
+
+    def enqueue(self, docs, timeout=0):
+        # Queues docs, waiting at most timeout seconds for room, and returns the Futures of
+        # their flushes in sync mode (none in async mode) for callers that wait their own way
+        self._ensure_worker()
+        count = len(docs)
+        with self._space:
+            fits = count <= self.max_queue and self._space.wait_for(
+                lambda: self._reserved + count <= self.max_queue, timeout)
+            if fits:
+                self._reserved += count
+        if not fits:
+            with self._lock:
+                self._rejected += 1
+            raise WriteQueueFull(f"Write queue full ({self.max_queue} documents)")
+
+        futures = []
+        for doc in docs:
+            future = Future() if self.durability == "sync" else None
+            if future is not None:
+                futures.append(future)
+            self._queue.put((doc, future))
+        with self._lock:
+            self._enqueued += count
+        return futures
+
+    def flush(self):
+        # Wait until everything queued so far has been written (or has failed)
+        if self._worker is not None and self._worker_pid == os.getpid():
+            self._queue.join()
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        if self._worker is not None and self._worker_pid == os.getpid() and self._worker.is_alive():
+            self._queue.put((_STOP, None))
+            self._worker.join()
+
+    def _ensure_worker(self):
+        if self._worker is not None and self._worker_pid == os.getpid() and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._worker is None or self._worker_pid != os.getpid() or not self._worker.is_alive():
+                if self._worker_pid is not None and self._worker_pid != os.getpid():
+                    # Forked child: the parent's pending documents are the parent's to write
+                    self._queue = queue.Queue()
+                    self._space = threading.Condition()
+                    self._reserved = 0
+                    self._reset_metrics()
+                self._closed = False
+                self._worker_pid = os.getpid()
+                self._worker = threading.Thread(target=self._run, name="write-behind", daemon=True)
+                self._worker.start()
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.flush_size and batch[-1][0] is not _STOP:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            stop = batch[-1][0] is _STOP
+            entries = batch[:-1] if stop else batch
+            if entries:
+                # Taken off the queue: their room is free, as with a bounded queue.Queue
+                with self._space:
+                    self._reserved -= len(entries)
+                    self._space.notify_all()
+                self._write(entries)
+            for _ in batch:
+                self._queue.task_done()
+            if stop:
+                return
+
+    def _write(self, entries):
+        docs = [doc for doc, _ in entries]
+        # Fixed ids make a retry after a partial insert skip what already landed
+        for doc in docs:
+            doc.setdefault("_id", ObjectId())
+        error = None
+        start = time.perf_counter()
+        for attempt in range(self.retries):
+            try:
+                collection = self.get_collection()
+                pending = docs
+                if attempt:
+                    stored = {d["_id"] for d in collection.find({"_id": {"$in": [d["_id"] for d in docs]}})}
+                    pending = [d for d in docs if d["_id"] not in stored]
+                if pending:
+                    collection.insert_many(pending)
+                error = None
+                break
+            except Exception as e:
+                error = e
+                time.sleep(0.05 * (attempt + 1))
+        elapsed = time.perf_counter() - start
+
+        with self._lock:
+            self._flushes += 1
+            self._flush_total += elapsed
+            self._flush_max = max(self._flush_max, elapsed)
+            if error is None:
+                self._written += len(docs)
+            else:
+                self._failed += len(docs)
+
+        if error is not None:
+            log.error("Write-behind flush of %d documents failed: %s", len(docs), error)
+        else:
+            for callback in self._on_flush:
+                try:
+                    callback(docs)
+                except Exception as e:
+                    log.exception("Write-behind flush listener failed: %s", e)
+
+        for _, future in entries:
+            if future is None:
+                continue
+            if error is None:
+                future.set_result(None)
+            else:
+                future.set_exception(error)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "durability": self.durability,
+                "queue_depth": self._queue.qsize(),
+                "max_queue": self.max_queue,
+                "enqueued": self._enqueued,
+                "written": self._written,
+                "failed": self._failed,
+                "rejected": self._rejected,
+                "flushes": self._flushes,
+                "avg_flush_size": self._written / self._flushes if self._flushes else 0.0,
+                "avg_flush_ms": self._flush_total / self._flushes * 1000 if self._flushes else 0.0,
+                "max_flush_ms": self._flush_max * 1000,
+            }
@@ -1,10 +1,10 @@
 
 import sys
 import os
-# Add current dir to path to import backend modules
-sys.path.append(os.getcwd())
+# Add the backend dir to path to import its modules
+sys.path.insert(0, os.path.join(os.getcwd(), "backend"))
 
-from backend.ml_model import predictor
+from ml_model import predictor
 
 print("Predictor loaded.")
 print(f"Model Accuracy (pre-computed): {predictor.accuracy}")
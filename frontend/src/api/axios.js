@@ -4,4 +4,13 @@ const api = axios.create({
     baseURL: '/api' // Relies on Vite proxy
 });
 
+// Session token from /auth/login; /history and user-attributed predictions require it
+api.interceptors.request.use((config) => {
+    const token = localStorage.getItem('token');
+    if (token) {
+        config.headers.Authorization = `Bearer ${token}`;
+    }
+    return config;
+});
+
 export default api;
@@ -8,6 +8,7 @@ const Navbar = () => {
 
     const handleLogout = () => {
         localStorage.removeItem('user');
+        localStorage.removeItem('token');
         navigate('/login');
         // Optional: Force reload to clear any state if context isn't used
         window.location.reload();
@@ -1,5 +1,5 @@
 import React, { useEffect, useState } from 'react';
-import { Container, Typography, Paper, List, ListItem, ListItemText, Divider, Alert, CircularProgress, Grid, Box } from '@mui/material';
+import { Container, Typography, Paper, List, ListItem, ListItemText, Divider, Alert, CircularProgress, Grid, Box, Button } from '@mui/material';
 import { PieChart, Pie, Cell, Tooltip, Legend, ResponsiveContainer } from 'recharts';
 import api from '../api/axios';
 
@@ -8,6 +8,17 @@ const DoctorDashboard = () => {
     const [stats, setStats] = useState(null);
     const [loading, setLoading] = useState(true);
     const [error, setError] = useState(null);
+    const [nextCursor, setNextCursor] = useState(null);
+
+    const loadMore = async () => {
+        try {
+            const response = await api.get('/doctor/predictions', { params: { after: nextCursor } });
+            setPatients(prev => [...prev, ...response.data]);
+            setNextCursor(response.headers['x-next-cursor'] || null);
+        } catch (err) {
+            console.error("Failed to load more predictions", err);
+        }
+    };
 
     useEffect(() => {
         const fetchData = async () => {
@@ -17,6 +28,7 @@ const DoctorDashboard = () => {
                     api.get('/stats')
                 ]);
                 setPatients(patientsRes.data);
+                setNextCursor(patientsRes.headers['x-next-cursor'] || null);
                 setStats(statsRes.data);
             } catch (err) {
                 console.error("Failed to fetch doctor data", err);
@@ -111,13 +123,13 @@ const DoctorDashboard = () => {
                                             <ListItemText
                                                 primary={
                                                     <Typography variant="subtitle1" fontWeight="bold">
-                                                        {record.patient_name} — Diagnosis: {record.prediction}
+                                                        {record.patient_name} — Diagnosis: {record.prediction_result}
                                                     </Typography>
                                                 }
                                                 secondary={
                                                     <>
                                                         <Typography component="span" variant="body2" color="text.primary">
-                                                            Date: {new Date(record.timestamp?.$date || Date.now()).toLocaleDateString()}
+                                                            Date: {new Date(record.created_at?.$date || Date.now()).toLocaleDateString()}
                                                         </Typography>
                                                         {" — " + (record.recommendation || "Review required")}
                                                     </>
@@ -129,6 +141,11 @@ const DoctorDashboard = () => {
                                 ))}
                             </List>
                         )}
+                        {nextCursor && (
+                            <Box sx={{ textAlign: 'center' }}>
+                                <Button onClick={loadMore}>Load more</Button>
+                            </Box>
+                        )}
                     </Paper>
                 </Grid>
             </Grid>
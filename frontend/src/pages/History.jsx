@@ -1,5 +1,5 @@
 import React, { useEffect, useState } from 'react';
-import { Container, Typography, Paper, List, ListItem, ListItemText, Divider, Chip } from '@mui/material';
+import { Container, Typography, Paper, List, ListItem, ListItemText, Divider, Chip, Button, Box } from '@mui/material';
 import { useNavigate } from 'react-router-dom';
 import api from '../api/axios';
 
@@ -7,6 +7,21 @@ const History = () => {
     const navigate = useNavigate();
     const [history, setHistory] = useState([]);
     const [user, setUser] = useState(null);
+    const [nextCursor, setNextCursor] = useState(null);
+
+    const fetchPage = async (userId, after) => {
+        const response = await api.get(`/history/${userId}`, { params: after ? { after } : {} });
+        setHistory(prev => after ? [...prev, ...response.data] : response.data);
+        setNextCursor(response.headers['x-next-cursor'] || null);
+    };
+
+    const loadMore = async () => {
+        try {
+            await fetchPage(user._id?.$oid || user.id, nextCursor);
+        } catch (error) {
+            console.error("Failed to load more history", error);
+        }
+    };
 
     useEffect(() => {
         const fetchHistory = async () => {
@@ -16,8 +31,7 @@ const History = () => {
                 setUser(parsedUser);
                 try {
                     const userId = parsedUser._id?.$oid || parsedUser.id;
-                    const response = await api.get(`/history/${userId}`);
-                    setHistory(response.data);
+                    await fetchPage(userId);
                 } catch (error) {
                     console.error("Failed to load history", error);
                 }
@@ -63,6 +77,11 @@ const History = () => {
                         ))
                     )}
                 </List>
+                {nextCursor && (
+                    <Box sx={{ textAlign: 'center', pb: 2 }}>
+                        <Button onClick={loadMore}>Load more</Button>
+                    </Box>
+                )}
             </Paper>
         </Container>
     );
@@ -14,8 +14,8 @@ const Login = () => {
         try {
             const response = await api.post('/auth/login', { email, password });
             console.log('Login successful', response.data);
-            // In a real app, store token/user context here
             localStorage.setItem('user', JSON.stringify(response.data.user));
+            localStorage.setItem('token', response.data.token);
             navigate('/dashboard');
         } catch (err) {
             setError(err.response?.data?.error || 'Login failed');
@@ -1,27 +1,28 @@
 
 import sys
 import os
-import pandas as pd
-sys.path.append(os.getcwd())
+import numpy as np
+sys.path.insert(0, os.path.join(os.getcwd(), "backend"))
 
-from backend.ml_model import predictor
+import dataset
+from ml_model import predictor
 
 # Load actual samples from the dataset
 train_path = os.path.join("backend", "Blood_sample_dataset_balanced.csv")
-df = pd.read_csv(train_path)
+ds = dataset.load(train_path)
+X = ds.matrix(predictor.feature_names, dtype=float)
 
 print("Testing with ACTUAL dataset samples...\n")
 
 # Get one sample from each disease class
-for disease in df['Disease'].unique():
-    sample = df[df['Disease'] == disease].iloc[0]
+for code, disease in enumerate(ds.classes):
+    sample = X[np.flatnonzero(ds.codes == code)[0]]
     
     # Convert to dict format that frontend would send
     input_dict = {}
-    for feature in predictor.feature_names:
+    for feature, value in zip(predictor.feature_names, sample):
         # Normalize feature name to match dataset columns
-        if feature in sample.index:
-            input_dict[feature.lower().replace(" ", "_").replace("-", "_")] = str(sample[feature])
+        input_dict[feature.lower().replace(" ", "_").replace("-", "_")] = str(value)
     
     prediction = predictor.predict(input_dict)
     print(f"Actual: {disease:15} -> Predicted: {prediction}")